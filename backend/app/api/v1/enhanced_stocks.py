@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db, get_redis_stock, get_redis_search
 from app.services.enhanced_akshare_service import enhanced_akshare_service
 from app.utils.logger import api_logger, log_api_calls
+from app.utils.search_index import stock_search_index
 from app.schemas.stock import (
     StockSearchRequest, StockSearchResponse, StockSearchItem,
     StockInfo, RealtimeData, KLineData,
@@ -36,23 +37,11 @@ class LoggedStockService:
         start_time = datetime.now()
 
         try:
-            # 调用AKShare服务
-            stocks = self.akshare_service.get_stock_list()
-
-            # 过滤搜索结果
-            results = []
-            for stock in stocks:
-                if (query.lower() in stock['name'].lower() or
-                    query in stock['code'] or
-                    query.lower() in stock['market'].lower()):
-                    results.append(StockSearchItem(
-                        code=stock['code'],
-                        name=stock['name'],
-                        market=stock['market']
-                    ))
-
-                if len(results) >= limit:
-                    break
+            # 索引未就绪时用AKShare股票列表构建
+            if not stock_search_index.ready:
+                stock_search_index.build(self.akshare_service.get_stock_list())
+
+            results = stock_search_index.search(query, limit)
 
             execution_time = (datetime.now() - start_time).total_seconds()
 
@@ -61,7 +50,7 @@ class LoggedStockService:
                 endpoint="search_stocks",
                 method="GET",
                 request_data={"query": query, "limit": limit},
-                response_data={"results_count": len(results), "total_checked": len(stocks)},
+                response_data={"results_count": len(results), "index_size": len(stock_search_index)},
                 status_code=200,
                 execution_time=execution_time
             )
@@ -157,7 +146,7 @@ class LoggedStockService:
                 high=realtime_data['high'],
                 low=realtime_data['low'],
                 open=realtime_data['open'],
-                timestamp=datetime.now()
+                timestamp=realtime_data.get('snapshot_time') or datetime.now()
             )
 
             execution_time = (datetime.now() - start_time).total_seconds()
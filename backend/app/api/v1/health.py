@@ -5,6 +5,10 @@ Health check API endpoints
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.core.database import get_db, get_redis
+from app.core.redis_pool import pool_stats
+from app.services.async_stock_service import local_cache, tier_stats
+from app.utils.logger import log_pipeline_stats
+from app.utils.search_index import stock_search_index
 
 router = APIRouter()
 
@@ -39,4 +43,20 @@ async def database_health_check(db: Session = Depends(get_db)):
         return {
             "status": "error",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+@router.get("/health/cache")
+async def cache_health_check():
+    """Cache tier statistics (per worker process)"""
+    return {
+        "tiers": tier_stats.stats(),
+        "local_cache": local_cache.stats(),
+        "search_index": stock_search_index.stats(),
+        "redis_pools": pool_stats()
+    }
+
+
+@router.get("/health/logging")
+async def logging_health_check():
+    """Async log pipeline statistics: queue depth, dropped records, NDJSON writes"""
+    return log_pipeline_stats()
@@ -3,18 +3,23 @@
 01-.mdI
 """
 import logging
-from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from redis import Redis
-
-from app.core.database import get_db, get_redis_stock, get_redis_search
-from app.services.stock_service import StockService
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.database import (
+    AsyncSessionLocal, get_async_redis_stock, get_async_redis_search, get_async_redis_binary
+)
+from app.services.async_stock_service import AsyncStockService
+from app.utils import serializer
+from app.utils.http_cache import cached_response, etag_response
 from app.schemas.stock import (
     StockSearchRequest, StockSearchResponse, StockSearchItem,
     StockInfo, RealtimeData, KLineData,
     DashboardRequest, DashboardResponse,
+    BatchStockRequest, BatchResponse,
     ErrorResponse
 )
 
@@ -23,20 +28,18 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def get_stock_service(
-    db: Session = Depends(get_db),
-    redis_stock: Redis = Depends(get_redis_stock),
-    redis_search: Redis = Depends(get_redis_search)
-) -> StockService:
-    """֡h"""
-    return StockService(db, redis_stock, redis_search)
+def get_stock_service() -> AsyncStockService:
+    """获取异步股票服务实例"""
+    return AsyncStockService(
+        AsyncSessionLocal, get_async_redis_stock(), get_async_redis_search(), get_async_redis_binary()
+    )
 
 
 @router.get("/stocks/search", response_model=StockSearchResponse)
 async def search_stocks(
     query: str = Query(..., description=""s.h	"),
     limit: int = Query(10, ge=1, le=50, description="ӜpP6"),
-    stock_service: StockService = Depends(get_stock_service)
+    stock_service: AsyncStockService = Depends(get_stock_service)
 ):
     """
     h"API
@@ -46,7 +49,7 @@ async def search_stocks(
         logger.info(f"Stock search request: query={query}, limit={limit}")
 
         # gL"
-        results = stock_service.search_stocks(query, limit)
+        results = await stock_service.search_stocks(query, limit)
 
         return StockSearchResponse(
             success=True,
@@ -70,7 +73,7 @@ async def search_stocks(
 @router.get("/stocks/{stock_code}/info", response_model=StockInfo)
 async def get_stock_info(
     stock_code: str,
-    stock_service: StockService = Depends(get_stock_service)
+    stock_service: AsyncStockService = Depends(get_stock_service)
 ):
     """
     ֡h@o
@@ -79,7 +82,7 @@ async def get_stock_info(
     try:
         logger.info(f"Stock info request: {stock_code}")
 
-        stock_info = stock_service.get_stock_info(stock_code)
+        stock_info = await stock_service.get_stock_info(stock_code)
         if not stock_info:
             raise HTTPException(
                 status_code=404,
@@ -109,7 +112,7 @@ async def get_stock_info(
 @router.get("/stocks/{stock_code}/realtime", response_model=RealtimeData)
 async def get_realtime_data(
     stock_code: str,
-    stock_service: StockService = Depends(get_stock_service)
+    stock_service: AsyncStockService = Depends(get_stock_service)
 ):
     """
     ֡h<pn
@@ -118,7 +121,7 @@ async def get_realtime_data(
     try:
         logger.info(f"Realtime data request: {stock_code}")
 
-        realtime_data = stock_service.get_realtime_data(stock_code)
+        realtime_data = await stock_service.get_realtime_data(stock_code)
         if not realtime_data:
             raise HTTPException(
                 status_code=404,
@@ -148,7 +151,7 @@ async def get_realtime_data(
 @router.post("/stocks/dashboard", response_model=DashboardResponse)
 async def get_dashboard_data(
     request: DashboardRequest,
-    stock_service: StockService = Depends(get_stock_service)
+    stock_service: AsyncStockService = Depends(get_stock_service)
 ):
     """
     Dashboardpn
@@ -183,14 +186,16 @@ async def get_dashboard_data(
             )
 
         # Dashboardpn
-        dashboard_data = stock_service.get_dashboard_data(request)
+        dashboard_data = await stock_service.get_dashboard_data(request)
 
-        return DashboardResponse(
+        response = DashboardResponse(
             success=True,
             stock_code=request.stock_code,
             timestamp=datetime.now(),
             data=dashboard_data
         )
+        # 已是校验过的模型，直接序列化返回，跳过 response_model 的 jsonable_encoder
+        return Response(content=serializer.dumps(response.dict()), media_type="application/json")
 
     except HTTPException:
         raise
@@ -209,8 +214,11 @@ async def get_dashboard_data(
 @router.get("/stocks/{stock_code}/kline", response_model=KLineData)
 async def get_kline_data(
     stock_code: str,
+    http_request: Request,
     period: str = Query("daily", description="Khdaily, weekly, monthly"),
-    stock_service: StockService = Depends(get_stock_service)
+    start_date: Optional[date] = Query(None, description="起始日期（含），指定区间时由数据库直接查询"),
+    end_date: Optional[date] = Query(None, description="结束日期（含）"),
+    stock_service: AsyncStockService = Depends(get_stock_service)
 ):
     """
     Kpn
@@ -231,8 +239,17 @@ async def get_kline_data(
                 ).dict()
             )
 
-        kline_data = stock_service.get_kline_data(stock_code, period)
-        if not kline_data:
+        # 默认区间：ETag旁路键未变化时直接返回304或已序列化的响应体，不读取K线数据
+        if_none_match = http_request.headers.get("if-none-match")
+        if settings.http_etag_enabled and not (start_date or end_date):
+            etag = await stock_service.get_kline_etag(stock_code, period)
+            if etag is not None:
+                response = cached_response(if_none_match, etag)
+                if response is not None:
+                    return response
+
+        kline_data = await stock_service.get_kline_columns(stock_code, period, start_date, end_date)
+        if kline_data is None:
             raise HTTPException(
                 status_code=404,
                 detail=ErrorResponse(
@@ -242,7 +259,10 @@ async def get_kline_data(
                 ).dict()
             )
 
-        return kline_data
+        # 直接由列式数据生成JSON，不构造逐条KLineItem
+        if not settings.http_etag_enabled:
+            return Response(content=kline_data.to_json(), media_type="application/json")
+        return etag_response(if_none_match, kline_data.to_json())
 
     except HTTPException:
         raise
@@ -255,4 +275,156 @@ async def get_kline_data(
                 error_message=f"Kpn1%: {str(e)}",
                 timestamp=datetime.now()
             ).dict()
-        )
\ No newline at end of file
+        )
+
+@router.post("/stocks/universe/sync")
+async def sync_stock_universe(
+    stock_service: AsyncStockService = Depends(get_stock_service)
+):
+    """
+    同步全市场股票列表
+    一次下载AKShare股票列表，分批 upsert 到 stocks 表
+    """
+    try:
+        count = await stock_service.sync_stock_universe()
+        return {"success": True, "synced": count}
+
+    except Exception as e:
+        logger.error(f"Stock universe sync error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                error_code="UNIVERSE_SYNC_ERROR",
+                error_message=f"股票列表同步失败: {str(e)}",
+                timestamp=datetime.now()
+            ).dict()
+        )
+
+
+# === 批量查询 ===
+
+def _batch_codes(request: BatchStockRequest) -> List[str]:
+    """校验并去重股票代码"""
+    codes = list(dict.fromkeys(request.stock_codes))
+    if not codes or len(codes) > settings.batch_max_codes:
+        raise HTTPException(
+            status_code=400,
+            detail=ErrorResponse(
+                error_code="INVALID_BATCH_SIZE",
+                error_message=f"股票数量需在 1 到 {settings.batch_max_codes} 之间",
+                timestamp=datetime.now()
+            ).dict()
+        )
+    invalid = [code for code in codes if len(code) != 6 or not code.isdigit()]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=ErrorResponse(
+                error_code="INVALID_STOCK_CODE",
+                error_message=f"无效的股票代码: {invalid[:10]}",
+                timestamp=datetime.now()
+            ).dict()
+        )
+    return codes
+
+
+async def _batch_response(http_request: Request, output_format: str, codes: List[str],
+                          fetch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+                          encode: Callable[[Any], bytes]) -> Response:
+    """
+    format=ndjson（或 Accept: application/x-ndjson）时按 batch_chunk_size 分块查询并逐行流式返回，
+    每行为 {"code": ..., "data": ...}；否则一次查询后返回 BatchResponse 结构
+    """
+    def line(code: str, value: Any) -> bytes:
+        data = encode(value) if value is not None else b"null"
+        return b'{"code":' + serializer.dumps(code) + b',"data":' + data + b'}\n'
+
+    if output_format == "ndjson" or "application/x-ndjson" in http_request.headers.get("accept", ""):
+        async def stream():
+            for i in range(0, len(codes), settings.batch_chunk_size):
+                chunk = codes[i:i + settings.batch_chunk_size]
+                results = await fetch(chunk)
+                yield b"".join(line(code, results.get(code)) for code in chunk)
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    results = await fetch(codes)
+    missing = [code for code in codes if results.get(code) is None]
+    body = b"".join((
+        b'{"success":true,"total":', str(len(codes) - len(missing)).encode(),
+        b',"results":{',
+        b",".join(
+            serializer.dumps(code) + b":" + (encode(results[code]) if results.get(code) is not None else b"null")
+            for code in codes
+        ),
+        b'},"missing":', serializer.dumps(missing), b"}"
+    ))
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/stocks/batch/info", response_model=BatchResponse)
+async def get_stock_info_batch(
+    request: BatchStockRequest,
+    http_request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="返回格式: json / ndjson"),
+    stock_service: AsyncStockService = Depends(get_stock_service)
+):
+    """
+    批量获取股票基本信息
+    Redis MGET → PostgreSQL code = ANY(...) → AKShare
+    """
+    codes = _batch_codes(request)
+    logger.info(f"Batch stock info request: {len(codes)} stocks")
+    return await _batch_response(
+        http_request, format, codes, stock_service.get_stock_info_batch,
+        lambda stock_info: stock_info.json().encode()
+    )
+
+
+@router.post("/stocks/batch/realtime", response_model=BatchResponse)
+async def get_realtime_batch(
+    request: BatchStockRequest,
+    http_request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="返回格式: json / ndjson"),
+    stock_service: AsyncStockService = Depends(get_stock_service)
+):
+    """
+    批量获取实时行情
+    所有股票从同一份全市场行情快照中查找
+    """
+    codes = _batch_codes(request)
+    logger.info(f"Batch realtime request: {len(codes)} stocks")
+    return await _batch_response(
+        http_request, format, codes, stock_service.get_realtime_batch,
+        lambda realtime: realtime.json().encode()
+    )
+
+
+@router.post("/stocks/batch/kline", response_model=BatchResponse)
+async def get_kline_batch(
+    request: BatchStockRequest,
+    http_request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="返回格式: json / ndjson"),
+    stock_service: AsyncStockService = Depends(get_stock_service)
+):
+    """
+    批量获取K线数据
+    Redis MGET 读取二进制列式缓存，未命中的股票并发走 PostgreSQL/AKShare
+    """
+    if request.period not in {"daily", "weekly", "monthly"}:
+        raise HTTPException(
+            status_code=400,
+            detail=ErrorResponse(
+                error_code="INVALID_PERIOD",
+                error_message=f"无效的K线周期: {request.period}",
+                timestamp=datetime.now()
+            ).dict()
+        )
+
+    codes = _batch_codes(request)
+    logger.info(f"Batch K-line request: {len(codes)} stocks, period={request.period}")
+    return await _batch_response(
+        http_request, format, codes,
+        lambda chunk: stock_service.get_kline_batch(chunk, request.period),
+        lambda columns: columns.to_json()
+    )
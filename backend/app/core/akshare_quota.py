@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+AKShare 限流共用定义：令牌桶 Lua 脚本、Redis 键和默认配额
+后端（app/core/rate_limiter.py）和 MCP 服务（mcp_servers/shared/rate_limiter.py）共享同一组 Redis 桶，
+脚本和配额只在这里定义；本模块只依赖标准库，MCP 服务按文件路径加载
+
+配额格式: [每分钟调用次数, 突发容量]，两边都从同名环境变量（JSON）覆盖:
+    AKSHARE_RATE_LIMITS='{"stock_zh_a_spot_em": [12, 2]}'
+    AKSHARE_RATE_LIMIT_DEFAULT='[60, 10]'
+    AKSHARE_RATE_LIMIT_GLOBAL='[300, 30]'
+"""
+import json
+import os
+from typing import Dict, List, Mapping, Optional, Tuple
+
+KEY_PREFIX = "prism2:ratelimit:akshare"
+GLOBAL_BUCKET = "__all__"
+
+DEFAULT_QUOTA: List[float] = [60, 10]
+GLOBAL_QUOTA: List[float] = [300, 30]
+ENDPOINT_QUOTAS: Dict[str, List[float]] = {
+    "stock_zh_a_spot_em": [12, 2],
+    "stock_zh_a_hist": [120, 20],
+    "stock_individual_info_em": [60, 10],
+    "stock_info_a_code_name": [6, 1],
+    "stock_news_em": [30, 5],
+    "stock_financial_abstract": [30, 5],
+    "stock_lhb_detail_em": [30, 5],
+}
+
+# KEYS: 桶键; ARGV[1]: 请求令牌数, ARGV[2i], ARGV[2i+1]: 第i个桶的速率(令牌/秒)和容量
+# 所有桶都有足够令牌时一起扣减并返回0，否则不扣减并返回最长等待毫秒数
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local requested = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    if tokens < requested then
+        wait = math.max(wait, math.ceil((requested - tokens) * 1000 / rate))
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - requested
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate) + 1000)
+end
+
+return wait
+"""
+
+
+def quotas_from_env(environ: Optional[Mapping[str, str]] = None
+                    ) -> Tuple[Dict[str, List[float]], List[float], List[float]]:
+    """读取环境变量中的配额，返回 (接口配额, 默认配额, 全局配额)，未设置的取默认值
+
+    后端由 pydantic-settings 按相同的变量名解析，这里供不使用 pydantic 的 MCP 服务调用
+    """
+    environ = os.environ if environ is None else environ
+
+    def load(name: str, default):
+        value = environ.get(name)
+        return json.loads(value) if value else default
+
+    quotas = load("AKSHARE_RATE_LIMITS", {endpoint: list(quota) for endpoint, quota in ENDPOINT_QUOTAS.items()})
+    return quotas, load("AKSHARE_RATE_LIMIT_DEFAULT", list(DEFAULT_QUOTA)), load("AKSHARE_RATE_LIMIT_GLOBAL", list(GLOBAL_QUOTA))
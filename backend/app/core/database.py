@@ -3,15 +3,18 @@
 Database configuration module
 """
 import logging
-from typing import Generator, Optional
+from typing import AsyncGenerator, Dict, Generator, Tuple, Union
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool
-import redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import redis.asyncio as aioredis
 from redis import Redis
 
 from .config import settings
+from .db_pool import close_pg_pools
+from .redis_pool import AutoPipeline, close_redis_pools, get_async_redis, get_sync_redis
 
 logger = logging.getLogger(__name__)
 
@@ -28,22 +31,60 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Redis连接池
-redis_client: Optional[Redis] = None
+# SQLAlchemy异步配置 (asyncpg)
+async_engine = create_async_engine(
+    settings.database_url.replace("postgresql://", "postgresql+asyncpg://", 1),
+    pool_size=10,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=settings.debug
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Redis客户端（共享 app.core.redis_pool 中的连接池）
+async_redis_clients: Dict[Tuple[int, bool], Union[aioredis.Redis, AutoPipeline]] = {}
 
 
 def get_redis() -> Redis:
     """获取Redis客户端实例"""
-    global redis_client
-    if redis_client is None:
-        redis_client = redis.from_url(
-            settings.redis_url,
-            db=settings.redis_db_stock,
-            decode_responses=True,
-            socket_connect_timeout=5,
-            socket_timeout=5
-        )
-    return redis_client
+    return get_sync_redis(settings.redis_db_stock)
+
+
+def get_redis_stock() -> Redis:
+    """获取股票数据Redis客户端"""
+    return get_redis()
+
+
+def get_redis_search() -> Redis:
+    """获取搜索缓存Redis客户端"""
+    return get_sync_redis(settings.redis_db_search)
+
+
+def _get_async_redis(db: int, decode_responses: bool = True) -> Union[aioredis.Redis, AutoPipeline]:
+    """获取指定库的异步Redis客户端，启用 redis_auto_pipeline 时并发命令自动合并为 pipeline"""
+    client = async_redis_clients.get((db, decode_responses))
+    if client is None:
+        client = get_async_redis(db, decode_responses)
+        if settings.redis_auto_pipeline:
+            client = AutoPipeline(client)
+        async_redis_clients[(db, decode_responses)] = client
+    return client
+
+
+def get_async_redis_stock() -> aioredis.Redis:
+    """获取股票数据异步Redis客户端"""
+    return _get_async_redis(settings.redis_db_stock)
+
+
+def get_async_redis_search() -> aioredis.Redis:
+    """获取搜索缓存异步Redis客户端"""
+    return _get_async_redis(settings.redis_db_search)
+
+
+def get_async_redis_binary() -> aioredis.Redis:
+    """获取股票数据异步Redis客户端（不解码，用于二进制缓存）"""
+    return _get_async_redis(settings.redis_db_stock, decode_responses=False)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -55,6 +96,12 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
 def init_database() -> bool:
     """初始化数据库连接"""
     try:
@@ -75,9 +122,14 @@ def init_database() -> bool:
 
 def close_database():
     """关闭数据库连接"""
-    global redis_client
-    if redis_client:
-        redis_client.close()
-        redis_client = None
     engine.dispose()
-    logger.info("Database connections closed")
\ No newline at end of file
+    logger.info("Database connections closed")
+
+
+async def close_async_database():
+    """关闭异步数据库连接"""
+    async_redis_clients.clear()
+    await close_redis_pools()
+    close_pg_pools()
+    await async_engine.dispose()
+    logger.info("Async database connections closed")
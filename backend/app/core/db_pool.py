@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL 原生连接池
+Dashboard 三层服务和批处理服务直接使用 psycopg2，不经过 SQLAlchemy 引擎，
+这里为它们提供按连接参数复用的长连接池，同一进程内相同数据库只有一个池
+（异步代码使用 app/core/database.py 的 SQLAlchemy AsyncSession）
+
+- psycopg2 ThreadedConnectionPool，连接耗尽时等待而不是抛 PoolError
+- 取出的连接 close() 即归还，原有 "connect → 使用 → close" 的写法不需要改动；
+  归还前回滚未提交的事务，已断开的连接直接丢弃
+- 取连接时按间隔执行 SELECT 1 存活检查
+- 统计使用中连接数、峰值、等待次数和超时次数，用于观察连接池饱和度
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    """连接代理：close() 把连接放回连接池，其余属性转发给 psycopg2 连接"""
+
+    def __init__(self, pool: "PgPool", conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name: str):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(conn, name)
+
+    def close(self):
+        """归还连接；重复调用无副作用"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._conn is not None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+
+    def __del__(self):
+        # 调用方在异常分支上漏掉 close() 时，回收时仍把连接还给池
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PgPool:
+    """带等待、存活检查和饱和度统计的 psycopg2 线程安全连接池"""
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        minconn: int = 1,
+        maxconn: int = 10,
+        acquire_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+        **connect_kwargs
+    ):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        # 首次取连接时才建池，数据库未启动时导入模块不会失败
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool 耗尽时直接报错，用信号量让调用方排队等待
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # id(conn) -> 最近一次确认可用的时间
+        self._checked_at: Dict[int, float] = {}
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    def _ensure_pool(self) -> ThreadedConnectionPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn, **self.connect_kwargs
+                    )
+                    logger.info(f"PostgreSQL pool created (min={self.minconn}, max={self.maxconn})")
+        return self._pool
+
+    def connection(self) -> PooledConnection:
+        """取出一个可用连接，连接池满时最多等待 acquire_timeout 秒"""
+        if not self._slots.acquire(blocking=False):
+            start = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.acquire_timeout)
+            with self._stats_lock:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - start
+                if not acquired:
+                    self._stats["timeouts"] += 1
+            if not acquired:
+                raise PoolError(
+                    f"PostgreSQL pool exhausted: {self.maxconn} connections in use "
+                    f"after waiting {self.acquire_timeout}s"
+                )
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        return PooledConnection(self, conn)
+
+    def _checkout(self):
+        pool = self._ensure_pool()
+        # 池中可能有多条失效连接，逐条检查，全部失效时最后一次取到的是新建连接
+        for _ in range(self.maxconn):
+            conn = pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(pool, conn)
+        return pool.getconn()
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at.get(id(conn), 0.0) < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error as e:
+            logger.warning(f"Dropping broken PostgreSQL connection: {e}")
+            return False
+        self._checked_at[id(conn)] = now
+        return True
+
+    def _discard(self, pool: ThreadedConnectionPool, conn):
+        self._checked_at.pop(id(conn), None)
+        with self._stats_lock:
+            self._stats["discarded"] += 1
+        try:
+            pool.putconn(conn, close=True)
+        except PoolError:
+            pass
+
+    def release(self, conn):
+        """归还连接；有未结束的事务先回滚，连接已断开则丢弃；连接池已关闭时直接关闭连接"""
+        pool = self._pool
+        try:
+            if pool is None:
+                self._checked_at.pop(id(conn), None)
+                if not conn.closed:
+                    conn.close()
+                return
+            if conn.closed:
+                self._discard(pool, conn)
+                return
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            pool.putconn(conn)
+        except Exception as e:
+            logger.warning(f"Failed to return PostgreSQL connection to pool: {e}")
+            self._discard(pool, conn)
+        finally:
+            with self._stats_lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def close(self):
+        """关闭池中所有连接"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._checked_at.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池状态与饱和度"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["max_connections"] = self.maxconn
+        stats["saturation"] = round(stats["in_use"] / self.maxconn, 4) if self.maxconn else 0.0
+        return stats
+
+
+_pg_pools: Dict[Tuple, PgPool] = {}
+_pg_pools_lock = threading.Lock()
+
+
+def get_pg_pool(dsn: Optional[str] = None, **connect_kwargs) -> PgPool:
+    """按连接参数获取共享的 psycopg2 连接池；不传参数时使用 settings.database_url"""
+    if dsn is None and not connect_kwargs:
+        dsn = settings.database_url
+    key = (dsn, tuple(sorted(connect_kwargs.items())))
+    with _pg_pools_lock:
+        pool = _pg_pools.get(key)
+        if pool is None:
+            pool = PgPool(
+                dsn,
+                minconn=settings.pg_pool_min,
+                maxconn=settings.pg_pool_max,
+                acquire_timeout=settings.pg_pool_acquire_timeout,
+                health_check_interval=settings.pg_pool_health_check_interval,
+                **connect_kwargs
+            )
+            _pg_pools[key] = pool
+    return pool
+
+
+def pg_connection(db_config: Optional[Dict[str, Any]] = None) -> PooledConnection:
+    """
+    按 batch_config.database_config 形式的配置取连接
+    配置为 {'url': ...} 或 host/port/database/user/password 关键字参数
+    """
+    if not db_config:
+        return get_pg_pool().connection()
+    if "url" in db_config:
+        return get_pg_pool(db_config["url"]).connection()
+    return get_pg_pool(**db_config).connection()
+
+
+def close_pg_pools():
+    """关闭所有 psycopg2 连接池"""
+    with _pg_pools_lock:
+        pools = list(_pg_pools.values())
+        _pg_pools.clear()
+    for pool in pools:
+        pool.close()
+    logger.info("PostgreSQL connection pools closed")
+
+
+def pg_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """各连接池状态，键中不含密码"""
+    def label(kind: str, dsn: Optional[str], kwargs: Tuple = ()) -> str:
+        if dsn:
+            return f"{kind}:{dsn.rsplit('@', 1)[-1]}"
+        options = dict(kwargs)
+        return f"{kind}:{options.get('host', 'localhost')}:{options.get('port', 5432)}/{options.get('database', '')}"
+
+    with _pg_pools_lock:
+        result = {label("psycopg2", dsn, kwargs): pool.stats() for (dsn, kwargs), pool in _pg_pools.items()}
+    return result
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded executor for blocking AKShare calls
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# AKShare调用专用线程池，限制并发下载数，避免阻塞事件循环
+akshare_executor = ThreadPoolExecutor(
+    max_workers=settings.akshare_max_workers,
+    thread_name_prefix="akshare"
+)
+
+
+async def run_akshare(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在AKShare线程池中执行阻塞调用"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(akshare_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """关闭AKShare线程池"""
+    akshare_executor.shutdown(wait=False)
+    logger.info("AKShare executor shut down")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus 指标
+请求延迟、各数据层（l0/redis/postgresql/akshare）耗时、各数据类型耗时、AKShare 调用与限流等待，
+以及缓存命中率和 PostgreSQL 连接池饱和度，统一通过 /metrics 导出，p50/p95/p99 由 histogram_quantile 计算
+
+- MetricsMiddleware: 纯 ASGI 中间件，按路由模板（而不是实际路径）统计，避免标签基数膨胀
+- timed / timed_tier: 同时支持同步和异步函数的计时装饰器
+- 指标按进程统计；多 worker 部署时由 Prometheus 分别抓取后聚合
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response
+
+# 覆盖 Redis 亚毫秒命中到 AKShare 数十秒下载
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+REQUEST_LATENCY = Histogram(
+    "prism2_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+TIER_LATENCY = Histogram(
+    "prism2_tier_duration_seconds",
+    "Data tier access latency by tier and data type",
+    ["tier", "data_type"],
+    buckets=LATENCY_BUCKETS
+)
+DATA_TYPE_LATENCY = Histogram(
+    "prism2_data_type_duration_seconds",
+    "End-to-end latency to produce one dashboard data type, by outcome",
+    ["data_type", "status"],
+    buckets=LATENCY_BUCKETS
+)
+SERVICE_LATENCY = Histogram(
+    "prism2_service_call_duration_seconds",
+    "Service method latency",
+    ["service", "method"],
+    buckets=LATENCY_BUCKETS
+)
+AKSHARE_LATENCY = Histogram(
+    "prism2_akshare_call_duration_seconds",
+    "AKShare call latency, excluding rate limit wait",
+    ["function", "status"],
+    buckets=LATENCY_BUCKETS
+)
+AKSHARE_THROTTLE = Histogram(
+    "prism2_akshare_throttle_wait_seconds",
+    "Time spent waiting for an AKShare rate limit token",
+    ["function"],
+    buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels: str):
+    """计时上下文，异常时同样记录"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def timed(histogram: Histogram, **labels: str):
+    """计时装饰器，支持同步和异步函数"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with observe(histogram, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe(histogram, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_service(service: str):
+    """服务方法计时，method 标签取函数名"""
+    def decorator(func):
+        return timed(SERVICE_LATENCY, service=service, method=func.__name__)(func)
+    return decorator
+
+
+def timed_tier(tier: str, data_type: Callable[..., str] = lambda self, data_type, *args, **kwargs: data_type):
+    """
+    数据层计时装饰器
+    data_type 从被装饰方法的参数中取出数据类型，默认为 self 之后的第一个参数
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with observe(TIER_LATENCY, tier=tier, data_type=data_type(*args, **kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe(TIER_LATENCY, tier=tier, data_type=data_type(*args, **kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CacheStatsCollector:
+    """抓取时读取 TierStats 计数，导出各缓存层命中/未命中总数和命中率，热路径上没有额外开销"""
+
+    def __init__(self, source: Callable[[], Dict[str, Dict[str, Any]]]):
+        self.source = source
+
+    def collect(self):
+        stats = self.source()
+        requests = CounterMetricFamily(
+            "prism2_cache_requests", "Cache lookups by tier and result", labels=["tier", "result"]
+        )
+        ratio = GaugeMetricFamily("prism2_cache_hit_ratio", "Cache hit ratio by tier", labels=["tier"])
+        for tier, counter in stats.items():
+            requests.add_metric([tier, "hit"], counter["hits"])
+            requests.add_metric([tier, "miss"], counter["misses"])
+            ratio.add_metric([tier], counter["hit_rate"])
+        yield requests
+        yield ratio
+
+
+def register_cache_stats(source: Callable[[], Dict[str, Dict[str, Any]]]):
+    """注册缓存命中统计来源（如 tier_stats.stats）"""
+    REGISTRY.register(CacheStatsCollector(source))
+
+
+class PgPoolStatsCollector:
+    """抓取时读取 psycopg2 连接池统计（app.core.db_pool.pg_pool_stats），导出使用中连接数、饱和度与等待/超时次数"""
+
+    def __init__(self, source: Callable[[], Dict[str, Dict[str, Any]]]):
+        self.source = source
+
+    def collect(self):
+        stats = self.source()
+        in_use = GaugeMetricFamily("prism2_pg_pool_in_use", "PostgreSQL pool connections in use", labels=["pool"])
+        saturation = GaugeMetricFamily(
+            "prism2_pg_pool_saturation", "PostgreSQL pool in-use connections / max connections", labels=["pool"]
+        )
+        waits = CounterMetricFamily("prism2_pg_pool_waits", "Checkouts that waited for a free connection",
+                                    labels=["pool"])
+        timeouts = CounterMetricFamily("prism2_pg_pool_timeouts", "Checkouts that timed out waiting",
+                                       labels=["pool"])
+        for pool, counter in stats.items():
+            in_use.add_metric([pool], counter["in_use"])
+            saturation.add_metric([pool], counter["saturation"])
+            waits.add_metric([pool], counter["waits"])
+            timeouts.add_metric([pool], counter["timeouts"])
+        yield in_use
+        yield saturation
+        yield waits
+        yield timeouts
+
+
+def register_pg_pool_stats(source: Callable[[], Dict[str, Dict[str, Any]]]):
+    """注册连接池统计来源（pg_pool_stats），只在实际使用 psycopg2 连接池的进程中注册"""
+    REGISTRY.register(PgPoolStatsCollector(source))
+
+
+class MetricsMiddleware:
+    """记录每个请求的延迟，路由标签取匹配到的路由模板"""
+
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 路由匹配后 scope 中才有 route，未匹配的请求统一归为 unmatched
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            REQUEST_LATENCY.labels(method=method, route=template, status=str(status["code"])).observe(
+                time.perf_counter() - start
+            )
+
+
+def metrics_response(registry=REGISTRY) -> Response:
+    """Prometheus 文本格式的指标"""
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def observe_akshare(function: str, duration: float, ok: bool, throttle_wait: Optional[float] = None):
+    """记录一次 AKShare 调用"""
+    AKSHARE_LATENCY.labels(function=function, status="ok" if ok else "error").observe(duration)
+    if throttle_wait is not None:
+        AKSHARE_THROTTLE.labels(function=function).observe(throttle_wait)
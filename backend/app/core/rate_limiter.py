@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+AKShare 全局限流
+基于 Redis 的令牌桶，在 uvicorn worker、批处理、Dashboard 服务和 MCP 服务之间共享配额
+
+- 每个 AKShare 接口一个桶（按函数名），另有一个全局桶限制总调用速率
+- 一次 Lua 脚本原子地检查并扣减所有相关桶，不足时返回需要等待的毫秒数
+- Redis 不可用时退化为进程内令牌桶
+- 键、Lua 脚本和默认配额定义在 app/core/akshare_quota.py，MCP 服务（mcp_servers/shared/rate_limiter.py）加载同一模块
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import redis
+
+from app.core.akshare_quota import GLOBAL_BUCKET, KEY_PREFIX, TOKEN_BUCKET_SCRIPT
+from app.core.config import settings
+from app.core.metrics import observe_akshare
+from app.core.redis_pool import get_async_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTokenBucket:
+    """进程内令牌桶（Redis 不可用时的兜底）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[float, float]] = {}
+
+    def try_acquire(self, buckets: Sequence[Tuple[str, float, float]], requested: float) -> float:
+        """与 Lua 脚本语义一致，返回需要等待的秒数，0 表示已获取"""
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key, rate, capacity in buckets:
+                tokens, ts = self._state.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+                levels.append(tokens)
+                if tokens < requested:
+                    wait = max(wait, (requested - tokens) / rate)
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._state[key] = (tokens - requested if wait == 0 else tokens, now)
+            return wait
+
+
+class AKShareRateLimiter:
+    """Redis 令牌桶限流器，按 AKShare 接口分配配额"""
+
+    def __init__(self, redis_db: int = settings.redis_db_system,
+                 quotas: Optional[Dict[str, List[float]]] = None,
+                 default_quota: Optional[List[float]] = None,
+                 global_quota: Optional[List[float]] = None):
+        # 配额格式: [每分钟调用次数, 突发容量]
+        self.quotas = quotas if quotas is not None else settings.akshare_rate_limits
+        self.default_quota = default_quota or settings.akshare_rate_limit_default
+        self.global_quota = global_quota if global_quota is not None else settings.akshare_rate_limit_global
+
+        self._redis = get_sync_redis(redis_db, decode_responses=False)
+        self._async_redis = get_async_redis(redis_db, decode_responses=False)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._async_script = self._async_redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._local = LocalTokenBucket()
+        self._last_fallback_log = 0.0
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _buckets(self, endpoint: str) -> List[Tuple[str, float, float]]:
+        """(键, 令牌/秒, 容量) 列表：接口桶 + 全局桶"""
+        per_minute, burst = self.quotas.get(endpoint, self.default_quota)
+        buckets = [(f"{KEY_PREFIX}:{endpoint}", per_minute / 60.0, float(burst))]
+        if self.global_quota:
+            per_minute, burst = self.global_quota
+            buckets.append((f"{KEY_PREFIX}:{GLOBAL_BUCKET}", per_minute / 60.0, float(burst)))
+        return buckets
+
+    @staticmethod
+    def _script_args(buckets: List[Tuple[str, float, float]], tokens: float) -> Tuple[List[str], List[Any]]:
+        keys = [key for key, _, _ in buckets]
+        args: List[Any] = [tokens]
+        for _, rate, capacity in buckets:
+            args.extend([rate, capacity])
+        return keys, args
+
+    def _fallback(self, buckets, tokens: float, error: Exception) -> float:
+        # 每分钟最多记录一次，避免 Redis 故障期间日志刷屏
+        now = time.monotonic()
+        if now - self._last_fallback_log >= 60:
+            self._last_fallback_log = now
+            logger.warning(f"Rate limiter Redis unavailable, using local bucket: {error}")
+        return self._local.try_acquire(buckets, tokens)
+
+    def _try_acquire(self, buckets, tokens: float) -> float:
+        keys, args = self._script_args(buckets, tokens)
+        try:
+            return int(self._script(keys=keys, args=args)) / 1000.0
+        except redis.RedisError as e:
+            return self._fallback(buckets, tokens, e)
+
+    async def _try_acquire_async(self, buckets, tokens: float) -> float:
+        keys, args = self._script_args(buckets, tokens)
+        try:
+            return int(await self._async_script(keys=keys, args=args)) / 1000.0
+        except redis.RedisError as e:
+            return self._fallback(buckets, tokens, e)
+
+    def _record(self, endpoint: str, waited: Optional[float]):
+        """waited 为 None 表示未被限流"""
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "throttled": 0, "wait_seconds": 0.0})
+            stats["calls"] += 1
+            if waited is not None:
+                stats["throttled"] += 1
+                stats["wait_seconds"] += waited
+
+    def acquire(self, endpoint: str, tokens: float = 1, timeout: Optional[float] = None) -> float:
+        """阻塞直到获取令牌，返回等待秒数；超过 timeout 抛出 TimeoutError"""
+        buckets = self._buckets(endpoint)
+        start = time.monotonic()
+        throttled = False
+        while True:
+            wait = self._try_acquire(buckets, tokens)
+            if wait <= 0:
+                waited = time.monotonic() - start if throttled else 0.0
+                self._record(endpoint, waited if throttled else None)
+                return waited
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"AKShare rate limit wait exceeds {timeout}s for {endpoint}")
+            throttled = True
+            time.sleep(wait)
+
+    async def acquire_async(self, endpoint: str, tokens: float = 1, timeout: Optional[float] = None) -> float:
+        """异步获取令牌，等待期间不阻塞事件循环"""
+        buckets = self._buckets(endpoint)
+        start = time.monotonic()
+        throttled = False
+        while True:
+            wait = await self._try_acquire_async(buckets, tokens)
+            if wait <= 0:
+                waited = time.monotonic() - start if throttled else 0.0
+                self._record(endpoint, waited if throttled else None)
+                return waited
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"AKShare rate limit wait exceeds {timeout}s for {endpoint}")
+            throttled = True
+            await asyncio.sleep(wait)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """获取 func 对应接口的令牌后调用 AKShare 函数，调用耗时与限流等待计入指标"""
+        waited = self.acquire(func.__name__)
+        if waited > 0.5:
+            logger.info(f"AKShare {func.__name__} throttled for {waited:.2f}s")
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            observe_akshare(func.__name__, time.perf_counter() - start, ok, waited)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """本进程各接口的限流统计"""
+        with self._stats_lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+
+# 全局限流器
+akshare_limiter = AKShareRateLimiter()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Redis 统一访问层
+所有服务共享显式连接池，按 (库, 是否解码响应) 复用，同一进程内每个组合只有一个池
+
+- 同步客户端: redis.BlockingConnectionPool，连接耗尽时等待而不是报错
+- 异步客户端: redis.asyncio.BlockingConnectionPool，原生 asyncio，不再借助线程池
+- AutoPipeline: 同一事件循环轮次内发出的命令合并为一次 pipeline 往返
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_sync_pools: Dict[Tuple[int, bool], redis.BlockingConnectionPool] = {}
+_async_pools: Dict[Tuple[int, bool], aioredis.BlockingConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_options(db: int, decode_responses: bool) -> Dict[str, Any]:
+    return {
+        "db": db,
+        "decode_responses": decode_responses,
+        "max_connections": settings.redis_max_connections,
+        "timeout": settings.redis_pool_timeout,
+        "socket_connect_timeout": settings.redis_socket_timeout,
+        "socket_timeout": settings.redis_socket_timeout,
+        "health_check_interval": settings.redis_health_check_interval,
+    }
+
+
+def get_sync_redis(db: int, decode_responses: bool = True) -> redis.Redis:
+    """获取共享连接池上的同步客户端"""
+    key = (db, decode_responses)
+    with _pools_lock:
+        pool = _sync_pools.get(key)
+        if pool is None:
+            pool = redis.BlockingConnectionPool.from_url(settings.redis_url, **_pool_options(db, decode_responses))
+            _sync_pools[key] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+def get_async_redis(db: int, decode_responses: bool = True) -> aioredis.Redis:
+    """获取共享连接池上的异步客户端"""
+    key = (db, decode_responses)
+    with _pools_lock:
+        pool = _async_pools.get(key)
+        if pool is None:
+            pool = aioredis.BlockingConnectionPool.from_url(settings.redis_url, **_pool_options(db, decode_responses))
+            _async_pools[key] = pool
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def close_redis_pools():
+    """断开所有连接池"""
+    with _pools_lock:
+        async_pools = list(_async_pools.values())
+        sync_pools = list(_sync_pools.values())
+        _async_pools.clear()
+        _sync_pools.clear()
+    for pool in async_pools:
+        await pool.disconnect()
+    for pool in sync_pools:
+        pool.disconnect()
+    logger.info("Redis connection pools closed")
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """各连接池已创建的连接数"""
+    with _pools_lock:
+        pools = [("sync", key, pool) for key, pool in _sync_pools.items()]
+        pools += [("async", key, pool) for key, pool in _async_pools.items()]
+    return {
+        f"{kind}:db{db}{'' if decode else ':binary'}": {
+            "created_connections": len(getattr(pool, "_connections", [])),
+            "max_connections": pool.max_connections,
+        }
+        for kind, (db, decode), pool in pools
+    }
+
+
+class AutoPipeline:
+    """
+    自动 pipelining 的异步客户端包装
+    get/set 等单键命令先进入队列，在当前事件循环轮次结束时一次性通过 pipeline 发送，
+    asyncio.gather 并发发出的多个缓存读写只产生一次网络往返；其余属性直接转发给底层客户端
+    """
+
+    PIPELINED = frozenset((
+        "get", "set", "setex", "delete", "exists", "expire", "mget", "publish",
+        "hget", "hset", "hgetall", "incr", "ttl",
+    ))
+
+    def __init__(self, client: aioredis.Redis, max_batch: int = 512):
+        self.client = client
+        self.max_batch = max_batch
+        self._queue: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"commands": 0, "round_trips": 0}
+
+    def __getattr__(self, name: str):
+        if name in self.PIPELINED:
+            return lambda *args, **kwargs: self._enqueue(name, args, kwargs)
+        return getattr(self.client, name)
+
+    def _enqueue(self, command: str, args: tuple, kwargs: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((command, args, kwargs, future))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        self._scheduled = False
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, tuple, dict, asyncio.Future]]):
+        self.stats["commands"] += len(batch)
+        self.stats["round_trips"] += 1
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for command, args, kwargs, _ in batch:
+                    getattr(pipe, command)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,13 +1,18 @@
 """
 Prism2 Backend API 主应用
 """
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import init_database
+from app.core.database import AsyncSessionLocal, init_database, close_async_database, get_async_redis_stock
+from app.core.executor import shutdown_executor
+from app.core.metrics import MetricsMiddleware, metrics_response, register_cache_stats
+from app.services.async_stock_service import cache_invalidator, run_search_index_refresher, tier_stats
+from app.utils.serializer import FastJSONResponse
 from app.api.v1 import health, stocks
 
 # 配置日志
@@ -31,10 +36,30 @@ async def lifespan(app: FastAPI):
         logger.error("Database initialization failed")
         raise RuntimeError("Database initialization failed")
 
+    # 订阅L0缓存失效广播
+    if settings.local_cache_enabled:
+        cache_invalidator.start(get_async_redis_stock())
+
+    # 构建股票搜索内存索引并定期增量刷新
+    search_index_task = None
+    if settings.search_index_enabled:
+        search_index_task = asyncio.create_task(
+            run_search_index_refresher(AsyncSessionLocal, settings.search_index_refresh_interval)
+        )
+
     yield
 
     # 关闭时
     logger.info("Shutting down Prism2 Backend API...")
+    if search_index_task is not None:
+        search_index_task.cancel()
+        try:
+            await search_index_task
+        except asyncio.CancelledError:
+            pass
+    await cache_invalidator.stop()
+    await close_async_database()
+    shutdown_executor()
 
 
 # 创建FastAPI应用
@@ -42,9 +67,14 @@ app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="Prism2股票分析平台后端API",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# 请求延迟指标（/metrics）
+app.add_middleware(MetricsMiddleware)
+register_cache_stats(tier_stats.stats)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +98,12 @@ app.include_router(
 )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus指标"""
+    return metrics_response()
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -26,14 +26,15 @@ class StockInfo(StockBase):
 # === <pn ===
 class RealtimeData(BaseModel):
     """<pn"""
-    current_price: float
-    change_amount: float
-    change_percent: float
-    volume: int
-    turnover: float
-    high: float
-    low: float
-    open: float
+    # 停牌等无行情时为 None
+    current_price: Optional[float]
+    change_amount: Optional[float]
+    change_percent: Optional[float]
+    volume: Optional[int]
+    turnover: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    open: Optional[float]
     timestamp: datetime
 
 
@@ -132,6 +133,8 @@ class DashboardData(BaseModel):
     announcements: Optional[List[AnnouncementItem]] = None
     longhubang: Optional[LongHuBangData] = None
     ai_analysis: Optional[AIAnalysis] = None
+    # 各数据类型获取状态: ok / empty / timeout / error / unsupported
+    type_status: Dict[str, str] = {}
 
 
 class DashboardResponse(BaseModel):
@@ -165,6 +168,21 @@ class StockSearchResponse(BaseModel):
     total: int
 
 
+# === 批量查询 ===
+class BatchStockRequest(BaseModel):
+    """批量查询请求"""
+    stock_codes: List[str]
+    period: str = "daily"  # 仅K线使用
+
+
+class BatchResponse(BaseModel):
+    """批量查询响应（format=json），未找到的股票值为 null"""
+    success: bool
+    total: int
+    results: Dict[str, Any]
+    missing: List[str]
+
+
 # === (͔ ===
 class HealthResponse(BaseModel):
     """e͔"""
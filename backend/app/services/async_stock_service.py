@@ -0,0 +1,753 @@
+# -*- coding: utf-8 -*-
+"""
+异步股票数据服务
+三层架构：Redis → PostgreSQL → AKShare，请求路径全程不阻塞事件循环
+- PostgreSQL: SQLAlchemy AsyncSession (asyncpg)
+- Redis: redis.asyncio
+- AKShare: 在有界线程池中执行
+"""
+import asyncio
+import logging
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import date, datetime
+
+from redis.asyncio import Redis
+from sqlalchemy import String, any_, bindparam, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.executor import run_akshare
+from app.core.metrics import DATA_TYPE_LATENCY, TIER_LATENCY, observe, timed_service, timed_tier
+from app.models.stock import Stock
+from app.schemas.stock import (
+    StockInfo, RealtimeData, KLineData, FinancialData,
+    DashboardData, DashboardRequest, StockSearchItem
+)
+from app.services.akshare_service import akshare_service
+from app.services.kline_store import KLineStore, PERIOD_CODES, trading_calendar
+from app.services.stock_universe import bulk_upsert_stocks_async, sync_stock_universe
+from app.utils import cache_envelope, http_cache, kline_codec
+from app.utils.kline_codec import KLineColumns
+from app.utils.local_cache import LocalCache, PubSubInvalidator, TierStats
+from app.utils.search_index import stock_search_index
+
+logger = logging.getLogger(__name__)
+
+# 进程内L0缓存（保存构造好的模型对象），键被重写时经Redis pub/sub跨进程失效
+local_cache = LocalCache(
+    max_entries=settings.local_cache_max_entries,
+    max_bytes=settings.local_cache_max_bytes,
+    default_ttl=settings.local_cache_ttl
+)
+cache_invalidator = PubSubInvalidator(local_cache, settings.cache_invalidation_channel)
+
+# 各层命中统计
+tier_stats = TierStats("index", "l0", "redis", "postgresql", "akshare")
+
+# 进行中的后台缓存刷新（按缓存键去重，并持有任务引用防止被回收）
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _schedule_refresh(cache_key: str, refresh: Callable[[], Awaitable[Any]]):
+    """在后台刷新缓存键，同一键同时只有一个刷新任务"""
+    if cache_key in _refresh_tasks:
+        return
+
+    async def run():
+        try:
+            await refresh()
+        except Exception as e:
+            logger.error(f"Background cache refresh failed for {cache_key}: {e}")
+        finally:
+            _refresh_tasks.pop(cache_key, None)
+
+    _refresh_tasks[cache_key] = asyncio.create_task(run())
+
+
+def _stock_info_from_model(stock: Stock) -> StockInfo:
+    return StockInfo(
+        code=stock.code,
+        name=stock.name,
+        market=stock.market,
+        industry=stock.industry,
+        market_cap=stock.market_cap,
+        pe_ratio=float(stock.pe_ratio) if stock.pe_ratio else None,
+        pb_ratio=float(stock.pb_ratio) if stock.pb_ratio else None
+    )
+
+
+def _stock_record(stock: Stock) -> Dict[str, Any]:
+    return {"code": stock.code, "name": stock.name, "market": stock.market, "industry": stock.industry}
+
+
+async def sync_search_index(session_factory: async_sessionmaker,
+                            since: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    从 stocks 表加载搜索索引
+    since 为空时全量重建，否则只合并 updated_at 晚于 since 的记录；返回新的 updated_at 水位
+    """
+    stmt = select(Stock)
+    if since is not None:
+        stmt = stmt.where(Stock.updated_at > since)
+    async with session_factory() as session:
+        stocks = (await session.execute(stmt)).scalars().all()
+
+    records = [_stock_record(stock) for stock in stocks]
+    if since is None:
+        await asyncio.to_thread(stock_search_index.build, records)
+        logger.info(f"Search index built with {len(records)} stocks")
+    elif records:
+        await asyncio.to_thread(stock_search_index.upsert, records)
+        logger.info(f"Search index refreshed with {len(records)} changed stocks")
+
+    watermarks = [stock.updated_at for stock in stocks if stock.updated_at is not None]
+    return max(watermarks + ([since] if since else []), default=since)
+
+
+async def run_search_index_refresher(session_factory: async_sessionmaker, interval: float):
+    """启动时全量构建搜索索引，之后按间隔增量刷新"""
+    watermark = None
+    built = False
+    while True:
+        try:
+            watermark = await sync_search_index(session_factory, watermark if built else None)
+            built = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Search index refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+class AsyncStockService:
+    """异步股票数据服务 - 三层架构"""
+
+    def __init__(self, session_factory: async_sessionmaker, redis_stock: Redis, redis_search: Redis,
+                 redis_binary: Redis):
+        # 每次数据库操作使用独立会话，便于同一请求内并发访问
+        self.session_factory = session_factory
+        self.redis_stock = redis_stock
+        self.redis_search = redis_search
+        # 不解码的Redis客户端，用于K线二进制缓存
+        self.redis_binary = redis_binary
+        self.kline_store = KLineStore(session_factory)
+
+    @timed_service("async_stock_service")
+    async def search_stocks(self, query: str, limit: int = 10) -> List[StockSearchItem]:
+        """
+        股票搜索
+        三层架构：Redis搜索缓存 → PostgreSQL → AKShare
+        """
+        logger.info(f"Searching stocks with query: {query}")
+
+        # 内存索引：微秒级返回，无结果时再走缓存/数据库/AKShare
+        if settings.search_index_enabled and stock_search_index.ready:
+            results = stock_search_index.search(query, limit)
+            (tier_stats.hit if results else tier_stats.miss)("index")
+            if results:
+                return results
+
+        query_hash = hashlib.md5(f"{query}:{limit}".encode()).hexdigest()
+        cache_key = f"search:{query_hash}"
+
+        try:
+            # 第一层：Redis搜索缓存
+            cached_result = await self._cache_get(
+                self.redis_search, cache_key, "search",
+                lambda: self._load_search(cache_key, query, limit),
+                lambda items: [StockSearchItem(**item) for item in items]
+            )
+            if cached_result is not None:
+                logger.info("Search result found in cache")
+                return cached_result
+
+            return await self._load_search(cache_key, query, limit)
+
+        except Exception as e:
+            logger.error(f"Stock search error: {e}")
+            return []
+
+    async def _load_search(self, cache_key: str, query: str, limit: int) -> List[StockSearchItem]:
+        """搜索第二、三层：PostgreSQL → AKShare，并回写缓存"""
+        start_time = time.time()
+
+        # 第二层：PostgreSQL
+        stocks = await self._search_stocks_from_db(query, limit)
+        if stocks:
+            tier_stats.hit("postgresql")
+            logger.info(f"Found {len(stocks)} stocks from database")
+        else:
+            tier_stats.miss("postgresql")
+            # 第三层：AKShare
+            stocks = await self._search_stocks_from_akshare(query, limit)
+            (tier_stats.hit if stocks else tier_stats.miss)("akshare")
+            if stocks:
+                logger.info(f"Found {len(stocks)} stocks from AKShare")
+                await self._update_stocks_to_db(stocks)
+
+        if stocks:
+            await self._cache_set(
+                self.redis_search, cache_key, "search",
+                [stock.dict() for stock in stocks],
+                settings.cache_ttl_search, time.time() - start_time
+            )
+        return stocks
+
+    @timed_service("async_stock_service")
+    async def get_stock_info(self, stock_code: str) -> Optional[StockInfo]:
+        """
+        获取股票基本信息
+        三层架构：Redis → PostgreSQL → AKShare
+        """
+        logger.info(f"Getting stock info for {stock_code}")
+
+        cache_key = f"stock:info:{stock_code}"
+
+        try:
+            # 第一层：Redis
+            cached_data = await self._cache_get(
+                self.redis_stock, cache_key, "stock_info",
+                lambda: self._load_stock_info(cache_key, stock_code),
+                lambda data: StockInfo(**data)
+            )
+            if cached_data is not None:
+                logger.info("Stock info found in cache")
+                return cached_data
+
+            return await self._load_stock_info(cache_key, stock_code)
+
+        except Exception as e:
+            logger.error(f"Get stock info error for {stock_code}: {e}")
+            return None
+
+    async def _load_stock_info(self, cache_key: str, stock_code: str) -> Optional[StockInfo]:
+        """基本信息第二、三层：PostgreSQL → AKShare，并回写缓存"""
+        start_time = time.time()
+
+        # 第二层：PostgreSQL
+        with observe(TIER_LATENCY, tier="postgresql", data_type="stock_info"):
+            async with self.session_factory() as session:
+                stock = (await session.execute(
+                    select(Stock).where(Stock.code == stock_code)
+                )).scalar_one_or_none()
+
+        if stock:
+            tier_stats.hit("postgresql")
+            logger.info("Stock info found in database")
+            stock_info = _stock_info_from_model(stock)
+        else:
+            tier_stats.miss("postgresql")
+            # 第三层：AKShare
+            logger.info("Fetching stock info from AKShare")
+            stock_info = await run_akshare(akshare_service.get_stock_info, stock_code)
+            (tier_stats.hit if stock_info else tier_stats.miss)("akshare")
+            if stock_info:
+                await self._update_stock_info_to_db(stock_info)
+
+        if stock_info:
+            await self._cache_set(
+                self.redis_stock, cache_key, "stock_info", stock_info.dict(),
+                settings.cache_ttl_stock_info, time.time() - start_time
+            )
+        return stock_info
+
+    @timed_service("async_stock_service")
+    async def get_realtime_data(self, stock_code: str) -> Optional[RealtimeData]:
+        """
+        获取实时行情数据
+        实时数据不走缓存，直接读取AKShare行情快照
+        """
+        logger.info(f"Getting realtime data for {stock_code}")
+
+        try:
+            return await run_akshare(akshare_service.get_realtime_data, stock_code)
+
+        except Exception as e:
+            logger.error(f"Get realtime data error for {stock_code}: {e}")
+            return None
+
+    @timed_service("async_stock_service")
+    async def get_kline_data(self, stock_code: str, period: str = "daily") -> Optional[KLineData]:
+        """
+        获取K线数据
+        三层架构：Redis → PostgreSQL → AKShare
+        """
+        columns = await self.get_kline_columns(stock_code, period)
+        return columns.to_model() if columns is not None else None
+
+    @timed_service("async_stock_service")
+    async def get_kline_columns(self, stock_code: str, period: str = "daily",
+                                start_date: Optional[date] = None,
+                                end_date: Optional[date] = None) -> Optional[KLineColumns]:
+        """
+        获取列式K线数据
+        默认返回最近 kline_default_bars 根，Redis中以二进制列式格式缓存，命中时不构造逐条KLineItem
+        指定日期区间时直接由数据库提供
+        """
+        logger.info(f"Getting K-line data for {stock_code}, period: {period}")
+
+        if start_date or end_date:
+            return await self._get_kline_from_db(stock_code, period, start_date, end_date)
+
+        cache_key = f"stock:kline:{stock_code}:{period}"
+
+        try:
+            # 第一层：Redis
+            columns = await self._cache_get(
+                self.redis_binary, cache_key, "kline",
+                lambda: self._load_kline(cache_key, stock_code, period),
+                lambda data: data,
+                unwrap=kline_codec.decode
+            )
+            if columns is not None:
+                logger.info("K-line data found in cache")
+                return columns
+
+            return await self._load_kline(cache_key, stock_code, period)
+
+        except Exception as e:
+            logger.error(f"Get K-line data error for {stock_code}: {e}")
+            return None
+
+    async def _load_kline(self, cache_key: str, stock_code: str, period: str) -> Optional[KLineColumns]:
+        """K线第二、三层：PostgreSQL（缺失部分由AKShare增量补齐），并回写缓存"""
+        start_time = time.time()
+
+        columns = await self._get_kline_from_db(stock_code, period)
+        if columns is None:
+            return None
+
+        # 写入时生成一次响应体和ETag，之后的条件请求只需读取ETag旁路键
+        etag = None
+        if settings.http_etag_enabled:
+            body = columns.to_json()
+            etag = http_cache.content_etag(body)
+            if settings.response_cache_enabled:
+                http_cache.response_cache.set(etag, body, size=len(body))
+
+        await self._cache_set(
+            self.redis_binary, cache_key, "kline", columns,
+            settings.cache_ttl_kline, time.time() - start_time,
+            encode=kline_codec.encode, etag=etag
+        )
+        return columns
+
+    async def get_kline_etag(self, stock_code: str, period: str = "daily") -> Optional[str]:
+        """
+        读取默认K线缓存的ETag，不读取K线数据
+        软过期时与正常读取一样触发后台刷新；未缓存时返回None
+        """
+        cache_key = f"stock:kline:{stock_code}:{period}"
+        marker = http_cache.parse_etag_marker(await self.redis_binary.get(http_cache.etag_key(cache_key)))
+        if marker is None:
+            return None
+
+        etag, soft_expires_at = marker
+        if time.time() >= soft_expires_at:
+            _schedule_refresh(cache_key, lambda: self._load_kline(cache_key, stock_code, period))
+        return etag
+
+    @timed_service("async_stock_service")
+    async def get_stock_info_batch(self, stock_codes: List[str]) -> Dict[str, Optional[StockInfo]]:
+        """
+        批量获取股票基本信息
+        Redis 一次 MGET → PostgreSQL 一次 code = ANY(...) 查询 → 剩余股票并发从AKShare获取
+        """
+        cache_keys = {code: f"stock:info:{code}" for code in stock_codes}
+        results: Dict[str, Optional[StockInfo]] = await self._cache_get_many(
+            self.redis_stock, cache_keys, "stock_info",
+            lambda code: lambda: self._load_stock_info(cache_keys[code], code),
+            lambda data: StockInfo(**data)
+        )
+
+        missing = [code for code in stock_codes if code not in results]
+        if not missing:
+            return results
+
+        start_time = time.time()
+        async with self.session_factory() as session:
+            stocks = (await session.execute(
+                select(Stock).where(Stock.code == any_(bindparam("codes", missing, type_=ARRAY(String))))
+            )).scalars().all()
+        loaded = {stock.code: _stock_info_from_model(stock) for stock in stocks}
+        for code in missing:
+            (tier_stats.hit if code in loaded else tier_stats.miss)("postgresql")
+
+        semaphore = asyncio.Semaphore(settings.batch_load_concurrency)
+
+        async def from_akshare(code: str) -> Optional[StockInfo]:
+            async with semaphore:
+                try:
+                    stock_info = await run_akshare(akshare_service.get_stock_info, code)
+                except Exception as e:
+                    logger.error(f"Batch stock info error for {code}: {e}")
+                    return None
+            (tier_stats.hit if stock_info else tier_stats.miss)("akshare")
+            if stock_info:
+                await self._update_stock_info_to_db(stock_info)
+            return stock_info
+
+        remaining = [code for code in missing if code not in loaded]
+        for code, stock_info in zip(remaining, await asyncio.gather(*(from_akshare(c) for c in remaining))):
+            if stock_info:
+                loaded[code] = stock_info
+
+        await self._cache_set_many(
+            self.redis_stock, "stock_info",
+            {cache_keys[code]: stock_info.dict() for code, stock_info in loaded.items()},
+            settings.cache_ttl_stock_info, time.time() - start_time
+        )
+        results.update(loaded)
+        return {code: results.get(code) for code in stock_codes}
+
+    @timed_service("async_stock_service")
+    async def get_realtime_batch(self, stock_codes: List[str]) -> Dict[str, Optional[RealtimeData]]:
+        """批量获取实时行情：所有股票读取同一份全市场快照"""
+        try:
+            return await run_akshare(akshare_service.get_realtime_batch, stock_codes)
+        except Exception as e:
+            logger.error(f"Batch realtime data error: {e}")
+            return {code: None for code in stock_codes}
+
+    @timed_service("async_stock_service")
+    async def get_kline_batch(self, stock_codes: List[str], period: str = "daily") -> Dict[str, Optional[KLineColumns]]:
+        """
+        批量获取列式K线数据
+        Redis 一次 MGET；未命中的股票并发走 PostgreSQL/AKShare 增量补齐
+        """
+        cache_keys = {code: f"stock:kline:{code}:{period}" for code in stock_codes}
+        results: Dict[str, Optional[KLineColumns]] = await self._cache_get_many(
+            self.redis_binary, cache_keys, "kline",
+            lambda code: lambda: self._load_kline(cache_keys[code], code, period),
+            lambda data: data,
+            unwrap=kline_codec.decode
+        )
+
+        semaphore = asyncio.Semaphore(settings.batch_load_concurrency)
+
+        async def load(code: str) -> Optional[KLineColumns]:
+            async with semaphore:
+                try:
+                    return await self._load_kline(cache_keys[code], code, period)
+                except Exception as e:
+                    logger.error(f"Batch K-line error for {code}: {e}")
+                    return None
+
+        missing = [code for code in stock_codes if code not in results]
+        results.update(zip(missing, await asyncio.gather(*(load(code) for code in missing))))
+        return {code: results.get(code) for code in stock_codes}
+
+    @timed_service("async_stock_service")
+    async def get_dashboard_data(self, request: DashboardRequest) -> DashboardData:
+        """
+        获取Dashboard聚合数据
+        各数据类型并发获取，每种类型独立超时，慢数据源只影响自身字段
+        """
+        logger.info(f"Getting dashboard data for {request.stock_code}")
+
+        dashboard_data = DashboardData()
+        fetchers = {
+            "basic_info": self.get_stock_info,
+            "realtime": self.get_realtime_data,
+            "kline": self.get_kline_data,
+            "financial": self.get_financial_data,
+            "news": self.get_stock_news,
+            "announcements": self.get_announcements,
+            "longhubang": self.get_longhubang_data,
+            "ai_analysis": self.get_ai_analysis,
+        }
+
+        data_types = [t for t in dict.fromkeys(request.data_types) if t in fetchers]
+        for data_type in request.data_types:
+            if data_type not in fetchers:
+                logger.warning(f"Unknown data type: {data_type}")
+                dashboard_data.type_status[data_type] = "unsupported"
+
+        results = await asyncio.gather(*(
+            self._fetch_with_budget(data_type, fetchers[data_type](request.stock_code))
+            for data_type in data_types
+        ))
+
+        for data_type, (status, value) in zip(data_types, results):
+            dashboard_data.type_status[data_type] = status
+            if status == "ok":
+                setattr(dashboard_data, data_type, value)
+
+        return dashboard_data
+
+    async def _fetch_with_budget(self, data_type: str, coro) -> Tuple[str, Any]:
+        """在该数据类型的超时预算内执行获取，返回 (状态, 数据)"""
+        timeout = settings.dashboard_type_timeouts.get(data_type, settings.dashboard_type_timeout)
+        start = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(coro, timeout=timeout)
+            status = "ok" if value is not None else "empty"
+        except asyncio.TimeoutError:
+            logger.warning(f"Dashboard {data_type} timed out after {timeout}s")
+            status, value = "timeout", None
+        except Exception as e:
+            logger.error(f"Error getting dashboard {data_type}: {e}")
+            status, value = "error", None
+
+        DATA_TYPE_LATENCY.labels(data_type=data_type, status=status).observe(time.perf_counter() - start)
+        return status, value
+
+    # === 内部方法 ===
+
+    async def _cache_get(self, redis: Redis, cache_key: str, data_type: str,
+                         refresh: Callable[[], Awaitable[Any]],
+                         build: Callable[[Any], Any],
+                         unwrap: Callable[[Any], Optional[cache_envelope.CacheEntry]] = cache_envelope.unwrap
+                         ) -> Optional[Any]:
+        """
+        读取缓存：L0进程内缓存 → Redis缓存信封
+        build 将缓存数据构造为返回对象；Redis新鲜命中时结果回填L0
+        unwrap 解析Redis中的原始值（JSON信封或K线二进制格式）
+        软过期或XFetch命中时返回旧值并后台刷新
+        """
+        if settings.local_cache_enabled:
+            value = local_cache.get(cache_key)
+            if value is not None:
+                tier_stats.hit("l0")
+                return value
+            tier_stats.miss("l0")
+
+        with observe(TIER_LATENCY, tier="redis", data_type=data_type):
+            raw = await redis.get(cache_key)
+        return self._cache_value(cache_key, data_type, raw, refresh, build, unwrap)
+
+    def _cache_value(self, cache_key: str, data_type: str, raw: Any,
+                     refresh: Callable[[], Awaitable[Any]],
+                     build: Callable[[Any], Any],
+                     unwrap: Callable[[Any], Optional[cache_envelope.CacheEntry]]) -> Optional[Any]:
+        """解析Redis原始值并判断新鲜度，新鲜命中回填L0，过期则后台刷新"""
+        entry = unwrap(raw)
+        if entry is None:
+            tier_stats.miss("redis")
+            return None
+        tier_stats.hit("redis")
+
+        value = build(entry.value)
+        state = cache_envelope.evaluate(entry, settings.cache_xfetch_beta.get(data_type, 1.0))
+        if state != cache_envelope.FRESH:
+            logger.info(f"Cache {state} for {cache_key}, refreshing in background")
+            _schedule_refresh(cache_key, refresh)
+        elif settings.local_cache_enabled:
+            # L0条目不晚于软过期时间失效
+            ttl = min(settings.local_cache_ttl, entry.soft_expires_at - time.time())
+            local_cache.set(cache_key, value, size=len(raw), ttl=ttl)
+        return value
+
+    async def _cache_set(self, redis: Redis, cache_key: str, data_type: str,
+                         value: Any, ttl: int, delta: float,
+                         encode: Callable[[Any, int, float], Any] = cache_envelope.wrap,
+                         etag: Optional[str] = None):
+        """
+        写入缓存信封：软TTL为ttl，Redis key在软TTL+宽限期后过期；同时广播L0失效
+        给出 etag 时同时写入ETag旁路键，过期时间与数据一致
+        """
+        hard_ttl = cache_envelope.hard_ttl(ttl, settings.cache_stale_grace.get(data_type, 0))
+        writes = [redis.setex(cache_key, hard_ttl, encode(value, ttl, delta))]
+        if etag is not None:
+            marker = http_cache.etag_marker(etag, time.time() + ttl)
+            writes.append(redis.setex(http_cache.etag_key(cache_key), hard_ttl, marker))
+        await asyncio.gather(*writes)
+        if settings.local_cache_enabled:
+            await cache_invalidator.publish(redis, cache_key)
+
+    async def _cache_get_many(self, redis: Redis, cache_keys: Dict[str, str], data_type: str,
+                              refresh: Callable[[str], Callable[[], Awaitable[Any]]],
+                              build: Callable[[Any], Any],
+                              unwrap: Callable[[Any], Optional[cache_envelope.CacheEntry]] = cache_envelope.unwrap
+                              ) -> Dict[str, Any]:
+        """
+        批量读取缓存：L0 → 一次 MGET
+        cache_keys 为 股票代码 -> 缓存键，refresh(code) 返回该股票的后台刷新函数；返回命中的 股票代码 -> 值
+        """
+        found: Dict[str, Any] = {}
+        pending = []
+        for code, cache_key in cache_keys.items():
+            if settings.local_cache_enabled:
+                value = local_cache.get(cache_key)
+                if value is not None:
+                    tier_stats.hit("l0")
+                    found[code] = value
+                    continue
+                tier_stats.miss("l0")
+            pending.append(code)
+
+        if pending:
+            with observe(TIER_LATENCY, tier="redis", data_type=data_type):
+                raws = await redis.mget([cache_keys[code] for code in pending])
+            for code, raw in zip(pending, raws):
+                value = self._cache_value(cache_keys[code], data_type, raw, refresh(code), build, unwrap)
+                if value is not None:
+                    found[code] = value
+        return found
+
+    async def _cache_set_many(self, redis: Redis, data_type: str, values: Dict[str, Any],
+                              ttl: int, delta: float,
+                              encode: Callable[[Any, int, float], Any] = cache_envelope.wrap):
+        """批量写入缓存信封：一次 pipeline 写入，一次 pipeline 广播L0失效"""
+        if not values:
+            return
+        hard_ttl = cache_envelope.hard_ttl(ttl, settings.cache_stale_grace.get(data_type, 0))
+        async with redis.pipeline(transaction=False) as pipe:
+            for cache_key, value in values.items():
+                pipe.setex(cache_key, hard_ttl, encode(value, ttl, delta))
+            await pipe.execute()
+        if settings.local_cache_enabled:
+            await cache_invalidator.publish_many(redis, list(values))
+
+    @timed_tier("postgresql", data_type=lambda *args, **kwargs: "search")
+    async def _search_stocks_from_db(self, query: str, limit: int) -> List[StockSearchItem]:
+        """从数据库搜索股票"""
+        try:
+            if settings.search_use_pg_trgm:
+                # 由 idx_stocks_code_trgm / idx_stocks_name_trgm (GIN gin_trgm_ops) 支持
+                similarity = func.greatest(func.similarity(Stock.code, query), func.similarity(Stock.name, query))
+                stmt = select(Stock).where(or_(
+                    Stock.code.ilike(f"%{query}%"),
+                    Stock.name.ilike(f"%{query}%"),
+                    Stock.name.op("%")(query)
+                )).order_by(similarity.desc(), Stock.code)
+            else:
+                stmt = select(Stock).where(or_(
+                    Stock.code.like(f"%{query}%"),
+                    Stock.name.like(f"%{query}%")
+                ))
+
+            async with self.session_factory() as session:
+                stocks = (await session.execute(stmt.limit(limit))).scalars().all()
+
+            return [
+                StockSearchItem(
+                    code=stock.code,
+                    name=stock.name,
+                    market=stock.market,
+                    industry=stock.industry
+                ) for stock in stocks
+            ]
+        except Exception as e:
+            logger.error(f"Database search error: {e}")
+            return []
+
+    async def _search_stocks_from_akshare(self, query: str, limit: int) -> List[StockSearchItem]:
+        """从AKShare搜索股票"""
+        try:
+            stocks_data = await run_akshare(akshare_service.get_stock_list)
+            # 全量列表并入索引，后续查询直接命中内存索引
+            await asyncio.to_thread(stock_search_index.upsert, stocks_data)
+            return stock_search_index.search(query, limit)
+        except Exception as e:
+            logger.error(f"AKShare search error: {e}")
+            return []
+
+    async def _update_stocks_to_db(self, stocks: List[StockSearchItem]):
+        """保存股票列表到数据库（批量 upsert）"""
+        try:
+            count = await bulk_upsert_stocks_async(self.session_factory, stocks)
+            stock_search_index.upsert(stock.dict() for stock in stocks)
+            logger.info(f"Updated {count} stocks to database")
+        except Exception as e:
+            logger.error(f"Update stocks to DB error: {e}")
+
+    async def sync_stock_universe(self) -> int:
+        """同步全市场股票列表到 stocks 表"""
+        return await sync_stock_universe(self.session_factory)
+
+    async def _update_stock_info_to_db(self, stock_info: StockInfo):
+        """保存股票基本信息到数据库"""
+        async with self.session_factory() as session:
+            try:
+                existing = await session.get(Stock, stock_info.code)
+                if existing:
+                    existing.name = stock_info.name
+                    existing.market = stock_info.market
+                    existing.industry = stock_info.industry
+                    existing.market_cap = stock_info.market_cap
+                    existing.pe_ratio = stock_info.pe_ratio
+                    existing.pb_ratio = stock_info.pb_ratio
+                    existing.updated_at = datetime.now()
+                else:
+                    session.add(Stock(
+                        code=stock_info.code,
+                        name=stock_info.name,
+                        market=stock_info.market,
+                        industry=stock_info.industry,
+                        market_cap=stock_info.market_cap,
+                        pe_ratio=stock_info.pe_ratio,
+                        pb_ratio=stock_info.pb_ratio
+                    ))
+                await session.commit()
+            except Exception as e:
+                logger.error(f"Update stock info to DB error: {e}")
+                await session.rollback()
+
+    async def _get_kline_from_db(self, stock_code: str, period: str,
+                                 start_date: Optional[date] = None,
+                                 end_date: Optional[date] = None) -> Optional[KLineColumns]:
+        """
+        从数据库获取K线数据
+        先按最后一根K线从AKShare增量补齐缺失尾部，再由 ohlcv_data 提供区间查询
+        """
+        if period not in PERIOD_CODES:
+            return None
+
+        fetched = None
+        try:
+            # 交易日历每天加载一次，节假日不会被当作缺失的交易日反复向AKShare补齐
+            if trading_calendar.stale():
+                await run_akshare(trading_calendar.refresh)
+            last_bar = await self.kline_store.last_bar_date(stock_code, period)
+            fetch_start = self.kline_store.fetch_start(last_bar, period)
+            if fetch_start is None:
+                tier_stats.hit("postgresql")
+            else:
+                tier_stats.miss("postgresql")
+                logger.info(f"Fetching {period} K-line for {stock_code} from AKShare since {fetch_start}")
+                fetched = await run_akshare(self.kline_store.sync_from_akshare, stock_code, period, fetch_start)
+                (tier_stats.hit if fetched else tier_stats.miss)("akshare")
+                if fetched:
+                    await self.kline_store.replace_from(stock_code, period, fetch_start, *fetched)
+
+            limit = None if (start_date or end_date) else settings.kline_default_bars
+            with observe(TIER_LATENCY, tier="postgresql", data_type="kline"):
+                return await self.kline_store.get_range(stock_code, period, start_date, end_date, limit)
+
+        except Exception as e:
+            logger.error(f"Get K-line from DB error: {e}")
+            # 数据库不可用时直接返回本次下载的最新数据
+            if fetched and not (start_date or end_date):
+                return fetched[0].tail(settings.kline_default_bars)
+            return None
+
+    # === 其他数据类型（待实现，暂时返回None） ===
+
+    async def get_financial_data(self, stock_code: str) -> Optional[FinancialData]:
+        """获取财务数据"""
+        # TODO: 实现财务数据获取
+        return None
+
+    async def get_stock_news(self, stock_code: str) -> Optional[List]:
+        """获取股票新闻"""
+        # TODO: 实现新闻数据获取
+        return None
+
+    async def get_announcements(self, stock_code: str) -> Optional[List]:
+        """获取公司公告"""
+        # TODO: 实现公告数据获取
+        return None
+
+    async def get_longhubang_data(self, stock_code: str) -> Optional[dict]:
+        """获取龙虎榜数据"""
+        # TODO: 实现龙虎榜数据获取
+        return None
+
+    async def get_ai_analysis(self, stock_code: str) -> Optional[dict]:
+        """获取AI分析数据"""
+        # TODO: 实现AI分析数据获取
+        return None
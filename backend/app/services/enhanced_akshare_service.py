@@ -3,10 +3,8 @@
 增强的AKShare服务 - 集成完整日志记录
 """
 import logging
-import time
 import os
 from typing import List, Dict, Any, Optional
-from functools import wraps
 import pandas as pd
 
 try:
@@ -15,7 +13,10 @@ try:
 except ImportError:
     AKSHARE_AVAILABLE = False
 
+from app.core.rate_limiter import akshare_limiter
 from app.utils.logger import akshare_logger, log_akshare_calls
+from app.services.market_snapshot import market_snapshot
+from app.utils.stock_codes import frame_to_records, item_value_dict, stock_list_records
 
 logger = logging.getLogger(__name__)
 
@@ -28,28 +29,6 @@ def clear_proxy_for_akshare():
             del os.environ[var]
 
 
-def rate_limit(calls_per_minute: int = 30):
-    """AKShare API频率限制装饰器"""
-    def decorator(func):
-        last_called = [0.0]
-
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            elapsed = time.time() - last_called[0]
-            wait_time = 60.0 / calls_per_minute
-
-            if elapsed < wait_time:
-                sleep_time = wait_time - elapsed
-                logger.info(f"Rate limiting: sleeping {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-
-            last_called[0] = time.time()
-            return func(*args, **kwargs)
-
-        return wrapper
-    return decorator
-
-
 class EnhancedAKShareService:
     """增强的AKShare服务，集成完整日志记录"""
 
@@ -62,7 +41,6 @@ class EnhancedAKShareService:
             logger.info("AKShare service initialized with logging")
 
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_stock_list(self) -> List[Dict[str, Any]]:
         """
         获取股票列表
@@ -73,27 +51,9 @@ class EnhancedAKShareService:
 
         try:
             logger.info("Fetching stock list from AKShare")
-            df = ak.stock_info_a_code_name()
-
-            stocks = []
-            for _, row in df.iterrows():
-                # AKShare返回的数据格式处理
-                code = str(row.get('code', '')).zfill(6)
-                name = str(row.get('name', ''))
-
-                # 判断市场
-                if code.startswith(('60', '68', '90')):
-                    market = 'SH'
-                elif code.startswith(('00', '30')):
-                    market = 'SZ'
-                else:
-                    market = 'OTHER'
-
-                stocks.append({
-                    "code": code,
-                    "name": name,
-                    "market": market
-                })
+            df = akshare_limiter.call(ak.stock_info_a_code_name)
+
+            stocks = stock_list_records(df)
 
             logger.info(f"Retrieved {len(stocks)} stocks from AKShare")
             return stocks
@@ -103,7 +63,6 @@ class EnhancedAKShareService:
             return self._get_mock_stock_list()
 
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_stock_info(self, stock_code: str) -> Optional[Dict[str, Any]]:
         """获取股票基本信息"""
         if not AKSHARE_AVAILABLE:
@@ -113,15 +72,11 @@ class EnhancedAKShareService:
             logger.info(f"Fetching stock info for {stock_code}")
 
             # 获取股票基本信息
-            info_df = ak.stock_individual_info_em(symbol=stock_code)
+            info_df = akshare_limiter.call(ak.stock_individual_info_em, symbol=stock_code)
 
             if info_df is not None and not info_df.empty:
                 # 转换为字典格式
-                info_dict = {}
-                for _, row in info_df.iterrows():
-                    item = row.get('item', '')
-                    value = row.get('value', '')
-                    info_dict[item] = value
+                info_dict = item_value_dict(info_df)
 
                 result = {
                     "code": stock_code,
@@ -140,48 +95,36 @@ class EnhancedAKShareService:
 
         return None
 
-    @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_realtime_data(self, stock_code: str) -> Optional[Dict[str, Any]]:
-        """获取股票实时数据"""
+        """获取股票实时数据 - 从全市场行情快照读取"""
         if not AKSHARE_AVAILABLE:
             return self._get_mock_realtime_data(stock_code)
 
         try:
-            logger.info(f"Fetching realtime data for {stock_code}")
-
-            # 获取实时数据
-            realtime_df = ak.stock_zh_a_spot_em()
-
-            if realtime_df is not None and not realtime_df.empty:
-                # 查找指定股票
-                stock_data = realtime_df[realtime_df['代码'] == stock_code]
-
-                if not stock_data.empty:
-                    row = stock_data.iloc[0]
-                    result = {
-                        "code": stock_code,
-                        "current_price": float(row.get('最新价', 0)),
-                        "change_amount": float(row.get('涨跌额', 0)),
-                        "change_percent": float(row.get('涨跌幅', 0)),
-                        "volume": int(row.get('成交量', 0)),
-                        "turnover": float(row.get('成交额', 0)),
-                        "high": float(row.get('最高', 0)),
-                        "low": float(row.get('最低', 0)),
-                        "open": float(row.get('今开', 0))
-                    }
-
-                    logger.info(f"Successfully retrieved realtime data for {stock_code}: {result['current_price']}")
-                    return result
+            row = market_snapshot.get(stock_code)
+            if row is None:
+                logger.warning(f"Stock {stock_code} not found in realtime snapshot")
+                return None
+
+            result = {
+                "code": stock_code,
+                "current_price": row.get('current_price', 0.0),
+                "change_amount": row.get('change_amount', 0.0),
+                "change_percent": row.get('change_percent', 0.0),
+                "volume": row.get('volume', 0),
+                "turnover": row.get('turnover', 0.0),
+                "high": row.get('high', 0.0),
+                "low": row.get('low', 0.0),
+                "open": row.get('open', 0.0),
+                "snapshot_time": row['snapshot_time']
+            }
+            return result
 
         except Exception as e:
             logger.error(f"AKShare realtime data error for {stock_code}: {e}")
             return self._get_mock_realtime_data(stock_code)
 
-        return None
-
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_historical_data(self, stock_code: str, period: str = "daily", start_date: str = None, end_date: str = None) -> Optional[pd.DataFrame]:
         """获取历史K线数据"""
         if not AKSHARE_AVAILABLE:
@@ -197,7 +140,8 @@ class EnhancedAKShareService:
                 start_date = (pd.Timestamp.now() - pd.Timedelta(days=30)).strftime("%Y%m%d")
 
             # 获取历史数据
-            hist_df = ak.stock_zh_a_hist(
+            hist_df = akshare_limiter.call(
+                ak.stock_zh_a_hist,
                 symbol=stock_code,
                 period=period,
                 start_date=start_date,
@@ -216,7 +160,6 @@ class EnhancedAKShareService:
         return None
 
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_financial_data(self, stock_code: str) -> Optional[Dict[str, Any]]:
         """获取财务数据"""
         if not AKSHARE_AVAILABLE:
@@ -226,7 +169,7 @@ class EnhancedAKShareService:
             logger.info(f"Fetching financial data for {stock_code}")
 
             # 获取财务数据
-            financial_df = ak.stock_financial_em(symbol=stock_code)
+            financial_df = akshare_limiter.call(ak.stock_financial_em, symbol=stock_code)
 
             if financial_df is not None and not financial_df.empty:
                 # 获取最新一期数据
@@ -251,7 +194,6 @@ class EnhancedAKShareService:
         return None
 
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_shareholders_data(self, stock_code: str) -> Optional[List[Dict[str, Any]]]:
         """获取股东数据"""
         if not AKSHARE_AVAILABLE:
@@ -261,17 +203,15 @@ class EnhancedAKShareService:
             logger.info(f"Fetching shareholders data for {stock_code}")
 
             # 获取十大股东数据
-            shareholders_df = ak.stock_zh_a_gdhs(symbol=stock_code)
+            shareholders_df = akshare_limiter.call(ak.stock_zh_a_gdhs, symbol=stock_code)
 
             if shareholders_df is not None and not shareholders_df.empty:
-                shareholders = []
-                for _, row in shareholders_df.iterrows():
-                    shareholders.append({
-                        "shareholder_name": str(row.get('股东名称', '')),
-                        "holding_ratio": float(row.get('持股比例', 0)),
-                        "holding_count": int(row.get('持股数量', 0)),
-                        "shareholder_type": str(row.get('股东性质', ''))
-                    })
+                shareholders = frame_to_records(
+                    shareholders_df,
+                    {'股东名称': 'shareholder_name', '持股比例': 'holding_ratio',
+                     '持股数量': 'holding_count', '股东性质': 'shareholder_type'},
+                    {'holding_ratio': 'float', 'holding_count': 'int'}
+                )
 
                 logger.info(f"Successfully retrieved {len(shareholders)} shareholders for {stock_code}")
                 return shareholders
@@ -283,7 +223,6 @@ class EnhancedAKShareService:
         return None
 
     @log_akshare_calls(akshare_logger)
-    @rate_limit(calls_per_minute=30)
     def get_longhubang_data(self, stock_code: str) -> Optional[List[Dict[str, Any]]]:
         """获取龙虎榜数据"""
         if not AKSHARE_AVAILABLE:
@@ -293,19 +232,15 @@ class EnhancedAKShareService:
             logger.info(f"Fetching longhubang data for {stock_code}")
 
             # 获取龙虎榜数据
-            longhubang_df = ak.stock_lhb_detail_em(symbol=stock_code)
+            longhubang_df = akshare_limiter.call(ak.stock_lhb_detail_em, symbol=stock_code)
 
             if longhubang_df is not None and not longhubang_df.empty:
-                longhubang_records = []
-                for _, row in longhubang_df.iterrows():
-                    longhubang_records.append({
-                        "trade_date": str(row.get('交易日期', '')),
-                        "rank": int(row.get('序号', 0)),
-                        "营业部": str(row.get('营业部名称', '')),
-                        "buy_amount": float(row.get('买入金额', 0)),
-                        "sell_amount": float(row.get('卖出金额', 0)),
-                        "net_amount": float(row.get('净买额', 0))
-                    })
+                longhubang_records = frame_to_records(
+                    longhubang_df,
+                    {'交易日期': 'trade_date', '序号': 'rank', '营业部名称': '营业部',
+                     '买入金额': 'buy_amount', '卖出金额': 'sell_amount', '净买额': 'net_amount'},
+                    {'rank': 'int', 'buy_amount': 'float', 'sell_amount': 'float', 'net_amount': 'float'}
+                )
 
                 logger.info(f"Successfully retrieved {len(longhubang_records)} longhubang records for {stock_code}")
                 return longhubang_records
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+技术指标存储服务
+指标由 app/utils/indicators.py 对 stock_kline_daily 整批计算后写入 stock_technical_indicators，
+查询只读表，不再现算
+
+- rebuild_indicators: 按股票分块全量计算（整个股票池或指定股票）
+- update_indicators: 增量计算，只读取最近 CONTEXT_BARS 根历史K线和保存的递推状态
+- 每只股票最新一行的 state 列保存进入该K线之前的递推状态，增量更新时重算该K线，
+  盘中被覆盖更新的当日K线因此也能得到正确的指标
+"""
+import logging
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from psycopg2.extras import Json, execute_values
+
+from app.core.db_pool import pg_connection
+from app.utils.indicators import CONTEXT_BARS, INDICATOR_COLUMNS, IndicatorState, compute, pad_left
+
+logger = logging.getLogger(__name__)
+
+# 全量计算时每次载入的股票数
+REBUILD_CHUNK_SIZE = 500
+# execute_values 每条 INSERT 的行数
+UPSERT_PAGE_SIZE = 2000
+
+_UPSERT_SQL = f"""
+    INSERT INTO stock_technical_indicators (stock_code, trade_date, {", ".join(INDICATOR_COLUMNS)}, state)
+    VALUES %s
+    ON CONFLICT (stock_code, trade_date) DO UPDATE SET
+    {", ".join(f"{name} = EXCLUDED.{name}" for name in INDICATOR_COLUMNS)},
+    state = EXCLUDED.state,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+# (股票代码, 交易日列表, 最高价, 最低价, 收盘价)
+Bars = Tuple[str, List[Any], List[float], List[float], List[float]]
+
+
+def _group_bars(rows: Iterable[tuple]) -> List[Bars]:
+    """按股票代码分组，rows 须按 (stock_code, trade_date) 排序"""
+    result = []
+    for code, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        result.append((
+            code,
+            [row[1] for row in group],
+            [row[2] for row in group],
+            [row[3] for row in group],
+            [row[4] for row in group],
+        ))
+    return result
+
+
+def _compute_rows(bars: List[Bars], state: Optional[IndicatorState] = None,
+                  count: Optional[int] = None) -> List[tuple]:
+    """
+    计算各股票最后 count 根K线（默认全部）的指标行，各股票右对齐后第 -count 列之前的递推状态为 state
+    最后一行附带进入最后一根K线之前的递推状态
+    """
+    length = max(len(dates) for _, dates, *_ in bars)
+    count = count or length
+    high, low, close = (pad_left([b[i] for b in bars], length) for i in (2, 3, 4))
+
+    # 先算到倒数第二根K线得到进入最后一根K线的状态，再用最近的窗口算最后一根
+    head, entry_state = compute(high[:, :-1], low[:, :-1], close[:, :-1], state, length - count)
+    window = max(length - CONTEXT_BARS - 1, 0)
+    tail, _ = compute(high[:, window:], low[:, window:], close[:, window:], entry_state, length - 1 - window)
+    values = np.concatenate([
+        np.stack([head[name] for name in INDICATOR_COLUMNS], axis=-1),
+        np.stack([tail[name] for name in INDICATOR_COLUMNS], axis=-1),
+    ], axis=1)
+    # NaN 写为 NULL
+    values = np.where(np.isnan(values), None, values.astype(object))
+    states = entry_state.to_dicts()
+
+    rows = []
+    for i, (code, dates, *_) in enumerate(bars):
+        out_dates = dates[-count:]
+        for j, trade_date in enumerate(out_dates, start=count - len(out_dates)):
+            state_json = Json(states[i]) if j == count - 1 else None
+            rows.append((code, trade_date, *values[i, j], state_json))
+    return rows
+
+
+def _upsert(cursor, rows: List[tuple]):
+    if rows:
+        execute_values(cursor, _UPSERT_SQL, rows, page_size=UPSERT_PAGE_SIZE)
+
+
+def _all_codes(cursor) -> List[str]:
+    cursor.execute("SELECT DISTINCT stock_code FROM stock_kline_daily ORDER BY stock_code")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_indicators(codes: Optional[List[str]] = None, db_config: Optional[Dict[str, Any]] = None,
+                       chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """全量计算指定股票（默认全部股票）的指标，返回写入行数"""
+    total = 0
+    with pg_connection(db_config) as conn:
+        cursor = conn.cursor()
+        codes = codes if codes is not None else _all_codes(cursor)
+        for i in range(0, len(codes), chunk_size):
+            cursor.execute(
+                """SELECT stock_code, trade_date, high_price::float8, low_price::float8, close_price::float8
+                   FROM stock_kline_daily
+                   WHERE stock_code = ANY(%s)
+                   ORDER BY stock_code, trade_date""",
+                (codes[i:i + chunk_size],)
+            )
+            bars = _group_bars(cursor.fetchall())
+            if not bars:
+                continue
+            rows = _compute_rows(bars)
+            _upsert(cursor, rows)
+            conn.commit()
+            total += len(rows)
+            logger.info(f"Indicators rebuilt for {len(bars)} stocks ({len(rows)} rows)")
+        cursor.close()
+    return total
+
+
+def update_indicators(codes: Optional[List[str]] = None, db_config: Optional[Dict[str, Any]] = None) -> int:
+    """
+    增量计算指定股票（默认全部股票）新到达的K线，返回写入行数
+    没有保存状态的股票转为全量计算
+    """
+    with pg_connection(db_config) as conn:
+        cursor = conn.cursor()
+        codes = codes if codes is not None else _all_codes(cursor)
+        if not codes:
+            cursor.close()
+            return 0
+
+        cursor.execute(
+            """SELECT DISTINCT ON (stock_code) stock_code, trade_date, state
+               FROM stock_technical_indicators
+               WHERE stock_code = ANY(%s) AND state IS NOT NULL
+               ORDER BY stock_code, trade_date DESC""",
+            (codes,)
+        )
+        saved = {code: (last_date, state) for code, last_date, state in cursor.fetchall()}
+
+        total = 0
+        updated = set()
+        if saved:
+            saved_codes = list(saved)
+            # 每只股票：最后已计算K线及之前 CONTEXT_BARS 根，加上之后的全部新K线
+            cursor.execute(
+                """SELECT s.stock_code, k.trade_date, k.high_price::float8, k.low_price::float8, k.close_price::float8
+                   FROM unnest(%s::varchar[], %s::date[]) AS s(stock_code, last_date)
+                   CROSS JOIN LATERAL (
+                       (SELECT trade_date, high_price, low_price, close_price
+                        FROM stock_kline_daily
+                        WHERE stock_code = s.stock_code AND trade_date <= s.last_date
+                        ORDER BY trade_date DESC
+                        LIMIT %s)
+                       UNION ALL
+                       (SELECT trade_date, high_price, low_price, close_price
+                        FROM stock_kline_daily
+                        WHERE stock_code = s.stock_code AND trade_date > s.last_date)
+                   ) k
+                   ORDER BY s.stock_code, k.trade_date""",
+                (saved_codes, [saved[code][0] for code in saved_codes], CONTEXT_BARS + 1)
+            )
+
+            # 按新K线数分组，同组股票右对齐后列布局相同，可一起计算
+            groups: Dict[int, List[Bars]] = defaultdict(list)
+            for bars in _group_bars(cursor.fetchall()):
+                last_date = saved[bars[0]][0]
+                new_bars = sum(1 for trade_date in bars[1] if trade_date > last_date)
+                if bars[1][-1 - new_bars] == last_date:
+                    groups[new_bars].append(bars)
+
+            for new_bars, group in groups.items():
+                state = IndicatorState.from_dicts([saved[bars[0]][1] for bars in group])
+                rows = _compute_rows(group, state, new_bars + 1)
+                _upsert(cursor, rows)
+                total += len(rows)
+                for bars in group:
+                    updated.add(bars[0])
+            conn.commit()
+        cursor.close()
+
+    # 没有状态，或已保存的最后一根K线不在K线表中（状态无法衔接）的股票全量计算
+    missing = [code for code in codes if code not in updated]
+    if missing:
+        total += rebuild_indicators(missing, db_config)
+    logger.info(f"Indicators updated for {len(updated)} stocks incrementally, {len(missing)} rebuilt ({total} rows)")
+    return total
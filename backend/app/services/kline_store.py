@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+K线存储服务
+以 TimescaleDB ohlcv_data 超表作为K线数据的持久层：
+- 查询数据库中最后一根K线，只从AKShare补齐缺失的尾部数据
+- 批量 upsert 写入，区间查询直接由数据库提供
+- 已收盘交易日按交易日历判断（含节假日），日历不可用时按工作日估算
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+try:
+    import akshare as ak
+    AKSHARE_AVAILABLE = True
+except ImportError:
+    AKSHARE_AVAILABLE = False
+
+from app.core.config import settings
+from app.core.rate_limiter import akshare_limiter
+from app.models.stock import OHLCVData
+from app.utils.kline_codec import KLineColumns
+from app.utils.logger import akshare_logger, log_akshare_calls
+
+logger = logging.getLogger(__name__)
+
+# API周期 -> ohlcv_data.period
+PERIOD_CODES = {
+    "daily": "1d",
+    "weekly": "1w",
+    "monthly": "1m",
+}
+
+# A股收盘时间，此后当日K线视为已完成
+MARKET_CLOSE = dt_time(15, 0)
+
+# 单条 INSERT 的最大行数（asyncpg 参数上限 32767，每行 9 个参数）
+UPSERT_CHUNK_SIZE = 2000
+
+
+@log_akshare_calls(akshare_logger)
+def fetch_kline_frame(stock_code: str, period: str, start_date: date, end_date: date) -> pd.DataFrame:
+    """从AKShare下载指定区间的K线"""
+    return akshare_limiter.call(
+        ak.stock_zh_a_hist,
+        symbol=stock_code,
+        period=period,
+        start_date=start_date.strftime("%Y%m%d"),
+        end_date=end_date.strftime("%Y%m%d"),
+        adjust=""
+    )
+
+
+def frame_to_columns(df: pd.DataFrame, period: str) -> Tuple[KLineColumns, np.ndarray]:
+    """AKShare K线表转换为列式数据，同时返回成交额列"""
+    columns = KLineColumns(
+        period=period,
+        trade_date=pd.to_datetime(df['日期']).to_numpy().astype("datetime64[D]"),
+        open=pd.to_numeric(df['开盘'], errors='coerce').to_numpy(dtype=np.float64),
+        high=pd.to_numeric(df['最高'], errors='coerce').to_numpy(dtype=np.float64),
+        low=pd.to_numeric(df['最低'], errors='coerce').to_numpy(dtype=np.float64),
+        close=pd.to_numeric(df['收盘'], errors='coerce').to_numpy(dtype=np.float64),
+        volume=pd.to_numeric(df['成交量'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    )
+    turnover = pd.to_numeric(df.get('成交额'), errors='coerce').to_numpy(dtype=np.float64) \
+        if '成交额' in df.columns else np.full(len(df), np.nan)
+    return columns, turnover
+
+
+@log_akshare_calls(akshare_logger)
+def fetch_trade_dates() -> pd.DataFrame:
+    """从AKShare下载A股历史交易日历（新浪，含当年剩余交易日）"""
+    return akshare_limiter.call(ak.tool_trade_date_hist_sina)
+
+
+class TradingCalendar:
+    """
+    A股交易日历，每天加载一次
+    未加载、加载失败或日期超出日历范围时返回 None，由调用方按工作日估算
+    """
+
+    def __init__(self, retry_interval: Optional[int] = None):
+        self.retry_interval = retry_interval if retry_interval is not None else settings.trading_calendar_retry_interval
+        self._days: Optional[np.ndarray] = None
+        self._loaded_on: Optional[date] = None
+        self._failed_at: float = 0.0
+        self._lock = threading.Lock()
+
+    def stale(self) -> bool:
+        """今天尚未加载，且不在上次失败后的重试间隔内"""
+        if not AKSHARE_AVAILABLE or self._loaded_on == date.today():
+            return False
+        return not self._failed_at or time.time() - self._failed_at >= self.retry_interval
+
+    def refresh(self) -> bool:
+        """加载交易日历（阻塞调用，需在线程池中执行），同一时间只有一个线程下载"""
+        with self._lock:
+            if not self.stale():
+                return self._days is not None
+            try:
+                df = fetch_trade_dates()
+                if df is None or df.empty:
+                    raise ValueError("empty trading calendar")
+                days = np.sort(pd.to_datetime(df['trade_date']).to_numpy().astype("datetime64[D]"))
+            except Exception as e:
+                self._failed_at = time.time()
+                logger.warning(f"Trading calendar load failed, estimating by weekdays: {e}")
+                return False
+            self._days = days
+            self._loaded_on = date.today()
+            self._failed_at = 0.0
+            return True
+
+    def last_trading_day(self, day: date) -> Optional[date]:
+        """day 当天或之前最近的交易日"""
+        days = self._days
+        if days is None:
+            return None
+        target = np.datetime64(day, "D")
+        if target > days[-1]:
+            return None
+        index = int(np.searchsorted(days, target, side="right"))
+        return days[index - 1].astype(date) if index else None
+
+
+trading_calendar = TradingCalendar()
+
+
+def latest_closed_session(now: Optional[datetime] = None) -> date:
+    """最近一个已收盘的交易日（按交易日历；日历不可用时按工作日估算，不含节假日）"""
+    now = now or datetime.now()
+    day = now.date()
+    if now.time() < MARKET_CLOSE:
+        day -= timedelta(days=1)
+    trading_day = trading_calendar.last_trading_day(day)
+    if trading_day is not None:
+        return trading_day
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def period_start(day: date, period: str) -> date:
+    """day 所在K线周期的起始日期"""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    return day
+
+
+class KLineStore:
+    """ohlcv_data 读写"""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def last_bar_date(self, stock_code: str, period: str) -> Optional[date]:
+        """数据库中最后一根K线的日期"""
+        async with self.session_factory() as session:
+            last = (await session.execute(
+                select(func.max(OHLCVData.timestamp)).where(
+                    OHLCVData.stock_code == stock_code,
+                    OHLCVData.period == PERIOD_CODES[period]
+                )
+            )).scalar()
+        return last.date() if last else None
+
+    async def get_range(self, stock_code: str, period: str, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None, limit: Optional[int] = None) -> Optional[KLineColumns]:
+        """按日期区间读取K线（升序）；指定 limit 时取区间内最近的 limit 根"""
+        stmt = select(
+            OHLCVData.timestamp, OHLCVData.open_price, OHLCVData.high_price,
+            OHLCVData.low_price, OHLCVData.close_price, OHLCVData.volume
+        ).where(
+            OHLCVData.stock_code == stock_code,
+            OHLCVData.period == PERIOD_CODES[period]
+        )
+        if start_date:
+            stmt = stmt.where(OHLCVData.timestamp >= datetime.combine(start_date, dt_time.min))
+        if end_date:
+            stmt = stmt.where(OHLCVData.timestamp < datetime.combine(end_date + timedelta(days=1), dt_time.min))
+        stmt = stmt.order_by(OHLCVData.timestamp.desc())
+        if limit:
+            stmt = stmt.limit(limit)
+
+        async with self.session_factory() as session:
+            rows = (await session.execute(stmt)).all()
+        if not rows:
+            return None
+
+        timestamps, opens, highs, lows, closes, volumes = zip(*reversed(rows))
+        return KLineColumns(
+            period=period,
+            trade_date=np.array(timestamps, dtype="datetime64[D]"),
+            open=np.array(opens, dtype=np.float64),
+            high=np.array(highs, dtype=np.float64),
+            low=np.array(lows, dtype=np.float64),
+            close=np.array(closes, dtype=np.float64),
+            volume=np.array(volumes, dtype=np.int64)
+        )
+
+    async def replace_from(self, stock_code: str, period: str, start_date: date,
+                           columns: KLineColumns, turnover: Optional[np.ndarray] = None) -> int:
+        """
+        用新数据覆盖 start_date 及之后的K线
+        周/月K线的日期是周期内最后一个交易日，未完成周期的旧K线日期会变化，因此先删除再批量 upsert
+        盘中下载到的当日K线（日期晚于最近已收盘交易日）尚未完成，不写入；
+        否则 fetch_start 会认为数据库已是最新，这根不完整的K线将不再被更正
+        """
+        period_code = PERIOD_CODES[period]
+        turnover = turnover if turnover is not None else np.full(len(columns), np.nan)
+        closed = columns.trade_date <= np.datetime64(latest_closed_session(), "D")
+        if not closed.all():
+            columns = KLineColumns(
+                period=columns.period, trade_date=columns.trade_date[closed], open=columns.open[closed],
+                high=columns.high[closed], low=columns.low[closed], close=columns.close[closed],
+                volume=columns.volume[closed]
+            )
+            turnover = turnover[closed]
+        timestamps = columns.trade_date.astype("datetime64[s]").tolist()
+        rows = [
+            {
+                "stock_code": stock_code,
+                "period": period_code,
+                "timestamp": ts,
+                "open_price": o,
+                "high_price": h,
+                "low_price": l,
+                "close_price": c,
+                "volume": v,
+                "turnover": None if np.isnan(t) else t,
+            }
+            for ts, o, h, l, c, v, t in zip(
+                timestamps, columns.open.tolist(), columns.high.tolist(), columns.low.tolist(),
+                columns.close.tolist(), columns.volume.tolist(), turnover.tolist()
+            )
+        ]
+
+        async with self.session_factory() as session:
+            try:
+                await session.execute(
+                    delete(OHLCVData).where(
+                        OHLCVData.stock_code == stock_code,
+                        OHLCVData.period == period_code,
+                        OHLCVData.timestamp >= datetime.combine(start_date, dt_time.min)
+                    )
+                )
+                for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                    stmt = insert(OHLCVData).values(rows[i:i + UPSERT_CHUNK_SIZE])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[OHLCVData.stock_code, OHLCVData.period, OHLCVData.timestamp],
+                        set_={
+                            "open_price": stmt.excluded.open_price,
+                            "high_price": stmt.excluded.high_price,
+                            "low_price": stmt.excluded.low_price,
+                            "close_price": stmt.excluded.close_price,
+                            "volume": stmt.excluded.volume,
+                            "turnover": stmt.excluded.turnover,
+                        }
+                    )
+                    await session.execute(stmt)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+        logger.info(f"Stored {len(rows)} {period} bars for {stock_code} from {start_date}")
+        return len(rows)
+
+    def fetch_start(self, last_bar: Optional[date], period: str, today: Optional[date] = None) -> Optional[date]:
+        """
+        需要从AKShare补齐的起始日期，None 表示数据库已是最新
+        - 无数据：回溯 kline_history_days
+        - 日K：最后一根的下一天
+        - 周/月K：最后一根所在周期的起始日（最后一根可能是未完成的周期）
+        """
+        today = today or date.today()
+        if last_bar is None:
+            return today - timedelta(days=settings.kline_history_days)
+        if last_bar >= latest_closed_session():
+            return None
+        if period == "daily":
+            return last_bar + timedelta(days=1)
+        return period_start(last_bar, period)
+
+    def sync_from_akshare(self, stock_code: str, period: str,
+                          start_date: date) -> Optional[Tuple[KLineColumns, np.ndarray]]:
+        """下载 start_date 至今的K线（阻塞调用，需在线程池中执行）"""
+        if not AKSHARE_AVAILABLE:
+            return None
+        df = fetch_kline_frame(stock_code, period, start_date, date.today())
+        if df is None or df.empty:
+            return None
+        return frame_to_columns(df, period)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+A股实时行情快照服务
+按配置间隔整体刷新 stock_zh_a_spot_em 全市场行情表，按股票代码建立列式索引，
+所有单只股票实时查询均从快照中 O(1) 读取
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import akshare as ak
+    AKSHARE_AVAILABLE = True
+except ImportError:
+    AKSHARE_AVAILABLE = False
+
+from app.core.config import settings
+from app.core.rate_limiter import akshare_limiter
+from app.utils.logger import akshare_logger, log_akshare_calls
+
+logger = logging.getLogger(__name__)
+
+# 行情表中文列名 -> 快照字段名
+SPOT_COLUMNS = {
+    '名称': 'name',
+    '最新价': 'current_price',
+    '涨跌额': 'change_amount',
+    '涨跌幅': 'change_percent',
+    '成交量': 'volume',
+    '成交额': 'turnover',
+    '最高': 'high',
+    '最低': 'low',
+    '今开': 'open',
+    '昨收': 'yesterday_close',
+}
+
+
+@log_akshare_calls(akshare_logger)
+def fetch_spot_table() -> pd.DataFrame:
+    """下载全市场实时行情表"""
+    return akshare_limiter.call(ak.stock_zh_a_spot_em)
+
+
+class MarketSnapshot:
+    """全市场实时行情快照
+
+    - 每个刷新间隔最多下载一次行情表
+    - 行情以列式 numpy 数组保存，代码 -> 行号索引实现 O(1) 查询
+    - 刷新过程中并发调用方等待同一次下载，不会重复请求AKShare
+    - 下载失败后 retry_interval 内不再重试，继续使用上一份快照
+    - 停牌等无行情的价格保持 NaN，读取时转为 None
+    """
+
+    def __init__(self, loader: Callable[[], pd.DataFrame] = fetch_spot_table,
+                 refresh_interval: Optional[int] = None, retry_interval: Optional[int] = None):
+        self.loader = loader
+        self.refresh_interval = refresh_interval or settings.market_snapshot_refresh_interval
+        self.retry_interval = retry_interval if retry_interval is not None else settings.market_snapshot_retry_interval
+
+        self._index: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._fetched_at: float = 0.0
+        self._failed_at: float = 0.0
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def fetched_at(self) -> Optional[datetime]:
+        """快照下载时间"""
+        return datetime.fromtimestamp(self._fetched_at) if self._fetched_at else None
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        """快照距今秒数"""
+        return time.time() - self._fetched_at if self._fetched_at else None
+
+    def is_stale(self) -> bool:
+        """快照是否超过刷新间隔"""
+        return not self._fetched_at or time.time() - self._fetched_at >= self.refresh_interval
+
+    def _backing_off(self) -> bool:
+        """上次下载失败后是否仍在重试间隔内"""
+        return bool(self._failed_at) and time.time() - self._failed_at < self.retry_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """刷新快照，同一时间只有一个线程执行下载；失败后的重试间隔内直接返回 False"""
+        if not force and not self.is_stale():
+            return True
+        if not force and self._backing_off():
+            return False
+
+        with self._refresh_lock:
+            # 等锁期间其他线程可能已完成刷新或刚刚失败
+            if not force and not self.is_stale():
+                return True
+            if not force and self._backing_off():
+                return False
+
+            try:
+                df = self.loader()
+            except Exception as e:
+                self._failed_at = time.time()
+                logger.error(f"Market snapshot refresh failed, retry in {self.retry_interval}s: {e}")
+                return False
+
+            if df is None or df.empty:
+                self._failed_at = time.time()
+                logger.warning(f"Market snapshot refresh returned empty table, retry in {self.retry_interval}s")
+                return False
+
+            self._build_index(df)
+            self._failed_at = 0.0
+            logger.info(f"Market snapshot refreshed: {len(self._index)} stocks")
+            return True
+
+    def _build_index(self, df: pd.DataFrame):
+        """将行情表转换为列式结构并建立代码索引"""
+        codes = df['代码'].astype(str).str.zfill(6).to_numpy()
+        columns = {}
+        for source, field in SPOT_COLUMNS.items():
+            if source not in df.columns:
+                continue
+            if field == 'name':
+                columns[field] = df[source].astype(str).to_numpy()
+            else:
+                columns[field] = pd.to_numeric(df[source], errors='coerce').to_numpy(dtype=np.float64)
+
+        index = {code: pos for pos, code in enumerate(codes)}
+
+        # 整体替换引用，读者不会看到半更新状态
+        self._columns, self._index = columns, index
+        self._fetched_at = time.time()
+
+    def get(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """获取单只股票行情，附带快照时间"""
+        self.refresh()
+        return self._row(self._columns, self._index, stock_code)
+
+    def get_many(self, stock_codes: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """批量获取行情，所有股票读取同一份快照"""
+        self.refresh()
+        columns, index = self._columns, self._index
+        return {code: self._row(columns, index, code) for code in stock_codes}
+
+    def _row(self, columns: Dict[str, np.ndarray], index: Dict[str, int],
+             stock_code: str) -> Optional[Dict[str, Any]]:
+        pos = index.get(stock_code)
+        if pos is None:
+            return None
+
+        row: Dict[str, Any] = {'code': stock_code}
+        for field, values in columns.items():
+            value = values[pos]
+            value = value.item() if hasattr(value, 'item') else value
+            # 停牌等无行情的字段为 NaN
+            row[field] = None if isinstance(value, float) and np.isnan(value) else value
+        if row.get('volume') is not None:
+            row['volume'] = int(row['volume'])
+        row['snapshot_time'] = self.fetched_at
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        """快照状态"""
+        return {
+            "stocks": len(self._index),
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "age_seconds": round(self.age_seconds, 2) if self.age_seconds is not None else None,
+            "refresh_interval": self.refresh_interval,
+            "refreshing": self._refresh_lock.locked(),
+            "last_failure": datetime.fromtimestamp(self._failed_at).isoformat() if self._failed_at else None
+        }
+
+
+# 全局快照实例
+market_snapshot = MarketSnapshot()
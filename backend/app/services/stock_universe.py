@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+股票基础信息批量写入
+stocks 表按批次执行 INSERT ... ON CONFLICT (code) DO UPDATE，替代逐条 SELECT + INSERT
+
+- 同步（Session）和异步（AsyncSession）两种入口共用同一条语句
+- 仅在名称/市场/行业确有变化时更新，updated_at 作为搜索索引增量刷新的水位
+- sync_stock_universe 一次下载 AKShare 全市场列表（约5000只）并分批写入
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List
+
+import pandas as pd
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+try:
+    import akshare as ak
+    AKSHARE_AVAILABLE = True
+except ImportError:
+    AKSHARE_AVAILABLE = False
+
+from app.core.executor import run_akshare
+from app.core.rate_limiter import akshare_limiter
+from app.models.stock import Stock
+from app.utils.logger import akshare_logger, log_akshare_calls
+from app.utils.search_index import stock_search_index
+from app.utils.stock_codes import stock_list_records
+
+logger = logging.getLogger(__name__)
+
+# 单条 INSERT 的最大行数（每行 4 个参数）
+UPSERT_CHUNK_SIZE = 2000
+
+
+@log_akshare_calls(akshare_logger)
+def fetch_stock_list() -> pd.DataFrame:
+    """从AKShare下载全部A股代码和名称"""
+    return akshare_limiter.call(ak.stock_info_a_code_name)
+
+
+def stock_rows(stocks: Iterable[Any]) -> List[Dict[str, Any]]:
+    """记录或 StockSearchItem 转换为待写入的行，同一代码保留最后一条"""
+    rows: Dict[str, Dict[str, Any]] = {}
+    for stock in stocks:
+        if not isinstance(stock, dict):
+            stock = stock.dict()
+        rows[stock["code"]] = {
+            "code": stock["code"],
+            "name": stock["name"],
+            "market": stock["market"],
+            "industry": stock.get("industry"),
+        }
+    return list(rows.values())
+
+
+def upsert_statements(rows: List[Dict[str, Any]]):
+    """按 UPSERT_CHUNK_SIZE 分批生成 upsert 语句；行业为空时保留库中已有值"""
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(Stock).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        industry = func.coalesce(stmt.excluded.industry, Stock.industry)
+        yield stmt.on_conflict_do_update(
+            index_elements=[Stock.code],
+            set_={
+                "name": stmt.excluded.name,
+                "market": stmt.excluded.market,
+                "industry": industry,
+                "updated_at": func.current_timestamp(),
+            },
+            where=or_(
+                Stock.name.is_distinct_from(stmt.excluded.name),
+                Stock.market.is_distinct_from(stmt.excluded.market),
+                Stock.industry.is_distinct_from(industry)
+            )
+        )
+
+
+def bulk_upsert_stocks(db: Session, stocks: Iterable[Any]) -> int:
+    """同步批量 upsert，返回提交的行数"""
+    rows = stock_rows(stocks)
+    if not rows:
+        return 0
+    try:
+        for stmt in upsert_statements(rows):
+            db.execute(stmt)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+async def bulk_upsert_stocks_async(session_factory: async_sessionmaker, stocks: Iterable[Any]) -> int:
+    """异步批量 upsert，返回提交的行数"""
+    rows = stock_rows(stocks)
+    if not rows:
+        return 0
+    async with session_factory() as session:
+        try:
+            for stmt in upsert_statements(rows):
+                await session.execute(stmt)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    return len(rows)
+
+
+async def sync_stock_universe(session_factory: async_sessionmaker) -> int:
+    """下载全市场股票列表并批量写入 stocks 表，同时更新搜索索引"""
+    if not AKSHARE_AVAILABLE:
+        logger.warning("AKShare not available - skipping stock universe sync")
+        return 0
+
+    df = await run_akshare(fetch_stock_list)
+    if df is None or df.empty:
+        return 0
+
+    records = stock_list_records(df)
+    count = await bulk_upsert_stocks_async(session_factory, records)
+    await asyncio.to_thread(stock_search_index.upsert, records)
+    logger.info(f"Synced stock universe: {count} stocks")
+    return count
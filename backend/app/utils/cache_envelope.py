@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Redis 缓存信封：软 TTL + 硬 TTL + XFetch 提前刷新
+
+缓存值包装为 {"__env__": 1, "v": 数据, "soft": 软过期时间戳, "delta": 上次加载耗时, "etag": 内容ETag(可选)}
+- Redis key 的过期时间为硬 TTL（软 TTL + 宽限期），到期后彻底删除
+- 软 TTL 到期后在宽限期内继续返回旧值，同时触发后台刷新（stale-while-revalidate）
+- 软 TTL 到期前按 XFetch 概率提前刷新：now - delta * beta * ln(rand) >= soft
+"""
+import math
+import random
+import time
+from typing import Any, NamedTuple, Optional, Union
+
+from app.utils import serializer
+
+ENVELOPE_MARKER = "__env__"
+
+# 缓存状态
+FRESH = "fresh"                  # 新鲜，直接返回
+EARLY_REFRESH = "early_refresh"  # 新鲜但按 XFetch 提前刷新
+STALE = "stale"                  # 软 TTL 已过，返回旧值并后台刷新
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    soft_expires_at: float
+    delta: float
+    etag: Optional[str] = None
+
+
+def wrap(value: Any, soft_ttl: float, delta: float = 0.0, now: Optional[float] = None,
+         etag: Optional[str] = None) -> bytes:
+    """包装缓存值，返回可直接写入 Redis 的 JSON bytes"""
+    now = time.time() if now is None else now
+    payload = {
+        ENVELOPE_MARKER: 1,
+        "v": value,
+        "soft": now + soft_ttl,
+        "delta": round(delta, 4)
+    }
+    if etag is not None:
+        payload["etag"] = etag
+    return serializer.dumps(payload)
+
+
+def unwrap(raw: Optional[Union[bytes, str]]) -> Optional[CacheEntry]:
+    """解析缓存值；兼容信封上线前写入的普通 JSON（视为新鲜）"""
+    if raw is None:
+        return None
+    payload = serializer.loads(raw)
+    if isinstance(payload, dict) and payload.get(ENVELOPE_MARKER) == 1:
+        return CacheEntry(payload["v"], payload["soft"], payload.get("delta", 0.0), payload.get("etag"))
+    return CacheEntry(payload, math.inf, 0.0)
+
+
+def hard_ttl(soft_ttl: int, stale_grace: int) -> int:
+    """Redis key 实际过期时间"""
+    return int(soft_ttl + max(stale_grace, 0))
+
+
+def evaluate(entry: CacheEntry, beta: float = 1.0, now: Optional[float] = None) -> str:
+    """判断缓存状态
+
+    Args:
+        entry: 缓存条目
+        beta: XFetch 系数，>1 更积极地提前刷新，0 关闭提前刷新
+    """
+    now = time.time() if now is None else now
+    if now >= entry.soft_expires_at:
+        return STALE
+    if beta > 0 and entry.delta > 0:
+        # -ln(rand) 服从指数分布，越接近软过期、加载越慢，越可能提前刷新
+        if now - entry.delta * beta * math.log(1.0 - random.random()) >= entry.soft_expires_at:
+            return EARLY_REFRESH
+    return FRESH
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP ETag 与预序列化响应缓存
+ETag 在缓存值写入 Redis 时按内容计算一次，同时写入旁路键 etag:{cache_key}（值为 "ETag|软过期时间戳"），
+条件请求只读取旁路键即可返回 304，不必读取和反序列化缓存数据
+
+- 响应体按 ETag 保存在进程内缓存（内容寻址，不会过时），未变化的轮询不再重复序列化
+- 响应体含请求级字段（时间戳、数据来源等）时用弱 ETag，只用于 304，响应体不缓存
+- 响应带 Cache-Control: no-cache，客户端每次用 If-None-Match 重新验证
+"""
+import hashlib
+from typing import Any, Iterable, Optional, Tuple, Union
+
+from fastapi import Response
+
+from app.core.config import settings
+from app.utils import serializer
+from app.utils.local_cache import LocalCache
+
+ETAG_KEY_PREFIX = "etag:"
+
+response_cache = LocalCache(
+    max_entries=settings.response_cache_max_entries,
+    max_bytes=settings.response_cache_max_bytes,
+    default_ttl=settings.response_cache_ttl
+)
+
+
+def content_etag(content: Union[bytes, str]) -> str:
+    """按内容计算强 ETag"""
+    if isinstance(content, str):
+        content = content.encode()
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def value_etag(value: Any) -> str:
+    """按规范化 JSON 计算数据的 ETag，与字典键顺序无关"""
+    return content_etag(serializer.dumps(value, sort_keys=True))
+
+
+def combine_etags(parts: Iterable[str]) -> str:
+    """多个组成部分（如 Dashboard 各数据类型）合成一个 ETag"""
+    return content_etag("\n".join(parts))
+
+
+def weak_etag(etag: str) -> str:
+    """弱 ETag：数据相同但响应体不逐字节相同时使用"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def etag_key(cache_key: str) -> str:
+    """缓存键对应的 ETag 旁路键"""
+    return f"{ETAG_KEY_PREFIX}{cache_key}"
+
+
+def etag_marker(etag: str, soft_expires_at: float) -> str:
+    """旁路键的值"""
+    return f"{etag}|{soft_expires_at}"
+
+
+def parse_etag_marker(raw: Optional[Union[bytes, str]]) -> Optional[Tuple[str, float]]:
+    """解析旁路键，返回 (ETag, 软过期时间戳)"""
+    if not raw:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    etag, _, soft = raw.rpartition("|")
+    try:
+        return etag, float(soft)
+    except ValueError:
+        return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，支持 * 和多个 ETag）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in tags)
+
+
+def _headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """If-None-Match 命中时返回 304，否则返回 None"""
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=_headers(etag))
+    return None
+
+
+def cached_response(if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """ETag 已知时的快速路径：If-None-Match 命中返回 304，否则返回已缓存的响应体；都没有时返回 None"""
+    response = not_modified(if_none_match, etag)
+    if response is not None:
+        return response
+    if settings.response_cache_enabled:
+        body = response_cache.get(etag)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=_headers(etag))
+    return None
+
+
+def etag_response(if_none_match: Optional[str], body: bytes, etag: Optional[str] = None) -> Response:
+    """
+    带 ETag 的 JSON 响应；未给出 ETag 时按响应体计算
+    强 ETag 的响应体缓存供 cached_response 复用，弱 ETag 的响应体不缓存
+    """
+    etag = etag or content_etag(body)
+    if settings.response_cache_enabled and not etag.startswith("W/"):
+        response_cache.set(etag, body, size=len(body))
+    response = not_modified(if_none_match, etag)
+    if response is not None:
+        return response
+    return Response(content=body, media_type="application/json", headers=_headers(etag))
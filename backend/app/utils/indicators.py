@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+向量化技术指标引擎
+输入为 (股票数, K线数) 的二维数组，一次计算整个股票池的 MA/RSI/MACD/KDJ/BOLL，公式与通达信一致
+
+- 各股票K线数不同时左侧以 NaN 补齐，窗口内含 NaN 的位置结果为 NaN
+- MA/BOLL/KDJ 的 RSV 为滑动窗口（sliding_window_view），沿股票维度向量化
+- EMA/SMA 递推（MACD、RSI、K/D）沿时间维度逐列推进，每一步处理全部股票
+- 递推状态可保存，新K线到达时只需最近 CONTEXT_BARS 根历史K线和上次状态即可增量计算
+"""
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MA_PERIODS = (5, 10, 20, 60)
+RSI_PERIODS = (6, 12, 24)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+KDJ_N, KDJ_M1, KDJ_M2 = 9, 3, 3
+BOLL_N, BOLL_K = 20, 2
+
+# 增量计算时新K线之前需要的历史K线数（最长滑动窗口 - 1）
+CONTEXT_BARS = max(max(MA_PERIODS), BOLL_N, KDJ_N) - 1
+
+INDICATOR_COLUMNS = (
+    [f"ma{n}" for n in MA_PERIODS]
+    + ["macd_dif", "macd_dea", "macd_hist"]
+    + [f"rsi{n}" for n in RSI_PERIODS]
+    + ["kdj_k", "kdj_d", "kdj_j"]
+    + ["boll_upper", "boll_mid", "boll_lower"]
+)
+
+
+class IndicatorState(NamedTuple):
+    """各股票最后一根已计算K线处的递推状态，每个字段形状为 (股票数,)"""
+    ema_fast: np.ndarray
+    ema_slow: np.ndarray
+    dea: np.ndarray
+    rsi_up: Dict[int, np.ndarray]
+    rsi_down: Dict[int, np.ndarray]
+    k: np.ndarray
+    d: np.ndarray
+
+    def to_dicts(self) -> list:
+        """逐股票转换为可存为 JSON 的字典"""
+        result = []
+        for i in range(len(self.k)):
+            result.append({
+                "ema_fast": _num(self.ema_fast[i]),
+                "ema_slow": _num(self.ema_slow[i]),
+                "dea": _num(self.dea[i]),
+                "rsi": {str(n): [_num(self.rsi_up[n][i]), _num(self.rsi_down[n][i])] for n in RSI_PERIODS},
+                "k": _num(self.k[i]),
+                "d": _num(self.d[i]),
+            })
+        return result
+
+    @classmethod
+    def from_dicts(cls, states: list) -> "IndicatorState":
+        """由 to_dicts 的结果恢复"""
+        def column(getter):
+            return np.array([np.nan if getter(s) is None else getter(s) for s in states], dtype=np.float64)
+
+        return cls(
+            ema_fast=column(lambda s: s["ema_fast"]),
+            ema_slow=column(lambda s: s["ema_slow"]),
+            dea=column(lambda s: s["dea"]),
+            rsi_up={n: column(lambda s, n=n: s["rsi"][str(n)][0]) for n in RSI_PERIODS},
+            rsi_down={n: column(lambda s, n=n: s["rsi"][str(n)][1]) for n in RSI_PERIODS},
+            k=column(lambda s: s["k"]),
+            d=column(lambda s: s["d"]),
+        )
+
+
+def _num(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _rolling(x: np.ndarray, n: int, reducer, **kwargs) -> np.ndarray:
+    """沿时间维度的滑动窗口聚合，前 n-1 列为 NaN"""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= n:
+        out[:, n - 1:] = reducer(sliding_window_view(x, n, axis=1), axis=-1, **kwargs)
+    return out
+
+
+def _recur(x: np.ndarray, alpha: float, start: int, init: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    y = alpha * x + (1 - alpha) * y_prev，从第 start 列开始递推
+    init 为 start 之前的状态；为 None 或 NaN 的股票以第一个有效值作为初值；x 为 NaN 时状态不变
+    """
+    y = np.full(x.shape, np.nan)
+    state = np.full(x.shape[0], np.nan) if init is None else init.copy()
+    for j in range(start, x.shape[1]):
+        col = x[:, j]
+        valid = ~np.isnan(col)
+        seeded = valid & np.isnan(state)
+        state = np.where(seeded, col, state)
+        update = valid & ~seeded
+        state = np.where(update, alpha * col + (1 - alpha) * state, state)
+        y[:, j] = np.where(valid, state, np.nan)
+    return y, state
+
+
+def compute(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+            state: Optional[IndicatorState] = None, start: int = 0) -> Tuple[Dict[str, np.ndarray], IndicatorState]:
+    """
+    计算第 start 列起的全部指标
+
+    Args:
+        high/low/close: (股票数, K线数) 数组，左侧 NaN 补齐
+        state: 第 start-1 列处的递推状态；为 None 时从头计算（start 应为 0）
+        start: 新K线起始列，之前的列只作为滑动窗口的历史
+
+    Returns:
+        (指标名 -> (股票数, K线数-start) 数组, 最后一列处的递推状态)
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    s = state
+    out: Dict[str, np.ndarray] = {}
+
+    # MA / BOLL
+    for n in MA_PERIODS:
+        out[f"ma{n}"] = _rolling(close, n, np.mean)
+    mid = out[f"ma{BOLL_N}"] if BOLL_N in MA_PERIODS else _rolling(close, BOLL_N, np.mean)
+    width = BOLL_K * _rolling(close, BOLL_N, np.std, ddof=1)
+    out["boll_mid"], out["boll_upper"], out["boll_lower"] = mid, mid + width, mid - width
+
+    # MACD: EMA(C,12) - EMA(C,26)，DEA = EMA(DIF,9)，柱 = 2 * (DIF - DEA)
+    ema_fast, ema_fast_state = _recur(close, 2 / (MACD_FAST + 1), start, s and s.ema_fast)
+    ema_slow, ema_slow_state = _recur(close, 2 / (MACD_SLOW + 1), start, s and s.ema_slow)
+    dif = ema_fast - ema_slow
+    dea, dea_state = _recur(dif, 2 / (MACD_SIGNAL + 1), start, s and s.dea)
+    out["macd_dif"], out["macd_dea"], out["macd_hist"] = dif, dea, 2 * (dif - dea)
+
+    # RSI: SMA(MAX(C-LC,0),N,1) / SMA(ABS(C-LC),N,1) * 100
+    change = np.full(close.shape, np.nan)
+    change[:, 1:] = close[:, 1:] - close[:, :-1]
+    rsi_up, rsi_down = {}, {}
+    for n in RSI_PERIODS:
+        up, rsi_up[n] = _recur(np.maximum(change, 0), 1 / n, start, s and s.rsi_up[n])
+        down, rsi_down[n] = _recur(np.abs(change), 1 / n, start, s and s.rsi_down[n])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"rsi{n}"] = np.where(down > 0, up / down * 100, np.where(np.isnan(down), np.nan, 50.0))
+
+    # KDJ: RSV = (C - LLV(L,9)) / (HHV(H,9) - LLV(L,9)) * 100，K = SMA(RSV,3,1)，D = SMA(K,3,1)，J = 3K - 2D
+    lowest = _rolling(low, KDJ_N, np.min)
+    highest = _rolling(high, KDJ_N, np.max)
+    span = highest - lowest
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsv = np.where(span > 0, (close - lowest) / span * 100, np.where(np.isnan(span), np.nan, 50.0))
+    # 首根有效K线之前 K/D 取 50
+    k_init = np.full(close.shape[0], 50.0) if s is None else np.where(np.isnan(s.k), 50.0, s.k)
+    d_init = np.full(close.shape[0], 50.0) if s is None else np.where(np.isnan(s.d), 50.0, s.d)
+    k, k_state = _recur(rsv, 1 / KDJ_M1, start, k_init)
+    d, d_state = _recur(k, 1 / KDJ_M2, start, d_init)
+    out["kdj_k"], out["kdj_d"], out["kdj_j"] = k, d, 3 * k - 2 * d
+
+    new_state = IndicatorState(
+        ema_fast=ema_fast_state, ema_slow=ema_slow_state, dea=dea_state,
+        rsi_up=rsi_up, rsi_down=rsi_down, k=k_state, d=d_state
+    )
+    return {name: out[name][:, start:] for name in INDICATOR_COLUMNS}, new_state
+
+
+def pad_left(series: list, length: Optional[int] = None) -> np.ndarray:
+    """把长度不同的序列右对齐拼成二维数组，左侧补 NaN"""
+    length = length or max((len(values) for values in series), default=0)
+    matrix = np.full((len(series), length), np.nan)
+    for i, values in enumerate(series):
+        if len(values):
+            matrix[i, length - len(values):] = values
+    return matrix
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+K线缓存二进制列式编码
+OHLCV 序列按列打包为 int64/float64 数组，附带固定头部，可选 zlib 压缩
+
+布局（小端）:
+    头部  magic(4s) version(B) flags(B) period_len(H) bars(I) soft_expires_at(d) delta(f)
+    周期  period_len 字节 UTF-8
+    数据  trade_date(int64, 距1970-01-01天数) open high low close(float64) volume(int64)
+          flags & FLAG_ZLIB 时数据段整体 zlib 压缩
+
+命中路径直接从列数组生成 JSON，不构造逐条 KLineItem
+"""
+import json
+import struct
+import time
+import zlib
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.stock import KLineData, KLineItem
+from app.utils.cache_envelope import CacheEntry
+
+MAGIC = b"KLC1"
+VERSION = 1
+FLAG_ZLIB = 0x01
+
+_HEADER = struct.Struct("<4sBBHIdf")
+
+# 小于该字节数的数据段不压缩
+COMPRESS_MIN_BYTES = 1024
+
+
+class KLineColumns:
+    """列式K线数据"""
+
+    __slots__ = ("period", "trade_date", "open", "high", "low", "close", "volume")
+
+    def __init__(self, period: str, trade_date: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.period = period
+        self.trade_date = trade_date.astype("datetime64[D]", copy=False)
+        self.open = open.astype(np.float64, copy=False)
+        self.high = high.astype(np.float64, copy=False)
+        self.low = low.astype(np.float64, copy=False)
+        self.close = close.astype(np.float64, copy=False)
+        self.volume = volume.astype(np.int64, copy=False)
+
+    def __len__(self) -> int:
+        return len(self.trade_date)
+
+    def tail(self, n: int) -> "KLineColumns":
+        """最近 n 根K线"""
+        return KLineColumns(
+            self.period, self.trade_date[-n:], self.open[-n:], self.high[-n:],
+            self.low[-n:], self.close[-n:], self.volume[-n:]
+        )
+
+    @classmethod
+    def from_items(cls, period: str, items: List[KLineItem]) -> "KLineColumns":
+        """由 KLineItem 列表构造"""
+        return cls(
+            period=period,
+            trade_date=np.array([item.timestamp[:10] for item in items], dtype="datetime64[D]"),
+            open=np.array([item.open for item in items], dtype=np.float64),
+            high=np.array([item.high for item in items], dtype=np.float64),
+            low=np.array([item.low for item in items], dtype=np.float64),
+            close=np.array([item.close for item in items], dtype=np.float64),
+            volume=np.array([item.volume for item in items], dtype=np.int64)
+        )
+
+    def to_model(self) -> KLineData:
+        """转换为 KLineData（Dashboard 聚合使用）"""
+        return KLineData(period=self.period, data=self.to_frame().to_dict("records"))
+
+    def to_frame(self) -> pd.DataFrame:
+        """转换为与 KLineItem 字段一致的 DataFrame"""
+        return pd.DataFrame({
+            "timestamp": np.datetime_as_string(self.trade_date, unit="D"),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume
+        })
+
+    def to_json(self) -> bytes:
+        """直接生成 KLineData 结构的 JSON"""
+        records = self.to_frame().to_json(orient="records", double_precision=15)
+        return b'{"period":' + json.dumps(self.period).encode() + b',"data":' + records.encode() + b"}"
+
+
+def encode(columns: KLineColumns, soft_ttl: float, delta: float = 0.0,
+           compress: bool = True, now: Optional[float] = None) -> bytes:
+    """编码为缓存二进制，soft_ttl/delta 含义同 cache_envelope.wrap"""
+    now = time.time() if now is None else now
+    body = b"".join((
+        columns.trade_date.astype(np.int64).tobytes(),
+        columns.open.tobytes(),
+        columns.high.tobytes(),
+        columns.low.tobytes(),
+        columns.close.tobytes(),
+        columns.volume.tobytes()
+    ))
+
+    flags = 0
+    if compress and len(body) >= COMPRESS_MIN_BYTES:
+        body = zlib.compress(body, 1)
+        flags |= FLAG_ZLIB
+
+    period = columns.period.encode()
+    header = _HEADER.pack(MAGIC, VERSION, flags, len(period), len(columns), now + soft_ttl, delta)
+    return header + period + body
+
+
+def decode(raw: bytes) -> Optional[CacheEntry]:
+    """解码缓存二进制；非本格式（如旧版JSON缓存）返回 None"""
+    if raw is None or len(raw) < _HEADER.size or raw[:4] != MAGIC:
+        return None
+
+    _, version, flags, period_len, bars, soft_expires_at, delta = _HEADER.unpack_from(raw)
+    if version != VERSION:
+        return None
+
+    offset = _HEADER.size
+    period = raw[offset:offset + period_len].decode()
+    body = raw[offset + period_len:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    arrays = np.frombuffer(body, dtype=np.int64, count=bars * 6).reshape(6, bars)
+    columns = KLineColumns(
+        period=period,
+        trade_date=arrays[0].astype("datetime64[D]"),
+        open=arrays[1].view(np.float64),
+        high=arrays[2].view(np.float64),
+        low=arrays[3].view(np.float64),
+        close=arrays[4].view(np.float64),
+        volume=arrays[5]
+    )
+    return CacheEntry(columns, soft_expires_at, delta)
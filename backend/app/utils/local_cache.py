@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+进程内 L0 缓存
+位于 Redis 之前的有界 LRU/TTL 缓存，直接保存构造好的对象，命中时省去 Redis 往返、json.loads 和模型构造
+
+- 按条目数和估算字节数双重限制，超出时淘汰最久未使用的条目
+- 缓存键被重写时通过 Redis pub/sub 广播失效，多个 uvicorn worker 保持一致
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """有界、按大小计量的 LRU/TTL 缓存"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, default_ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # key -> (value, 过期时间, 估算字节数)
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期或不存在返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at, _ = item
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        """写入缓存；单条超过字节上限时不缓存"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: str):
+        """删除单个键"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存状态"""
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                **self._stats
+            }
+
+
+class TierStats:
+    """各缓存层命中/未命中计数"""
+
+    def __init__(self, *tiers: str):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {tier: {"hits": 0, "misses": 0} for tier in tiers}
+
+    def hit(self, tier: str):
+        with self._lock:
+            self._counters.setdefault(tier, {"hits": 0, "misses": 0})["hits"] += 1
+
+    def miss(self, tier: str):
+        with self._lock:
+            self._counters.setdefault(tier, {"hits": 0, "misses": 0})["misses"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for tier, counter in self._counters.items():
+                total = counter["hits"] + counter["misses"]
+                result[tier] = {
+                    **counter,
+                    "hit_rate": round(counter["hits"] / total, 4) if total else 0.0
+                }
+            return result
+
+
+class PubSubInvalidator:
+    """通过 Redis pub/sub 在多个进程间广播 L0 缓存失效"""
+
+    def __init__(self, cache: LocalCache, channel: str):
+        self.cache = cache
+        self.channel = channel
+        # 忽略本进程自己发出的失效消息
+        self.instance_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, redis, key: str):
+        """本地失效并通知其他进程"""
+        self.cache.invalidate(key)
+        try:
+            await redis.publish(self.channel, f"{self.instance_id}|{key}")
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed for {key}: {e}")
+
+    async def publish_many(self, redis, keys: List[str]):
+        """批量失效，一次 pipeline 发送全部通知"""
+        if not keys:
+            return
+        for key in keys:
+            self.cache.invalidate(key)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.publish(self.channel, f"{self.instance_id}|{key}")
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed for {len(keys)} keys: {e}")
+
+    def start(self, redis):
+        """启动后台订阅任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(redis))
+
+    async def stop(self):
+        """停止订阅"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self, redis):
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Subscribed to cache invalidation channel {self.channel}")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    sender, _, key = data.partition("|")
+                    if sender != self.instance_id:
+                        self.cache.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 断线期间可能错过失效消息，重连前清空本地缓存
+                logger.warning(f"Cache invalidation listener error: {e}, reconnecting")
+                self.cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
@@ -2,13 +2,23 @@
 """
 Prism2 统一日志系统
 支持API调用、AKShare调用、批处理、RAG操作的详细日志记录
+
+写盘全部在后台线程完成：请求线程只把日志记录放入有界队列（QueueHandler），
+QueueListener 线程写文本日志并批量写入 NDJSON，NDJSON 按大小/时间轮转并 gzip 压缩
+队列满时丢弃日志并计数，请求线程不会因磁盘 I/O 阻塞
 """
 
 import os
 import json
+import gzip
+import queue
+import atexit
+import shutil
 import logging
+import threading
 import traceback
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Any, Optional, List, Union
 from pathlib import Path
 from functools import wraps
@@ -18,6 +28,189 @@ import time
 LOG_BASE_DIR = "/home/wyatt/prism2/logs"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
+# 异步日志管道配置
+LOG_QUEUE_SIZE = 10000                     # 每个日志器的待写队列长度
+JSON_LOG_BATCH_SIZE = 256                  # 缓冲达到该条数立即写盘
+JSON_LOG_FLUSH_INTERVAL = 1.0              # 最长缓冲时间（秒）
+JSON_LOG_MAX_BYTES = 100 * 1024 * 1024     # 单个NDJSON文件大小上限
+JSON_LOG_ROTATE_SECONDS = 24 * 3600        # 单个NDJSON文件最长写入时间
+JSON_LOG_BACKUP_COUNT = 14                 # 保留的压缩归档数
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞调用方"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _JsonRecordFilter(logging.Filter):
+    """按是否携带 json_entry 区分结构化日志和文本日志"""
+
+    def __init__(self, structured: bool):
+        super().__init__()
+        self.structured = structured
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return hasattr(record, "json_entry") == self.structured
+
+
+class BufferedNDJSONHandler(logging.Handler):
+    """批量写入NDJSON：按条数或时间刷盘，按大小或时间轮转，旧文件gzip压缩"""
+
+    def __init__(self,
+                 filename: Union[str, Path],
+                 batch_size: int = JSON_LOG_BATCH_SIZE,
+                 flush_interval: float = JSON_LOG_FLUSH_INTERVAL,
+                 max_bytes: int = JSON_LOG_MAX_BYTES,
+                 rotate_seconds: float = JSON_LOG_ROTATE_SECONDS,
+                 backup_count: int = JSON_LOG_BACKUP_COUNT):
+        super().__init__()
+        self.path = Path(filename)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+
+        self._buffer: List[str] = []
+        self._stream = None
+        self._size = 0
+        self._opened_at = 0.0
+        self.stats = {"written": 0, "flushes": 0, "rotations": 0}
+
+        # QueueListener 只在有新记录时调用 emit，按时间刷盘由独立线程负责
+        self._stopping = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name=f"ndjson-flush-{self.path.stem}", daemon=True
+        )
+        self._flusher.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._buffer.append(json.dumps(record.json_entry, ensure_ascii=False, default=str))
+            if len(self._buffer) >= self.batch_size:
+                self._write()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write()
+        finally:
+            self.release()
+
+    def _flush_periodically(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Failed to flush JSON log {self.path}: {e}")
+
+    def _write(self):
+        if not self._buffer:
+            return
+        data = ("\n".join(self._buffer) + "\n").encode("utf-8")
+        count = len(self._buffer)
+        self._buffer = []
+
+        if self._stream is not None and self._should_rotate(len(data)):
+            self._rotate()
+        if self._stream is None:
+            self._stream = open(self.path, "ab")
+            self._size = self._stream.tell()
+            self._opened_at = time.time()
+
+        self._stream.write(data)
+        self._stream.flush()
+        self._size += len(data)
+        self.stats["written"] += count
+        self.stats["flushes"] += 1
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if self.max_bytes and self._size > 0 and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        """关闭当前文件，改名后压缩为 .gz 并清理超出保留数的归档"""
+        self._stream.close()
+        self._stream = None
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        rotated = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        suffix = 1
+        while rotated.exists() or Path(f"{rotated}.gz").exists():
+            rotated = self.path.with_name(f"{self.path.stem}.{stamp}_{suffix}{self.path.suffix}")
+            suffix += 1
+        os.replace(self.path, rotated)
+
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+        self.stats["rotations"] += 1
+
+        archives = sorted(
+            self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}.gz"),
+            key=lambda archive: archive.stat().st_mtime
+        )
+        for old in archives[:-self.backup_count] if self.backup_count else []:
+            old.unlink(missing_ok=True)
+
+    def close(self):
+        self._stopping.set()
+        self.acquire()
+        try:
+            self._write()
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+        finally:
+            self.release()
+        super().close()
+
+
+# logger名 -> (队列handler, 监听线程, NDJSON handler)，同名日志器共用一条管道
+_pipelines: Dict[str, Any] = {}
+_pipelines_lock = threading.Lock()
+
+
+def log_pipeline_stats() -> Dict[str, Dict[str, Any]]:
+    """各日志管道的队列深度、丢弃数和写盘统计"""
+    with _pipelines_lock:
+        pipelines = dict(_pipelines)
+    return {
+        name: {
+            "queued": queue_handler.queue.qsize(),
+            "dropped": queue_handler.dropped,
+            **json_handler.stats
+        }
+        for name, (queue_handler, _, json_handler) in pipelines.items()
+    }
+
+
+def shutdown_logging():
+    """停止所有监听线程并把缓冲写盘（进程退出时自动调用）"""
+    with _pipelines_lock:
+        pipelines = list(_pipelines.values())
+        _pipelines.clear()
+    for _, listener, _ in pipelines:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(shutdown_logging)
+
+
 class PrismLogger:
     """Prism2 统一日志记录器"""
 
@@ -42,12 +235,21 @@ class PrismLogger:
         self.logger = logging.getLogger(logger_name)
         self.logger.setLevel(logging.INFO)
 
-        # 避免重复添加handler
-        if not self.logger.handlers:
-            self._setup_handlers()
+        # 结构化日志单独的logger，不向上传播到控制台
+        self.json_logger = logging.getLogger(f"{logger_name}.json")
+        self.json_logger.setLevel(logging.INFO)
+        self.json_logger.propagate = False
+
+        # 同名日志器共用一条管道，避免重复添加handler
+        with _pipelines_lock:
+            pipeline = _pipelines.get(logger_name)
+            if pipeline is None:
+                pipeline = self._setup_handlers()
+                _pipelines[logger_name] = pipeline
+        self.json_file = pipeline[2].path
 
     def _setup_handlers(self):
-        """设置日志处理器"""
+        """设置日志处理器：请求线程只入队，文件写入在监听线程中完成"""
         # 文件handler - 详细日志
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         if self.component:
@@ -60,32 +262,34 @@ class PrismLogger:
             encoding='utf-8'
         )
         file_handler.setLevel(logging.INFO)
-
-        # JSON格式handler - 结构化数据
-        json_filename = log_filename.replace('.log', '.json')
-        self.json_file = self.log_dir / json_filename
+        file_handler.addFilter(_JsonRecordFilter(structured=False))
 
         # 设置格式
         formatter = logging.Formatter(LOG_FORMAT)
         file_handler.setFormatter(formatter)
 
-        self.logger.addHandler(file_handler)
+        # JSON格式handler - 结构化数据，批量写入NDJSON
+        json_filename = log_filename.replace('.log', '.json')
+        json_handler = BufferedNDJSONHandler(self.log_dir / json_filename)
+        json_handler.addFilter(_JsonRecordFilter(structured=True))
+
+        queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        listener = QueueListener(queue_handler.queue, file_handler, json_handler, respect_handler_level=True)
+        listener.start()
+
+        self.logger.addHandler(queue_handler)
+        self.json_logger.addHandler(queue_handler)
+        return queue_handler, listener, json_handler
 
     def _write_json_log(self, log_data: Dict[str, Any]):
-        """写入JSON格式日志"""
+        """写入JSON格式日志（入队，由后台线程批量写盘）"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "log_type": self.log_type,
             "component": self.component,
             **log_data
         }
-
-        try:
-            # 追加到JSON文件
-            with open(self.json_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False, default=str) + '\n')
-        except Exception as e:
-            self.logger.error(f"Failed to write JSON log: {e}")
+        self.json_logger.info("", extra={"json_entry": log_entry})
 
     def log_api_call(self,
                      endpoint: str,
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+股票搜索内存索引
+对代码、中文名、拼音首字母、全拼建立索引，替代 LIKE '%q%' 和全表线性扫描
+
+- 前缀树：代码/名称/拼音前缀匹配，按广度优先收集候选，短键优先
+- n-gram 倒排索引：中文二元组+单字、拼音/代码三元组，用于子串与模糊匹配
+- 支持增量 upsert/remove，读写由一把锁保护
+- pypinyin 为可选依赖，未安装时只索引代码和名称
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+try:
+    from pypinyin import Style, lazy_pinyin
+    PINYIN_AVAILABLE = True
+except ImportError:
+    PINYIN_AVAILABLE = False
+
+from app.schemas.stock import StockSearchItem
+
+# 索引字段及其排序权重（越小越优先）
+FIELD_CODE = 0
+FIELD_NAME = 1
+FIELD_INITIALS = 2
+FIELD_PINYIN = 3
+
+# 匹配类型基础分
+SCORE_EXACT = 1000
+SCORE_PREFIX = 800
+SCORE_SUBSTRING = 500
+SCORE_FUZZY = 300
+
+# 模糊匹配至少命中查询 n-gram 的比例（纯数字查询不做模糊匹配）
+FUZZY_MIN_OVERLAP = 0.6
+
+# 前缀候选数量上限（相对 limit 的倍数）
+PREFIX_CANDIDATE_FACTOR = 4
+
+
+def normalize(text: str) -> str:
+    """小写并去除空白和符号（如 *ST 中的 *）"""
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def name_pinyin(name: str) -> Tuple[str, str]:
+    """(首字母, 全拼)，未安装 pypinyin 时为空"""
+    if not PINYIN_AVAILABLE:
+        return "", ""
+    initials = normalize("".join(lazy_pinyin(name, style=Style.FIRST_LETTER)))
+    full = normalize("".join(lazy_pinyin(name)))
+    return initials, full
+
+
+def ngrams(text: str) -> Set[str]:
+    """纯ASCII键（代码、拼音）取三元组；含中文的键取二元组并加入单字，单个汉字即可检索"""
+    if text.isascii():
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    grams.update(ch for ch in text if not ch.isascii())
+    return grams
+
+
+class _TrieNode:
+    __slots__ = ("children", "codes")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.codes: Set[str] = set()
+
+
+class _Entry:
+    __slots__ = ("item", "keys")
+
+    def __init__(self, item: StockSearchItem, keys: List[Tuple[int, str]]):
+        self.item = item
+        # (字段, 归一化后的键)
+        self.keys = keys
+
+
+class StockSearchIndex:
+    """前缀树 + n-gram 倒排索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[str, _Entry] = {}
+        self._trie = _TrieNode()
+        self._grams: Dict[str, Set[str]] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def build(self, stocks: Iterable[dict]):
+        """全量重建（stocks 为含 code/name/market/industry 的记录）"""
+        with self._lock:
+            self._entries.clear()
+            self._trie = _TrieNode()
+            self._grams.clear()
+            self._upsert_many(stocks)
+            self.ready = True
+
+    def upsert(self, stocks: Iterable[dict]):
+        """增量插入或更新"""
+        with self._lock:
+            self._upsert_many(stocks)
+
+    def remove(self, code: str):
+        """删除单只股票"""
+        with self._lock:
+            entry = self._entries.pop(code, None)
+            if entry is None:
+                return
+            for _, key in entry.keys:
+                self._trie_remove(key, code)
+                for gram in ngrams(key):
+                    postings = self._grams.get(gram)
+                    if postings is not None:
+                        postings.discard(code)
+                        if not postings:
+                            del self._grams[gram]
+
+    def _upsert_many(self, stocks: Iterable[dict]):
+        for stock in stocks:
+            code = str(stock["code"])
+            if code in self._entries:
+                self.remove(code)
+
+            name = stock.get("name") or ""
+            initials, full = name_pinyin(name)
+            keys = [(FIELD_CODE, code.lower()), (FIELD_NAME, normalize(name))]
+            if initials:
+                keys.append((FIELD_INITIALS, initials))
+            if full:
+                keys.append((FIELD_PINYIN, full))
+            keys = [(field, key) for field, key in keys if key]
+
+            self._entries[code] = _Entry(
+                StockSearchItem(
+                    code=code,
+                    name=name,
+                    market=stock.get("market") or "",
+                    industry=stock.get("industry")
+                ),
+                keys
+            )
+            for _, key in keys:
+                self._trie_insert(key, code)
+                for gram in ngrams(key):
+                    self._grams.setdefault(gram, set()).add(code)
+
+    def _trie_insert(self, key: str, code: str):
+        node = self._trie
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.codes.add(code)
+
+    def _trie_remove(self, key: str, code: str):
+        path = [self._trie]
+        for ch in key:
+            node = path[-1].children.get(ch)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].codes.discard(code)
+        # 回收空节点
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.codes or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def _prefix_candidates(self, query: str, cap: int) -> Set[str]:
+        """广度优先收集前缀匹配的代码，键越短越先收集"""
+        node = self._trie
+        for ch in query:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+
+        found: Set[str] = set()
+        queue = deque([node])
+        while queue and len(found) < cap:
+            node = queue.popleft()
+            found.update(node.codes)
+            queue.extend(node.children.values())
+        return found
+
+    def _gram_candidates(self, query: str) -> Dict[str, float]:
+        """n-gram 命中比例不低于阈值的代码 -> 命中比例"""
+        grams = ngrams(query)
+        if not grams:
+            return {}
+        counts: Dict[str, int] = {}
+        for gram in grams:
+            for code in self._grams.get(gram, ()):
+                counts[code] = counts.get(code, 0) + 1
+        needed = max(1, math.ceil(len(grams) * FUZZY_MIN_OVERLAP))
+        return {code: count / len(grams) for code, count in counts.items() if count >= needed}
+
+    def _score(self, entry: _Entry, query: str, overlap: float) -> float:
+        best = 0.0 if query.isdigit() else SCORE_FUZZY * overlap
+        for field, key in entry.keys:
+            if key == query:
+                score = SCORE_EXACT
+            elif key.startswith(query):
+                score = SCORE_PREFIX
+            elif query in key:
+                score = SCORE_SUBSTRING
+            else:
+                continue
+            # 同类匹配中字段权重小、剩余未匹配字符少者优先
+            best = max(best, score - field * 10 - (len(key) - len(query)))
+        return best
+
+    def search(self, query: str, limit: int = 10) -> List[StockSearchItem]:
+        """按相关度返回最多 limit 条结果"""
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        with self._lock:
+            candidates = dict.fromkeys(self._prefix_candidates(query, limit * PREFIX_CANDIDATE_FACTOR), 0.0)
+            if len(candidates) < limit:
+                for code, overlap in self._gram_candidates(query).items():
+                    candidates[code] = max(candidates.get(code, 0.0), overlap)
+
+            scored = [
+                (self._score(self._entries[code], query, overlap), code)
+                for code, overlap in candidates.items()
+            ]
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            return [self._entries[code].item for score, code in scored[:limit] if score > 0]
+
+    def stats(self) -> Dict[str, Any]:
+        """索引规模"""
+        with self._lock:
+            return {
+                "stocks": len(self._entries),
+                "grams": len(self._grams),
+                "ready": self.ready,
+                "pinyin": PINYIN_AVAILABLE
+            }
+
+
+# 全局搜索索引
+stock_search_index = StockSearchIndex()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 序列化
+Redis 缓存值和 API 响应共用的编解码入口，按 settings.json_serializer 选择实现：
+orjson（默认，未安装时自动回退）或标准库 json
+
+- dumps 返回 UTF-8 bytes，可直接写入 Redis 或作为响应体
+- datetime/date、numpy 数组与标量原生支持；Decimal 转为 float，其他未知类型转为字符串
+"""
+import datetime as dt
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Union
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj: Any) -> Any:
+    """orjson/json 无法直接处理的类型"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (dt.datetime, dt.date, dt.time)):
+        # pandas.Timestamp 等 datetime 子类
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return str(obj)
+
+
+if settings.json_serializer == "orjson" and ORJSON_AVAILABLE:
+    BACKEND = "orjson"
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        """序列化为 JSON bytes"""
+        option = _OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _OPTIONS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """解析 JSON"""
+        return orjson.loads(data)
+else:
+    if settings.json_serializer == "orjson":
+        logger.warning("orjson not installed, falling back to standard json serializer")
+    BACKEND = "json"
+
+    def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        """序列化为 JSON bytes"""
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")
+        ).encode()
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """解析 JSON"""
+        return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """使用上面序列化实现的默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight 请求合并
+同一缓存键同时未命中时只允许一个加载者访问 PostgreSQL / AKShare，其余调用方等待并共享结果
+
+- SingleFlight: 进程内合并（线程级）
+- RedisSingleFlight: 基于 Redis 锁的跨进程合并（可选）
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的加载"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """进程内 single-flight
+
+    同一 key 的并发调用只执行一次 fn，其余调用阻塞等待该次结果
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+        # 击穿统计
+        self._stats = {
+            "calls": 0,        # do() 调用总数
+            "executions": 0,   # 实际执行加载次数
+            "coalesced": 0,    # 等待并共享结果的次数（即节省的加载次数）
+            "errors": 0,       # 加载异常次数
+        }
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """执行或等待 key 对应的加载
+
+        Returns:
+            (结果, 是否为共享结果)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                logger.info(f"Single-flight {self.name}: {key} shared with {call.waiters} waiters")
+
+        return call.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["name"] = self.name
+        stats["saved_ratio"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+
+# 仅当锁仍属于自己时才删除
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisSingleFlight:
+    """基于 Redis 锁的跨进程 single-flight
+
+    - 获得锁的进程执行加载并写入缓存
+    - 其他进程轮询缓存（check），直到读到结果、锁被释放或等待超时
+    - 锁释放仍未读到结果（加载失败）或等待超时时，由调用方自行加载兜底
+    """
+
+    def __init__(self, redis_client, lock_ttl: float = 30.0, wait_timeout: float = 10.0,
+                 poll_interval: float = 0.05, prefix: str = "singleflight:lock"):
+        self.redis_client = redis_client
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "lock_acquired": 0,   # 获得锁并执行加载
+            "wait_hits": 0,       # 等待期间从缓存读到其他进程的结果
+            "wait_fallbacks": 0,  # 等待无结果后自行加载
+            "lock_errors": 0,     # Redis 不可用，直接加载
+        }
+
+    def _incr(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def do(self, key: str, fn: Callable[[], Any], check: Callable[[], Any]) -> Tuple[Any, bool]:
+        """跨进程执行或等待 key 对应的加载
+
+        Args:
+            key: 缓存键
+            fn: 加载函数（负责写入缓存）
+            check: 读取缓存，未命中返回 None
+
+        Returns:
+            (结果, 是否来自其他进程的加载)
+        """
+        lock_key = f"{self.prefix}:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = self.redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable for {key}: {e}")
+            self._incr("lock_errors")
+            return fn(), False
+
+        if acquired:
+            self._incr("lock_acquired")
+            try:
+                return fn(), False
+            finally:
+                try:
+                    self._release(keys=[lock_key], args=[token])
+                except Exception as e:
+                    logger.warning(f"Single-flight lock release failed for {key}: {e}")
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            cached = check()
+            if cached is not None:
+                self._incr("wait_hits")
+                return cached, True
+            try:
+                if not self.redis_client.exists(lock_key):
+                    break
+            except Exception:
+                break
+
+        # 锁刚释放时结果可能已写入缓存
+        cached = check()
+        if cached is not None:
+            self._incr("wait_hits")
+            return cached, True
+
+        self._incr("wait_fallbacks")
+        return fn(), False
+
+    def stats(self) -> Dict[str, Any]:
+        """跨进程合并统计"""
+        with self._stats_lock:
+            return dict(self._stats)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+股票代码与AKShare表格的向量化处理
+按列整体转换 DataFrame，避免 iterrows 逐行构造
+"""
+from typing import Any, Dict, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+# 代码前两位 -> 市场
+SH_PREFIXES = ('60', '68', '90')
+SZ_PREFIXES = ('00', '30')
+
+
+def market_of(code: str) -> str:
+    """单只股票的市场"""
+    if code.startswith(SH_PREFIXES):
+        return 'SH'
+    if code.startswith(SZ_PREFIXES):
+        return 'SZ'
+    return 'OTHER'
+
+
+def normalize_codes(codes: pd.Series) -> pd.Series:
+    """统一为6位字符串代码"""
+    return codes.astype(str).str.zfill(6)
+
+
+def classify_markets(codes: pd.Series) -> np.ndarray:
+    """批量判断市场"""
+    prefix = codes.str[:2]
+    return np.select(
+        [prefix.isin(SH_PREFIXES), prefix.isin(SZ_PREFIXES)],
+        ['SH', 'SZ'],
+        default='OTHER'
+    )
+
+
+def stock_list_records(df: pd.DataFrame) -> List[Dict[str, str]]:
+    """stock_info_a_code_name 表 -> [{"code", "name", "market"}]"""
+    codes = normalize_codes(df['code'])
+    return pd.DataFrame({
+        'code': codes,
+        'name': df['name'].astype(str),
+        'market': classify_markets(codes)
+    }).to_dict('records')
+
+
+def item_value_dict(df: pd.DataFrame) -> Dict[str, Any]:
+    """item/value 两列的纵表（如 stock_individual_info_em）-> 字典"""
+    return dict(zip(df['item'], df['value']))
+
+
+def frame_to_records(df: pd.DataFrame, columns: Mapping[str, str],
+                     dtypes: Mapping[str, str]) -> List[Dict[str, Any]]:
+    """
+    按列重命名并转换类型后输出记录列表
+
+    Args:
+        columns: 源列名 -> 输出字段名，源列缺失时该字段取默认值
+        dtypes: 输出字段名 -> 'str' / 'float' / 'int'
+    """
+    out = {}
+    for source, field in columns.items():
+        kind = dtypes.get(field, 'str')
+        if kind == 'str':
+            out[field] = df[source].astype(str) if source in df.columns else pd.Series('', index=df.index)
+            continue
+
+        values = pd.to_numeric(df[source], errors='coerce') if source in df.columns \
+            else pd.Series(0, index=df.index)
+        values = values.fillna(0)
+        out[field] = values.astype(np.int64) if kind == 'int' else values.astype(np.float64)
+
+    return pd.DataFrame(out, index=df.index).to_dict('records')
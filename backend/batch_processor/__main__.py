@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理调度器入口
+启动 BatchScheduler 并一直运行，收到 SIGINT/SIGTERM 时停止调度器并关闭连接池；
+执行中的工作单元保持 running 状态，下次启动时恢复；
+指定 --metrics-port 时在该端口导出 Prometheus 指标（含本进程 PostgreSQL 连接池饱和度）
+
+用法（在 backend 目录下）:
+    python -m batch_processor --metrics-port 9102
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from prometheus_client import start_http_server
+
+from app.core.db_pool import close_pg_pools, pg_pool_stats
+from app.core.metrics import register_pg_pool_stats
+from app.core.redis_pool import close_redis_pools
+from app.utils.logger import LOG_FORMAT
+
+from .scheduler import BatchScheduler
+
+logger = logging.getLogger("batch_processor")
+
+
+async def main(metrics_port: Optional[int] = None):
+    if metrics_port:
+        register_pg_pool_stats(pg_pool_stats)
+        start_http_server(metrics_port)
+        logger.info(f"Prometheus 指标: :{metrics_port}/metrics")
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    scheduler = BatchScheduler()
+    await scheduler.start()
+    try:
+        await stopping.wait()
+        logger.info("收到停止信号，停止批处理调度器")
+    finally:
+        await scheduler.stop()
+        await close_redis_pools()
+        close_pg_pools()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prism2 批处理调度器")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Prometheus 指标端口，不指定则不导出")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    asyncio.run(main(args.metrics_port))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场批量数据获取
+龙虎榜、实时行情这类 AKShare 接口本身返回全市场表，逐只股票调用等于把同一张表下载 N 次。
+批处理中这两类数据改为每次运行下载一次全市场表，按股票代码拆分（龙虎榜一只股票多行，用 groupby），
+再一次性写入 PostgreSQL（execute_values）和 Redis（单个 pipeline），上游调用从 N 次降为 1 次
+
+- 写入的数据格式与 ThreeTierDataService 逐只获取时完全一致，Dashboard 读取不受影响
+- 下载的全市场表在 frame_ttl 内复用，同一轮调度中多个自选股列表只下载、拆分、写入一次；
+  复用时只返回本次请求的股票，只补写之前没有写入的股票（如龙虎榜未上榜股票的空记录）
+- 实时行情没有 PostgreSQL 层（Dashboard 也只缓存在 Redis），只写 Redis
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import akshare as ak
+    AKSHARE_AVAILABLE = True
+except ImportError:
+    AKSHARE_AVAILABLE = False
+
+from app.core.rate_limiter import akshare_limiter
+from app.services.market_snapshot import SPOT_COLUMNS, fetch_spot_table
+
+logger = logging.getLogger(__name__)
+
+
+class BulkFetcher:
+    """全市场表批量获取基类：下载一次、按代码拆分、批量写入"""
+
+    data_type: str = ""
+    # 对应 DATA_TYPE_SOURCES 中逐只获取时的上游接口，用于日志和统计
+    source: str = ""
+    # 是否写入 PostgreSQL
+    persist: bool = True
+    # 全市场表复用时间(秒)
+    frame_ttl: float = 60
+
+    def __init__(self, data_service, frame_ttl: Optional[float] = None):
+        self.data_service = data_service
+        if frame_ttl is not None:
+            self.frame_ttl = frame_ttl
+        self._frame: Optional[pd.DataFrame] = None
+        self._fetched_at = 0.0
+        # 当前全市场表已写入的拆分结果；None 表示新下载或上次写入失败，需要全部写入
+        self._partitions: Optional[Dict[str, Dict]] = None
+        self._lock = threading.RLock()
+
+    def fetch_frame(self) -> pd.DataFrame:
+        """下载全市场表"""
+        raise NotImplementedError
+
+    def partition(self, frame: pd.DataFrame, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        """按股票代码拆分为 {stock_code: data}"""
+        raise NotImplementedError
+
+    def fill_missing(self, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        """全市场表中没有的股票的记录，默认不生成（由三层架构逐只获取）"""
+        return {}
+
+    def _get_frame(self) -> pd.DataFrame:
+        # 并发调用方等待同一次下载
+        with self._lock:
+            if self._frame is None or time.monotonic() - self._fetched_at >= self.frame_ttl:
+                original_proxy = self.data_service.clear_proxy()
+                try:
+                    frame = self.fetch_frame()
+                finally:
+                    self.data_service.restore_proxy(original_proxy)
+                self._frame = frame if frame is not None else pd.DataFrame()
+                self._fetched_at = time.monotonic()
+                self._partitions = None
+                logger.info(f"全市场表下载完成: {self.source}, {len(self._frame)} 行")
+            return self._frame
+
+    def run(self, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        """
+        下载（或复用）全市场表，返回 stock_codes 中取到的 {stock_code: data}
+        新下载的表全部拆分写入 PostgreSQL 和 Redis；复用时只补写尚未写入的股票
+        阻塞调用，批处理中在线程池执行；并发调用方等待同一次写入
+        写入 PostgreSQL 或 Redis 失败时抛出 RuntimeError，调用方回退为逐只获取
+        """
+        stock_codes = list(stock_codes)
+        with self._lock:
+            frame = self._get_frame()
+            if self._partitions is None:
+                pending = self.partition(frame, stock_codes)
+                self._save(pending)
+                self._partitions = pending
+                if pending:
+                    logger.info(f"✅ 批量获取 {self.data_type}: 1 次 {self.source} 调用, {len(pending)} 只股票")
+            else:
+                pending = self.fill_missing(code for code in stock_codes if code not in self._partitions)
+                self._save(pending)
+                self._partitions.update(pending)
+            return {code: self._partitions[code] for code in stock_codes if code in self._partitions}
+
+    def _save(self, partitions: Dict[str, Dict]):
+        if not partitions:
+            return
+        start_time = time.time()
+        if self.persist and not self.data_service.save_many_to_postgresql(self.data_type, partitions):
+            raise RuntimeError(f"批量写入PostgreSQL失败: {self.data_type}")
+        saved = self.data_service.save_many_to_redis(
+            {self.data_service.get_cache_key(self.data_type, stock_code): data
+             for stock_code, data in partitions.items()},
+            self.data_service.cache_ttl.get(self.data_type, 300),
+            self.data_service.stale_grace.get(self.data_type, 0),
+            time.time() - start_time
+        )
+        if saved < len(partitions):
+            raise RuntimeError(f"批量写入Redis失败: {self.data_type}, {saved}/{len(partitions)}")
+
+
+class LonghubangBulkFetcher(BulkFetcher):
+    """龙虎榜：一次 stock_lhb_detail_em 取近30天全市场明细"""
+
+    data_type = "longhubang"
+    source = "stock_lhb_detail_em"
+    frame_ttl = 600
+    days = 30
+
+    def fetch_frame(self) -> pd.DataFrame:
+        end_date = datetime.now().strftime("%Y%m%d")
+        start_date = (datetime.now() - timedelta(days=self.days)).strftime("%Y%m%d")
+        return akshare_limiter.call(ak.stock_lhb_detail_em, start_date=start_date, end_date=end_date)
+
+    def partition(self, frame: pd.DataFrame, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        partitions = {}
+        if not frame.empty:
+            for stock_code, stock_lhb in frame.groupby(frame['代码'].astype(str), sort=False):
+                partitions[stock_code] = self.data_service.longhubang_data(
+                    self.data_service.format_longhubang(stock_lhb), self.days
+                )
+        partitions.update(self.fill_missing(code for code in stock_codes if code not in partitions))
+        return partitions
+
+    def fill_missing(self, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        # 近期未上榜的股票记为空记录，与逐只获取的结果一致
+        return {stock_code: self.data_service.longhubang_data([], self.days) for stock_code in stock_codes}
+
+
+class RealtimeBulkFetcher(BulkFetcher):
+    """实时行情：一次 stock_zh_a_spot_em 取全市场行情"""
+
+    data_type = "realtime"
+    source = "stock_zh_a_spot_em"
+    persist = False
+    frame_ttl = 30
+
+    def fetch_frame(self) -> pd.DataFrame:
+        return fetch_spot_table()
+
+    def partition(self, frame: pd.DataFrame, stock_codes: Iterable[str]) -> Dict[str, Dict]:
+        if frame.empty:
+            return {}
+        columns = [column for column in SPOT_COLUMNS if column in frame.columns]
+        # 行情表每只股票一行，无需 groupby；停牌等无行情的股票价格为 NaN，不写入，由三层架构逐只获取
+        latest = frame[frame['最新价'].notna()].drop_duplicates('代码', keep='last')
+        timestamp = datetime.now().isoformat()
+
+        partitions = {}
+        for stock_code, row in zip(latest['代码'].astype(str), latest[columns].to_dict('records')):
+            data = {SPOT_COLUMNS[column]: (None if pd.isna(value) else value) for column, value in row.items()}
+            data.update({
+                "current_price": float(data['current_price']),
+                "change_percent": float(data.get('change_percent') or 0),
+                "volume": int(data.get('volume') or 0),
+                "turnover": float(data.get('turnover') or 0),
+                "timestamp": timestamp,
+            })
+            partitions[stock_code] = data
+        return partitions
+
+
+BULK_FETCHERS = {
+    fetcher.data_type: fetcher
+    for fetcher in (LonghubangBulkFetcher, RealtimeBulkFetcher)
+}
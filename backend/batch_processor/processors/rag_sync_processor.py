@@ -5,20 +5,46 @@ RAG同步处理器
 将批处理获取的数据自动同步到RAG系统
 """
 import asyncio
+import functools
 import logging
 import time
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import json
 
+from app.core.db_pool import pg_connection
+
 from ..config.batch_config import config
 from ..services.version_manager import VersionManager
 from ..services.data_vectorizer import DataVectorizer
 
 logger = logging.getLogger(__name__)
 
+
+def _new_sync_result() -> Dict[str, Any]:
+    return {
+        "success": False,
+        "skipped": False,
+        "new_version_created": False,
+        "version_activated": False,
+        "error": None,
+        "version_id": None,
+        "chunks_count": 0
+    }
+
+
+@dataclass
+class PendingSync:
+    """流水线中的一个 (股票, 数据类型) 同步项"""
+    stock_code: str
+    data_type: str
+    version_id: Optional[str] = None
+    vector_data: List[Dict[str, Any]] = field(default_factory=list)
+    result: Dict[str, Any] = field(default_factory=_new_sync_result)
+
+
 class RAGSyncProcessor:
     """批处理数据RAG同步处理器"""
 
@@ -30,6 +56,11 @@ class RAGSyncProcessor:
         self.embedding_service = None
         self.vector_service = None
 
+        # 跨项目累积到 embedding_batch_size 个文本块后整批向量化和写入；model_batch_size 为模型每次前向的文本数
+        rag_settings = config.rag_settings
+        self.embedding_batch_size = int(rag_settings.get('embedding_batch_size', 256))
+        self.model_batch_size = int(rag_settings.get('model_batch_size', 64))
+
         # 初始化RAG服务
         self._init_rag_services()
 
@@ -64,16 +95,17 @@ class RAGSyncProcessor:
             self.vector_service = None
 
     def _get_connection(self):
-        """获取数据库连接"""
-        if 'url' in self.db_config:
-            return psycopg2.connect(self.db_config['url'])
-        else:
-            return psycopg2.connect(**self.db_config)
+        """从共享连接池获取数据库连接，close() 时归还"""
+        return pg_connection(self.db_config)
 
     async def sync_batch_data_to_rag(self, stock_codes: List[str], data_types: List[str], force_refresh: bool = False) -> Dict[str, Any]:
         """
         批量同步数据到RAG
 
+        按流水线处理：逐项读取结构化数据、创建版本并切分文本块，文本块跨股票/数据类型累积到
+        embedding_batch_size 后整批向量化（EmbeddingService.embed_batch）、每个集合一次 upsert、
+        映射一次 execute_values 写入；一批写入期间继续准备下一批
+
         Args:
             stock_codes: 股票代码列表
             data_types: 数据类型列表
@@ -93,6 +125,9 @@ class RAGSyncProcessor:
             "new_versions_created": 0,
             "versions_activated": 0,
             "failed_items": [],
+            "chunks_processed": 0,
+            "chunks_per_second": 0.0,
+            "stage_times": {"prepare": 0.0, "embed": 0.0, "upsert": 0.0, "mapping": 0.0, "activate": 0.0},
             "processing_time": 0,
             "start_time": datetime.now()
         }
@@ -100,43 +135,41 @@ class RAGSyncProcessor:
         try:
             logger.info(f"开始批量RAG同步: {len(stock_codes)}只股票, {len(data_types)}种数据类型")
 
+            pending: List[PendingSync] = []
+            pending_chunks = 0
+            flushing: Optional[asyncio.Task] = None
+
+            async def flush(batch: List[PendingSync]):
+                await self._flush_pending(batch, result["stage_times"])
+                for item in batch:
+                    self._collect_item_result(result, item)
+
             # 处理每个股票的每种数据类型
             for stock_code in stock_codes:
                 for data_type in data_types:
-                    try:
-                        result["processed_items"] += 1
-
-                        sync_result = await self.sync_single_stock_data(
-                            stock_code, data_type, force_refresh
-                        )
-
-                        if sync_result["success"]:
-                            result["successful_syncs"] += 1
-                            if sync_result.get("new_version_created"):
-                                result["new_versions_created"] += 1
-                            if sync_result.get("version_activated"):
-                                result["versions_activated"] += 1
-                        elif sync_result.get("skipped"):
-                            result["skipped_syncs"] += 1
-                        else:
-                            result["failed_syncs"] += 1
-                            result["failed_items"].append({
-                                "stock_code": stock_code,
-                                "data_type": data_type,
-                                "error": sync_result.get("error", "未知错误")
-                            })
-
-                        # 控制处理频率，避免过载
-                        await asyncio.sleep(0.1)
-
-                    except Exception as e:
-                        result["failed_syncs"] += 1
-                        result["failed_items"].append({
-                            "stock_code": stock_code,
-                            "data_type": data_type,
-                            "error": str(e)
-                        })
-                        logger.error(f"RAG同步失败: {stock_code}-{data_type}, {e}")
+                    result["processed_items"] += 1
+                    prepare_start = time.time()
+                    item = await self._prepare_sync(stock_code, data_type, force_refresh)
+                    result["stage_times"]["prepare"] += time.time() - prepare_start
+
+                    if not item.vector_data:
+                        # 跳过或准备阶段已失败
+                        self._collect_item_result(result, item)
+                        continue
+
+                    pending.append(item)
+                    pending_chunks += len(item.vector_data)
+                    if pending_chunks >= self.embedding_batch_size:
+                        # 上一批写完后再提交本批，当前批写入期间继续准备下一批
+                        if flushing:
+                            await flushing
+                        flushing = asyncio.create_task(flush(pending))
+                        pending, pending_chunks = [], 0
+
+            if flushing:
+                await flushing
+            if pending:
+                await flush(pending)
 
         except Exception as e:
             logger.error(f"批量RAG同步过程失败: {e}")
@@ -145,13 +178,37 @@ class RAGSyncProcessor:
         finally:
             result["processing_time"] = time.time() - start_time
             result["end_time"] = datetime.now()
+            if result["processing_time"] > 0:
+                result["chunks_per_second"] = result["chunks_processed"] / result["processing_time"]
 
-        logger.info(f"批量RAG同步完成: 成功{result['successful_syncs']}, 失败{result['failed_syncs']}, 跳过{result['skipped_syncs']}, 耗时{result['processing_time']:.2f}秒")
+        logger.info(f"批量RAG同步完成: 成功{result['successful_syncs']}, 失败{result['failed_syncs']}, 跳过{result['skipped_syncs']}, "
+                    f"{result['chunks_processed']}个文本块, {result['chunks_per_second']:.1f}块/秒, 耗时{result['processing_time']:.2f}秒")
         return result
 
+    @staticmethod
+    def _collect_item_result(result: Dict[str, Any], item: "PendingSync"):
+        """单项同步结果计入批量统计"""
+        item_result = item.result
+        if item_result["success"]:
+            result["successful_syncs"] += 1
+            result["chunks_processed"] += item_result["chunks_count"]
+            if item_result.get("new_version_created"):
+                result["new_versions_created"] += 1
+            if item_result.get("version_activated"):
+                result["versions_activated"] += 1
+        elif item_result.get("skipped"):
+            result["skipped_syncs"] += 1
+        else:
+            result["failed_syncs"] += 1
+            result["failed_items"].append({
+                "stock_code": item.stock_code,
+                "data_type": item.data_type,
+                "error": item_result.get("error") or "未知错误"
+            })
+
     async def sync_single_stock_data(self, stock_code: str, data_type: str, force_refresh: bool = False) -> Dict[str, Any]:
         """
-        同步单个股票数据到RAG
+        同步单个股票数据到RAG（与批量同步走同一流水线，只有一项）
 
         Args:
             stock_code: 股票代码
@@ -161,25 +218,27 @@ class RAGSyncProcessor:
         Returns:
             同步结果
         """
-        result = {
-            "success": False,
-            "skipped": False,
-            "new_version_created": False,
-            "version_activated": False,
-            "error": None,
-            "version_id": None,
-            "chunks_count": 0
-        }
+        logger.info(f"开始RAG同步: {stock_code}-{data_type}")
+        item = await self._prepare_sync(stock_code, data_type, force_refresh)
+        if item.vector_data:
+            await self._flush_pending([item])
+        return item.result
 
-        try:
-            logger.info(f"开始RAG同步: {stock_code}-{data_type}")
+    async def _prepare_sync(self, stock_code: str, data_type: str, force_refresh: bool = False) -> "PendingSync":
+        """
+        流水线第一阶段：获取结构化数据、检查是否变化、创建新版本并切分文本块
+        返回的 vector_data 为空时该项已结束（跳过或失败），结果在 result 中
+        """
+        item = PendingSync(stock_code, data_type)
+        result = item.result
 
+        try:
             # 1. 获取最新的结构化数据
             source_data = await self.get_latest_structured_data(stock_code, data_type)
             if not source_data:
                 result["error"] = "无法获取结构化数据"
                 logger.warning(f"无结构化数据: {stock_code}-{data_type}")
-                return result
+                return item
 
             # 2. 检查是否需要创建新版本
             if not force_refresh:
@@ -190,44 +249,25 @@ class RAGSyncProcessor:
                     result["skipped"] = True
                     result["version_id"] = existing_version["version_id"]
                     logger.info(f"数据未变化，跳过RAG同步: {stock_code}-{data_type}")
-                    return result
+                    return item
 
             # 3. 创建新版本
-            version_id = await self.version_manager.create_new_version(stock_code, data_type, source_data)
-            result["version_id"] = version_id
+            item.version_id = await self.version_manager.create_new_version(stock_code, data_type, source_data)
+            result["version_id"] = item.version_id
             result["new_version_created"] = True
 
-            # 4. 数据向量化
-            vectorization_result = await self._vectorize_data(version_id, stock_code, data_type, source_data)
-            if not vectorization_result["success"]:
-                result["error"] = f"向量化失败: {vectorization_result['error']}"
-                await self.version_manager.update_vector_status(version_id, 'failed')
-                return result
-
-            result["chunks_count"] = vectorization_result["chunks_count"]
-
-            # 5. 同步向量到ChromaDB
-            if self.vector_service:
-                sync_result = await self._sync_vectors_to_chromadb(version_id, vectorization_result["vector_data"])
-                if not sync_result["success"]:
-                    result["error"] = f"向量同步失败: {sync_result['error']}"
-                    await self.version_manager.update_vector_status(version_id, 'failed')
-                    return result
-
-            # 6. 激活新版本（这会自动停用旧版本）
-            activation_success = await self.version_manager.activate_version(version_id)
-            if activation_success:
-                result["version_activated"] = True
-                result["success"] = True
-                logger.info(f"RAG同步成功: {stock_code}-{data_type}, version={version_id}")
-            else:
-                result["error"] = "版本激活失败"
+            # 4. 切分文本块
+            item.vector_data = self._build_chunks(item.version_id, stock_code, data_type, source_data)
+            if not item.vector_data:
+                result["error"] = "向量化失败: 文本转换失败，无有效文本块"
+                await self.version_manager.update_vector_status(item.version_id, 'failed')
 
         except Exception as e:
+            item.vector_data = []
             result["error"] = str(e)
             logger.error(f"RAG同步失败: {stock_code}-{data_type}, {e}")
 
-        return result
+        return item
 
     async def get_latest_structured_data(self, stock_code: str, data_type: str) -> Optional[Dict]:
         """从PostgreSQL获取最新结构化数据"""
@@ -319,177 +359,178 @@ class RAGSyncProcessor:
             logger.error(f"检查版本失败: {e}")
             return None
 
-    async def _vectorize_data(self, version_id: str, stock_code: str, data_type: str, source_data: Dict) -> Dict[str, Any]:
-        """数据向量化"""
-        try:
-            logger.info(f"开始向量化: {stock_code}-{data_type}")
-
-            # 1. 转换为文本块
-            text_chunks = self.data_vectorizer.transform_to_text_chunks(stock_code, data_type, source_data)
-            if not text_chunks:
-                return {"success": False, "error": "文本转换失败，无有效文本块"}
-
-            # 2. 计算向量（如果有embedding服务）
-            vector_data = []
-            if self.embedding_service:
-                for i, chunk_text in enumerate(text_chunks):
-                    try:
-                        # 计算embedding
-                        embedding = await self._compute_embedding(chunk_text)
-                        if embedding:
-                            # 创建向量数据
-                            chunk_metadata = self.data_vectorizer.create_chunk_metadata(
-                                stock_code, data_type, i, version_id, chunk_text
-                            )
-
-                            vector_data.append({
-                                "vector_id": f"{version_id}_{i}",
-                                "chunk_index": i,
-                                "chunk_text": chunk_text,
-                                "embedding": embedding,
-                                "metadata": chunk_metadata
-                            })
-
-                    except Exception as e:
-                        logger.error(f"计算embedding失败: {chunk_text[:50]}, {e}")
-                        continue
-            else:
-                # 模拟模式：不计算实际向量
-                for i, chunk_text in enumerate(text_chunks):
-                    chunk_metadata = self.data_vectorizer.create_chunk_metadata(
-                        stock_code, data_type, i, version_id, chunk_text
-                    )
-                    vector_data.append({
-                        "vector_id": f"{version_id}_{i}",
-                        "chunk_index": i,
-                        "chunk_text": chunk_text,
-                        "embedding": None,  # 模拟模式
-                        "metadata": chunk_metadata
-                    })
-
-            # 3. 更新版本状态
-            await self.version_manager.update_vector_status(
-                version_id, 'vectorized', len(vector_data),
-                {"chunks_count": len(vector_data), "vectorization_time": datetime.now().isoformat()}
-            )
-
-            logger.info(f"向量化完成: {stock_code}-{data_type}, {len(vector_data)}个文本块")
-
-            return {
-                "success": True,
-                "chunks_count": len(vector_data),
-                "vector_data": vector_data
+    def _build_chunks(self, version_id: str, stock_code: str, data_type: str, source_data: Dict) -> List[Dict[str, Any]]:
+        """结构化数据切分为文本块，附带向量ID和元数据（向量在批量阶段统一计算）"""
+        text_chunks = self.data_vectorizer.transform_to_text_chunks(stock_code, data_type, source_data)
+        collection_name = f"stock_{data_type}_{stock_code}"
+        return [
+            {
+                "vector_id": f"{version_id}_{i}",
+                "chunk_index": i,
+                "chunk_text": chunk_text,
+                "embedding": None,
+                "collection_name": collection_name,
+                "metadata": self.data_vectorizer.create_chunk_metadata(
+                    stock_code, data_type, i, version_id, chunk_text
+                )
             }
+            for i, chunk_text in enumerate(text_chunks or [])
+        ]
 
-        except Exception as e:
-            logger.error(f"向量化失败: {stock_code}-{data_type}, {e}")
-            return {"success": False, "error": str(e)}
+    async def _flush_pending(self, batch: List["PendingSync"], stage_times: Optional[Dict[str, float]] = None):
+        """
+        流水线第二阶段：一批项目的全部文本块一次向量化，每个集合一次 upsert，映射一次写入，再逐项激活版本
+        失败只影响所在的项目，不抛出异常
+        """
+        stage_times = stage_times if stage_times is not None else {}
 
-    async def _compute_embedding(self, text: str) -> Optional[List[float]]:
-        """计算文本embedding"""
+        def timed(stage: str, started: float):
+            stage_times[stage] = stage_times.get(stage, 0.0) + time.time() - started
+
+        vector_data = [vector_item for item in batch for vector_item in item.vector_data]
+        failed_collections: Dict[str, str] = {}
         try:
-            if self.embedding_service and hasattr(self.embedding_service, 'encode'):
-                # 调用embedding服务
-                embedding = await self.embedding_service.encode(text)
-                return embedding.tolist() if hasattr(embedding, 'tolist') else embedding
+            # 1. 整批计算embedding
+            started = time.time()
+            await self._embed_chunks(vector_data)
+            timed("embed", started)
+
+            for item in batch:
+                await self.version_manager.update_vector_status(
+                    item.version_id, 'vectorized', len(item.vector_data),
+                    {"chunks_count": len(item.vector_data), "vectorization_time": datetime.now().isoformat()}
+                )
+
+            # 2. 每个集合一次 upsert，成功写入的向量一次记录映射
+            if self.vector_service:
+                started = time.time()
+                failed_collections = await self._upsert_vectors(vector_data)
+                timed("upsert", started)
+
+                started = time.time()
+                self._record_vector_mappings([
+                    vector_item for vector_item in vector_data
+                    if vector_item["collection_name"] not in failed_collections
+                ])
+                timed("mapping", started)
             else:
-                logger.warning("Embedding服务不可用")
-                return None
+                logger.info("向量服务不可用，跳过ChromaDB同步")
 
         except Exception as e:
-            logger.error(f"计算embedding失败: {e}")
-            return None
+            logger.error(f"批量向量化失败: {len(batch)}项, {len(vector_data)}个文本块, {e}")
+            for item in batch:
+                item.result["error"] = f"向量化失败: {e}"
+                await self._mark_failed(item)
+            return
+
+        # 3. 激活新版本（这会自动停用旧版本）
+        started = time.time()
+        for item in batch:
+            result = item.result
+            result["chunks_count"] = len(item.vector_data)
+            collection_name = item.vector_data[0]["collection_name"]
+            if collection_name in failed_collections:
+                result["error"] = f"向量同步失败: {failed_collections[collection_name]}"
+                await self._mark_failed(item)
+                continue
+            try:
+                if await self.version_manager.activate_version(item.version_id):
+                    result["version_activated"] = True
+                    result["success"] = True
+                    logger.info(f"RAG同步成功: {item.stock_code}-{item.data_type}, version={item.version_id}")
+                else:
+                    result["error"] = "版本激活失败"
+            except Exception as e:
+                result["error"] = str(e)
+                logger.error(f"RAG同步失败: {item.stock_code}-{item.data_type}, {e}")
+        timed("activate", started)
 
-    async def _sync_vectors_to_chromadb(self, version_id: str, vector_data: List[Dict]) -> Dict[str, Any]:
-        """同步向量到ChromaDB"""
+    async def _mark_failed(self, item: "PendingSync"):
         try:
-            if not self.vector_service:
-                logger.info("向量服务不可用，跳过ChromaDB同步")
-                return {"success": True, "note": "模拟模式"}
-
-            logger.info(f"开始同步向量到ChromaDB: {len(vector_data)}个向量")
-
-            # 获取版本信息以确定集合名称
-            version_info = await self.version_manager.get_version_by_id(version_id)
-            if not version_info:
-                return {"success": False, "error": "版本信息不存在"}
-
-            stock_code = version_info["stock_code"]
-            data_type = version_info["data_type"]
-            collection_name = f"stock_{data_type}_{stock_code}"
-
-            # 插入向量数据到ChromaDB
-            vectors_inserted = 0
-            for vector_item in vector_data:
-                try:
-                    # 准备ChromaDB格式的数据
-                    documents = [vector_item["chunk_text"]]
-                    metadatas = [vector_item["metadata"]]
-                    ids = [vector_item["vector_id"]]
-
-                    if vector_item["embedding"]:
-                        embeddings = [vector_item["embedding"]]
-                    else:
-                        embeddings = None
-
-                    # 插入到ChromaDB
-                    if hasattr(self.vector_service, 'add_vectors'):
-                        await self.vector_service.add_vectors(
-                            collection_name=collection_name,
-                            documents=documents,
-                            metadatas=metadatas,
-                            ids=ids,
-                            embeddings=embeddings
-                        )
-
-                    vectors_inserted += 1
-
-                    # 记录到rag_vector_mappings表
-                    await self._record_vector_mapping(version_id, vector_item, collection_name)
-
-                except Exception as e:
-                    logger.error(f"向量插入失败: {vector_item['vector_id']}, {e}")
-                    continue
-
-            logger.info(f"ChromaDB同步完成: {vectors_inserted}/{len(vector_data)}个向量成功插入")
-
-            return {
-                "success": vectors_inserted > 0,
-                "vectors_inserted": vectors_inserted,
-                "collection_name": collection_name
-            }
-
+            await self.version_manager.update_vector_status(item.version_id, 'failed')
         except Exception as e:
-            logger.error(f"ChromaDB同步失败: {e}")
-            return {"success": False, "error": str(e)}
-
-    async def _record_vector_mapping(self, version_id: str, vector_item: Dict, collection_name: str):
-        """记录向量映射关系"""
+            logger.error(f"更新向量状态失败: {item.version_id}, {e}")
+
+    async def _embed_chunks(self, vector_data: List[Dict[str, Any]]):
+        """一次 embed_batch 计算全部文本块的向量（模型内部按 model_batch_size 分批）；无embedding服务时保持为 None"""
+        if not self.embedding_service or not vector_data:
+            return
+
+        texts = [vector_item["chunk_text"] for vector_item in vector_data]
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(
+            None, functools.partial(self.embedding_service.embed_batch, texts, batch_size=self.model_batch_size)
+        )
+        if len(embeddings) != len(vector_data):
+            raise ValueError(f"embedding数量不匹配: {len(embeddings)}/{len(vector_data)}")
+        for vector_item, embedding in zip(vector_data, embeddings):
+            vector_item["embedding"] = embedding.tolist() if hasattr(embedding, 'tolist') else embedding
+
+    async def _upsert_vectors(self, vector_data: List[Dict[str, Any]]) -> Dict[str, str]:
+        """按集合分组，每个集合一次 collection.upsert；返回失败的集合 -> 错误信息"""
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for vector_item in vector_data:
+            by_collection.setdefault(vector_item["collection_name"], []).append(vector_item)
+
+        loop = asyncio.get_running_loop()
+        failed = {}
+        for collection_name, items in by_collection.items():
+            upsert_args = {
+                "ids": [vector_item["vector_id"] for vector_item in items],
+                "documents": [vector_item["chunk_text"] for vector_item in items],
+                "metadatas": [vector_item["metadata"] for vector_item in items],
+            }
+            if all(vector_item["embedding"] is not None for vector_item in items):
+                upsert_args["embeddings"] = [vector_item["embedding"] for vector_item in items]
+            try:
+                collection = await loop.run_in_executor(None, self._get_collection, collection_name)
+                await loop.run_in_executor(None, functools.partial(collection.upsert, **upsert_args))
+            except Exception as e:
+                failed[collection_name] = str(e)
+                logger.error(f"向量写入失败: {collection_name}, {len(items)}个向量, {e}")
+
+        logger.info(f"ChromaDB同步完成: {len(by_collection) - len(failed)}/{len(by_collection)}个集合, {len(vector_data)}个向量")
+        return failed
+
+    def _get_collection(self, collection_name: str):
+        """获取集合，不存在时创建（集合对象由 VectorService 缓存）"""
+        vector_service = self.vector_service
+        if not vector_service.is_connected() and not vector_service.connect():
+            raise RuntimeError("无法连接ChromaDB")
+        if collection_name not in vector_service.collections:
+            vector_service.collections[collection_name] = vector_service.client.get_or_create_collection(name=collection_name)
+        return vector_service.collections[collection_name]
+
+    def _record_vector_mappings(self, vector_data: List[Dict[str, Any]]):
+        """一次 execute_values 记录全部向量映射关系"""
+        if not vector_data:
+            return
+
+        created_at = datetime.now()
+        conn = self._get_connection()
         try:
-            conn = self._get_connection()
             cursor = conn.cursor()
-
-            cursor.execute("""
+            execute_values(cursor, """
                 INSERT INTO rag_vector_mappings
                 (version_id, vector_id, collection_name, chunk_index, chunk_text, metadata, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                version_id,
-                vector_item["vector_id"],
-                collection_name,
-                vector_item["chunk_index"],
-                vector_item["chunk_text"],
-                json.dumps(vector_item["metadata"], ensure_ascii=False),
-                datetime.now()
-            ))
-
+                VALUES %s
+            """, [
+                (
+                    vector_item["metadata"]["version_id"],
+                    vector_item["vector_id"],
+                    vector_item["collection_name"],
+                    vector_item["chunk_index"],
+                    vector_item["chunk_text"],
+                    json.dumps(vector_item["metadata"], ensure_ascii=False),
+                    created_at
+                )
+                for vector_item in vector_data
+            ], page_size=1000)
             conn.commit()
             cursor.close()
+        finally:
             conn.close()
 
-        except Exception as e:
-            logger.error(f"记录向量映射失败: {e}")
-
     async def get_rag_sync_status(self, stock_code: str = None, data_type: str = None) -> Dict[str, Any]:
         """获取RAG同步状态"""
         try:
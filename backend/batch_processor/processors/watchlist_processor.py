@@ -5,8 +5,10 @@
 复用现有的ThreeTierDataService进行数据预热
 """
 import asyncio
+import functools
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from datetime import datetime
 import sys
@@ -24,10 +26,25 @@ except ImportError:
 
 from ..config.batch_config import config
 from ..services.watchlist_service import WatchlistService
+from ..services.work_planner import ACTION_REFRESH, work_planner
 from ..models.batch_job import JobType, JobStatus, BatchJobCreate
+from ..utils.worker_pool import WorkerPool
+from .bulk_fetchers import BULK_FETCHERS
 
 logger = logging.getLogger(__name__)
 
+# 数据类型 -> 上游数据源（ThreeTierDataService 中调用的AKShare接口，与 akshare_rate_limits 的键一致）
+DATA_TYPE_SOURCES = {
+    "realtime": "stock_zh_a_hist",
+    "kline": "stock_zh_a_hist",
+    "news": "stock_news_em",
+    "announcements": "stock_news_em",
+    "financial": "stock_financial_abstract",
+    "shareholders": "stock_zh_a_gdhs_detail_em",
+    "longhubang": "stock_lhb_detail_em",
+    "basic_info": "stock_individual_info_em",
+}
+
 class WatchlistProcessor:
     """自选股批处理处理器"""
 
@@ -36,9 +53,34 @@ class WatchlistProcessor:
         self.data_service = None
         self.batch_settings = config.batch_settings
 
+        # 按上游数据源限制并发的工作池；节奏由 ThreeTierDataService 内的共享AKShare限流器控制
+        pool_settings = self.batch_settings.get('worker_pool', {}) or {}
+        self.worker_pool = WorkerPool(
+            "watchlist",
+            max_concurrency=pool_settings.get('max_concurrency', 16),
+            default_source_concurrency=pool_settings.get('default_source_concurrency', 4),
+            source_concurrency=pool_settings.get('source_concurrency', {}),
+            report_interval=pool_settings.get('report_interval', 10)
+        )
+        # ThreeTierDataService.get_data 是阻塞调用，在线程池中执行
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.worker_pool.max_concurrency, thread_name_prefix="watchlist-batch"
+        )
+
         # 初始化三层数据服务
         self._init_data_service()
 
+        # 全市场批量获取：同一批中某数据类型的股票数达到 min_stocks 时下载一次全市场表代替逐只调用
+        bulk_settings = self.batch_settings.get('bulk_fetch', {}) or {}
+        self.bulk_min_stocks = int(bulk_settings.get('min_stocks', 5))
+        frame_ttl = bulk_settings.get('frame_ttl', {}) or {}
+        self.bulk_fetchers = {}
+        if self.data_service and bulk_settings.get('enabled', True):
+            self.bulk_fetchers = {
+                data_type: fetcher(self.data_service, frame_ttl.get(data_type))
+                for data_type, fetcher in BULK_FETCHERS.items()
+            }
+
         logger.info("自选股批处理处理器初始化完成")
 
     def _init_data_service(self):
@@ -68,7 +110,8 @@ class WatchlistProcessor:
             "processing_time": 0,
             "failed_items": [],
             "cache_hits": 0,
-            "cache_misses": 0
+            "cache_misses": 0,
+            "throughput": 0.0
         }
 
         try:
@@ -92,26 +135,17 @@ class WatchlistProcessor:
             result["total_stocks"] = len(stocks_to_process)
             logger.info(f"开始处理优先级 {priority_level} 的批处理: {len(watchlists)} 个列表, {len(stocks_to_process)} 只股票")
 
-            # 批量处理股票数据
-            batch_size = self.batch_settings.get('max_stocks_per_batch', 20)
-            stock_list = list(stocks_to_process.items())
-
-            for i in range(0, len(stock_list), batch_size):
-                batch = stock_list[i:i + batch_size]
-                batch_result = await self._process_stock_batch(batch, force_refresh)
+            # 全部 (股票, 数据类型) 交给工作池，并发与节奏由工作池和共享限流器控制
+            batch_result = await self._process_stock_batch(list(stocks_to_process.items()), force_refresh)
 
-                # 累加结果
-                result["processed_stocks"] += batch_result["processed"]
-                result["success_count"] += batch_result["success"]
-                result["failed_count"] += batch_result["failed"]
-                result["skipped_count"] += batch_result["skipped"]
-                result["failed_items"].extend(batch_result["failed_items"])
-                result["cache_hits"] += batch_result["cache_hits"]
-                result["cache_misses"] += batch_result["cache_misses"]
-
-                # 批次间延迟，避免过度负载
-                if i + batch_size < len(stock_list):
-                    await asyncio.sleep(1)
+            result["processed_stocks"] += batch_result["processed"]
+            result["success_count"] += batch_result["success"]
+            result["failed_count"] += batch_result["failed"]
+            result["skipped_count"] += batch_result["skipped"]
+            result["failed_items"].extend(batch_result["failed_items"])
+            result["cache_hits"] += batch_result["cache_hits"]
+            result["cache_misses"] += batch_result["cache_misses"]
+            result["throughput"] = batch_result["throughput"]
 
             # 更新自选股使用统计
             await self._update_watchlist_stats(watchlists, result)
@@ -129,7 +163,10 @@ class WatchlistProcessor:
         return result
 
     async def _process_stock_batch(self, stock_batch: List[tuple], force_refresh: bool = False) -> Dict[str, Any]:
-        """处理股票批次"""
+        """
+        处理股票批次：展开为 (股票, 数据类型) 任务，经全局工作规划去重并跳过仍新鲜的数据后，
+        由工作池按数据源限制并发执行
+        """
         batch_result = {
             "processed": 0,
             "success": 0,
@@ -137,55 +174,112 @@ class WatchlistProcessor:
             "skipped": 0,
             "failed_items": [],
             "cache_hits": 0,
-            "cache_misses": 0
+            "cache_misses": 0,
+            "throughput": 0.0,
+            "plan": {}
         }
 
-        for stock_code, data_types in stock_batch:
-            for data_type in data_types:
-                try:
-                    batch_result["processed"] += 1
-
-                    # 调用现有的三层数据服务
-                    if self.data_service:
-                        response = await self._call_existing_api(stock_code, data_type, force_refresh)
-
-                        if response and response.get("success"):
-                            batch_result["success"] += 1
-
-                            # 统计缓存命中情况
-                            cache_info = response.get("cache_info", {})
-                            if any("缓存命中" in str(info) for info in cache_info.values()):
-                                batch_result["cache_hits"] += 1
-                            else:
-                                batch_result["cache_misses"] += 1
-                        else:
-                            batch_result["failed"] += 1
-                            batch_result["failed_items"].append({
-                                "stock_code": stock_code,
-                                "data_type": data_type,
-                                "error": "API调用失败"
-                            })
-                    else:
-                        # 模拟处理模式
-                        batch_result["skipped"] += 1
-                        logger.debug(f"模拟处理: {stock_code} - {data_type}")
-
-                except Exception as e:
-                    batch_result["failed"] += 1
-                    batch_result["failed_items"].append({
-                        "stock_code": stock_code,
-                        "data_type": data_type,
-                        "error": str(e)
-                    })
-                    logger.error(f"处理股票数据失败 {stock_code}-{data_type}: {e}")
+        pairs = [(stock_code, data_type) for stock_code, data_types in stock_batch for data_type in data_types]
+        batch_result["processed"] = len(pairs)
+
+        if not self.data_service:
+            # 模拟处理模式
+            batch_result["skipped"] = len(pairs)
+            logger.debug(f"模拟处理: {len(pairs)} 个数据项")
+            return batch_result
+
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(
+            self.executor, functools.partial(work_planner.plan, pairs, self.data_service, force_refresh)
+        )
+        batch_result["skipped"] = plan.skipped_total
+        batch_result["plan"] = plan.summary()
 
-                # 限制处理频率，避免过度负载AKShare
-                await asyncio.sleep(0.1)
+        bulk_items, pool_items = self._split_bulk_items(plan.items)
+        succeeded = []
+        try:
+            # 先批量获取，全市场表中没有的股票再与其他项目一起交给工作池
+            bulk_results, missing = await self._run_bulk_fetchers(bulk_items)
+            pool_results, pool_stats = await self.worker_pool.run(
+                pool_items + missing,
+                lambda item: self._call_existing_api(item[0], item[1], refresh=item[2] == ACTION_REFRESH),
+                lambda item: DATA_TYPE_SOURCES.get(item[1], "default")
+            )
+            results = bulk_results + pool_results
+            for (stock_code, data_type, _), response in results:
+                if not isinstance(response, Exception) and response and response.get("success"):
+                    succeeded.append((stock_code, data_type))
+        finally:
+            work_planner.finish([(stock_code, data_type) for stock_code, data_type, _ in plan.items], succeeded)
+
+        for (stock_code, data_type, _), response in results:
+            if isinstance(response, Exception) or not response or not response.get("success"):
+                error = str(response) if isinstance(response, Exception) else (response or {}).get("error", "API调用失败")
+                batch_result["failed"] += 1
+                batch_result["failed_items"].append({
+                    "stock_code": stock_code,
+                    "data_type": data_type,
+                    "error": error
+                })
+                continue
+
+            batch_result["success"] += 1
+            # 统计缓存命中情况
+            if response.get("cache_info", {}).get("source") == "redis":
+                batch_result["cache_hits"] += 1
+            else:
+                batch_result["cache_misses"] += 1
 
+        batch_result["throughput"] = pool_stats["throughput"]
         return batch_result
 
-    async def _call_existing_api(self, stock_code: str, data_type: str, force_refresh: bool = False) -> Dict[str, Any]:
-        """调用现有的Dashboard API获取数据"""
+    def _split_bulk_items(self, items: List[tuple]) -> tuple:
+        """拆出可由全市场批量获取的项目（数据类型有批量获取器且股票数达到阈值），其余交给工作池"""
+        counts: Dict[str, int] = {}
+        for _, data_type, _ in items:
+            if data_type in self.bulk_fetchers:
+                counts[data_type] = counts.get(data_type, 0) + 1
+        bulk_types = {data_type for data_type, count in counts.items() if count >= self.bulk_min_stocks}
+        bulk_items = [item for item in items if item[1] in bulk_types]
+        pool_items = [item for item in items if item[1] not in bulk_types]
+        return bulk_items, pool_items
+
+    async def _run_bulk_fetchers(self, items: List[tuple]) -> tuple:
+        """
+        每个数据类型一次全市场下载并批量写入，返回 (与工作池相同格式的 [(item, 结果)], 未取到的项目)
+        全市场表中没有的股票（如停牌无行情）或下载失败的数据类型回退为逐只获取
+        """
+        codes_by_type: Dict[str, List[tuple]] = {}
+        for item in items:
+            codes_by_type.setdefault(item[1], []).append(item)
+
+        loop = asyncio.get_running_loop()
+        results, missing = [], []
+        for data_type, type_items in codes_by_type.items():
+            fetcher = self.bulk_fetchers[data_type]
+            try:
+                partitions = await loop.run_in_executor(
+                    self.executor, fetcher.run, [stock_code for stock_code, _, _ in type_items]
+                )
+            except Exception as e:
+                logger.error(f"全市场批量获取失败，回退为逐只获取 {data_type}: {e}")
+                partitions = {}
+
+            for item in type_items:
+                if item[0] in partitions:
+                    results.append((item, {
+                        "success": True,
+                        "stock_code": item[0],
+                        "data_type": data_type,
+                        "cache_info": {"source": "akshare_bulk", "upstream": fetcher.source},
+                        "timestamp": datetime.now()
+                    }))
+                else:
+                    missing.append(item)
+        return results, missing
+
+    async def _call_existing_api(self, stock_code: str, data_type: str, refresh: bool = False) -> Dict[str, Any]:
+        """调用现有的Dashboard API获取数据；refresh 时跳过已过期的数据库数据直接从AKShare刷新"""
         try:
             if not self.data_service:
                 return None
@@ -199,23 +293,29 @@ class WatchlistProcessor:
                 "news_days": 7
             }
 
-            # 如果强制刷新，清除缓存
-            if force_refresh:
-                cache_key = self.data_service.get_cache_key(data_type, stock_code)
-                try:
-                    self.data_service.redis_client.delete(cache_key)
-                except:
-                    pass
+            # 获取数据（使用现有的三层架构；强制刷新或数据库数据已过期时直接从AKShare刷新）
+            result = await self._get_data_via_three_tier(stock_code, data_type, refresh)
 
-            # 获取数据（使用现有的三层架构）
-            result = await self._get_data_via_three_tier(stock_code, data_type)
+            # 三层都没有取到数据时 get_data 返回 data=None / cache_info=failed，不算成功，
+            # 否则会被工作规划记为已完成而在 dedupe_window 内不再重试
+            if not result or result.get("data") is None or result.get("cache_info") == "failed":
+                return {
+                    "success": False,
+                    "error": "三层架构未获取到数据",
+                    "stock_code": stock_code,
+                    "data_type": data_type,
+                    "cache_info": {"source": (result or {}).get("source")}
+                }
 
             return {
                 "success": True,
                 "stock_code": stock_code,
                 "data_type": data_type,
                 "data": result,
-                "cache_info": {"source": "batch_processing"},
+                "cache_info": {
+                    "source": result.get("source"),
+                    "cache": result.get("cache_info")
+                },
                 "timestamp": datetime.now()
             }
 
@@ -228,13 +328,19 @@ class WatchlistProcessor:
                 "data_type": data_type
             }
 
-    async def _get_data_via_three_tier(self, stock_code: str, data_type: str) -> Any:
+    async def _get_data_via_three_tier(self, stock_code: str, data_type: str, refresh: bool = False) -> Any:
         """通过三层架构获取数据"""
         try:
+            loop = asyncio.get_running_loop()
+            if refresh and hasattr(self.data_service, 'refresh_from_akshare'):
+                return await loop.run_in_executor(
+                    self.executor, functools.partial(self.data_service.refresh_from_akshare, data_type, stock_code)
+                )
             # 使用ThreeTierDataService的统一get_data方法
             if hasattr(self.data_service, 'get_data'):
-                result = self.data_service.get_data(data_type, stock_code)
-                return result
+                return await loop.run_in_executor(
+                    self.executor, functools.partial(self.data_service.get_data, data_type, stock_code)
+                )
             else:
                 logger.warning(f"ThreeTierDataService没有get_data方法")
                 return None
@@ -306,6 +412,10 @@ class WatchlistProcessor:
             logger.error(f"处理单个自选股列表失败 (ID: {watchlist_id}): {e}")
             raise
 
+    def get_progress(self) -> Dict[str, Any]:
+        """当前全部批处理（没有运行中时为最近一次）的合计进度：吞吐量、队列深度、执行中数量"""
+        return self.worker_pool.snapshot()
+
     async def get_batch_summary(self, hours: int = 24) -> Dict[str, Any]:
         """获取批处理摘要统计"""
         try:
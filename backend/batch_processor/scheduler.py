@@ -1,20 +1,488 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-批处理调度器 (临时版本，用于测试)
+批处理调度器
+按 schedules.yaml 中的 cron / 间隔触发器触发任务，每次触发展开为工作单元（一个自选股列表或一个维护任务），
+进入优先级队列，由 batch_settings.max_concurrent_jobs 个工作协程执行
+
+- 触发器: "HH:MM"（每天）、5 段 cron 表达式、{cron: ...} 或 {interval: 秒}
+- 优先级: 队列按 priority_level 从高到低出队，5 级自选股先于 1 级执行
+- 错过触发（misfire）: 超过 misfire_grace_time 的触发跳过；coalesce 时多次错过的触发合并为一次
+- 持久化: 工作单元记录在 batch_jobs 表，重启后只继续未完成的单元，已完成的不再重复
+- 运行: python -m batch_processor（batch_processor/__main__.py），SIGINT/SIGTERM 时停止
 """
+import asyncio
+import itertools
 import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
+
+from croniter import croniter
+
+from .config.batch_config import config
+from .models.batch_job import JobStatus, JobType
+from .services.batch_job_store import BatchJobStore
 
 logger = logging.getLogger(__name__)
 
+# 重启时恢复多久以内触发的未完成工作单元
+RESUME_WINDOW = timedelta(hours=24)
+# 失败重试的基础延迟（秒），按 backoff_factor 指数增长
+RETRY_BASE_DELAY = 30.0
+# 调度循环最长休眠时间，系统时间跳变后也能及时重新计算
+MAX_SLEEP = 60.0
+
+# 市场任务对应的自选股范围：最低优先级、是否强制刷新
+MARKET_WATCHLIST_TASKS = {
+    "pre_market_warm": {"min_priority": 1},
+    "intraday_update": {"min_priority": 4},
+    "post_market_update": {"min_priority": 1},
+    "weekend_full_scan": {"min_priority": 1, "force_refresh": True},
+}
+
+
+class CronTrigger:
+    """cron 触发器"""
+
+    def __init__(self, expression: str):
+        if not croniter.is_valid(expression):
+            raise ValueError(f"无效的cron表达式: {expression}")
+        self.expression = expression
+
+    def next_after(self, moment: datetime) -> datetime:
+        return croniter(self.expression, moment).get_next(datetime)
+
+    def __repr__(self):
+        return f"cron({self.expression})"
+
+
+class IntervalTrigger:
+    """固定间隔触发器"""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError(f"无效的触发间隔: {seconds}")
+        self.interval = timedelta(seconds=seconds)
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + self.interval
+
+    def __repr__(self):
+        return f"interval({self.interval.total_seconds():g}s)"
+
+
+Trigger = Union[CronTrigger, IntervalTrigger]
+
+
+def parse_trigger(spec: Union[str, Dict[str, Any]]) -> Trigger:
+    """解析 schedules.yaml 中的触发配置"""
+    if isinstance(spec, dict):
+        if "interval" in spec:
+            return IntervalTrigger(float(spec["interval"]))
+        if "cron" in spec:
+            return CronTrigger(spec["cron"])
+        raise ValueError(f"无效的调度配置: {spec}")
+
+    spec = str(spec).strip()
+    if len(spec.split()) == 1 and ":" in spec:
+        hour, minute = spec.split(":")
+        return CronTrigger(f"{int(minute)} {int(hour)} * * *")
+    return CronTrigger(spec)
+
+
+@dataclass
+class WorkUnit:
+    """一个工作单元，对应 batch_jobs 中的一行"""
+    job_id: int
+    job_name: str
+    watchlist_id: Optional[int]
+    priority_level: int
+    scheduled_time: datetime
+    retry_count: int = 0
+    max_retries: int = 0
+
+
+@dataclass
+class ScheduledTask:
+    """
+    调度任务
+    plan: 触发时返回工作单元列表 [(watchlist_id, priority_level)]
+    run: 执行一个工作单元，返回结果摘要（processed/success/failed 计数写入 batch_jobs）
+    """
+    name: str
+    job_type: JobType
+    trigger: Trigger
+    plan: Callable[[datetime], Awaitable[List[Tuple[Optional[int], int]]]]
+    run: Callable[[WorkUnit], Awaitable[Dict[str, Any]]]
+    next_fire: Optional[datetime] = None
+    active_fires: Dict[datetime, int] = field(default_factory=dict)
+
+
 class BatchScheduler:
     """批处理调度器"""
 
-    def __init__(self):
-        logger.info("批处理调度器初始化完成 (临时版本)")
+    def __init__(self, store: Optional[BatchJobStore] = None, watchlist_processor=None, rag_processor=None):
+        scheduler_config = config.get('schedules.scheduler_config', {}) or {}
+        batch_settings = config.batch_settings
+
+        self.timezone = ZoneInfo(scheduler_config.get('timezone', 'Asia/Shanghai'))
+        self.max_instances = int(scheduler_config.get('max_instances', 1))
+        self.coalesce = bool(scheduler_config.get('coalesce', True))
+        self.misfire_grace_time = timedelta(seconds=float(scheduler_config.get('misfire_grace_time', 300)))
+        self.max_concurrent_jobs = int(batch_settings.get('max_concurrent_jobs', 5))
+        self.job_timeout = float(batch_settings.get('default_timeout', 300))
+        self.max_retries = int(batch_settings.get('retry_attempts', 3))
+        self.backoff_factor = float(batch_settings.get('backoff_factor', 2.0))
+
+        self.store = store or BatchJobStore()
+        self._watchlist_processor = watchlist_processor
+        self._rag_processor = rag_processor
+
+        self.tasks: Dict[str, ScheduledTask] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+
+        self.stats = {"fired": 0, "misfired": 0, "skipped_max_instances": 0,
+                      "resumed": 0, "succeeded": 0, "failed": 0, "retried": 0}
+
+        self._load_schedules()
+        logger.info(f"批处理调度器初始化完成: {len(self.tasks)} 个调度任务, 最大并发 {self.max_concurrent_jobs}")
+
+    # ------------------------------------------------------------------
+    # 任务定义
+    # ------------------------------------------------------------------
+
+    @property
+    def watchlist_processor(self):
+        if self._watchlist_processor is None:
+            from .processors.watchlist_processor import WatchlistProcessor
+            self._watchlist_processor = WatchlistProcessor()
+        return self._watchlist_processor
+
+    @property
+    def rag_processor(self):
+        if self._rag_processor is None:
+            from .processors.rag_sync_processor import RAGSyncProcessor
+            self._rag_processor = RAGSyncProcessor()
+        return self._rag_processor
+
+    def _load_schedules(self):
+        """由 schedules.yaml 注册内置任务"""
+        schedules = config.get('schedules.schedules', {}) or {}
+
+        for key, spec in (schedules.get('priority_batches') or {}).items():
+            level = int(str(key).rsplit('_', 1)[-1])
+            self._add_watchlist_task(f"priority_batches.{key}", spec, priority_level=level)
+
+        for key, spec in (schedules.get('market_tasks') or {}).items():
+            if key in MARKET_WATCHLIST_TASKS:
+                options = MARKET_WATCHLIST_TASKS[key]
+                self._add_watchlist_task(f"market_tasks.{key}", spec, min_priority=options["min_priority"],
+                                         force_refresh=options.get("force_refresh", False))
+            else:
+                logger.warning(f"市场任务没有对应的处理器，跳过: {key}")
+
+        for key, spec in (schedules.get('watchlist_tasks') or {}).items():
+            if key == "custom_schedule":
+                self._add_custom_schedule_task(f"watchlist_tasks.{key}", spec)
+            else:
+                logger.warning(f"自选股任务没有对应的处理器，跳过: {key}")
+
+        maintenance = schedules.get('maintenance_tasks') or {}
+        if 'rag_optimization' in maintenance:
+            retention_days = int(config.rag_settings.get('version_retention_days', 30))
+            self.add_task("maintenance_tasks.rag_optimization", JobType.RAG_SYNC,
+                          maintenance['rag_optimization'],
+                          lambda: self.rag_processor.cleanup_old_vectors(days_old=retention_days))
+        if 'performance_report' in maintenance:
+            self.add_task("maintenance_tasks.performance_report", JobType.MARKET_SCAN,
+                          maintenance['performance_report'],
+                          lambda: self.watchlist_processor.get_batch_summary())
+        for key in maintenance:
+            if f"maintenance_tasks.{key}" not in self.tasks:
+                logger.info(f"维护任务未注册处理器，需通过 add_task 注册: {key}")
+
+    def add_task(self, name: str, job_type: JobType, spec: Union[str, Dict[str, Any]],
+                 func: Callable[[], Awaitable[Dict[str, Any]]], priority_level: int = 3):
+        """注册单个工作单元的调度任务（如维护任务）"""
+        async def plan(fire_time: datetime):
+            return [(None, priority_level)]
+
+        async def run(unit: WorkUnit):
+            return await func()
+
+        self.tasks[name] = ScheduledTask(name, job_type, parse_trigger(spec), plan, run)
+
+    def _add_watchlist_task(self, name: str, spec, priority_level: Optional[int] = None,
+                            min_priority: int = 1, force_refresh: bool = False):
+        """自选股预热任务，每个自选股列表一个工作单元"""
+        async def plan(fire_time: datetime):
+            watchlists = await self.watchlist_processor.watchlist_service.get_priority_watchlists(priority_level)
+            return [(wl.id, wl.priority_level) for wl in watchlists if wl.priority_level >= min_priority]
+
+        async def run(unit: WorkUnit):
+            return await self._run_watchlist(unit, force_refresh)
+
+        self.tasks[name] = ScheduledTask(name, JobType.WATCHLIST_WARM, parse_trigger(spec), plan, run)
+
+    def _add_custom_schedule_task(self, name: str, spec):
+        """按自选股自定义的 schedule_time 预热，每个列表每天只执行一次"""
+        async def plan(fire_time: datetime):
+            service = self.watchlist_processor.watchlist_service
+            watchlists = await service.get_scheduled_watchlists(fire_time.time())
+            today = fire_time.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+            done = set(await self.store.processed_watchlists(name, today))
+            return [(wl.id, wl.priority_level) for wl in watchlists if wl.id not in done]
+
+        async def run(unit: WorkUnit):
+            return await self._run_watchlist(unit, False)
+
+        self.tasks[name] = ScheduledTask(name, JobType.WATCHLIST_WARM, parse_trigger(spec), plan, run)
+
+    async def _run_watchlist(self, unit: WorkUnit, force_refresh: bool) -> Dict[str, Any]:
+        result = await self.watchlist_processor.process_single_watchlist(unit.watchlist_id, force_refresh)
+        summary = dict(result.get("result", {}))
+        summary["watchlist_name"] = result.get("watchlist_name")
+        return summary
+
+    # ------------------------------------------------------------------
+    # 启停
+    # ------------------------------------------------------------------
+
+    def _now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def _to_db(self, moment: datetime) -> datetime:
+        """batch_jobs.scheduled_time 为不带时区的调度时区本地时间"""
+        return moment.astimezone(self.timezone).replace(tzinfo=None)
+
+    def _from_db(self, moment: datetime) -> datetime:
+        return moment.replace(tzinfo=self.timezone)
+
+    async def start(self):
+        """启动调度器：恢复未完成的工作单元，计算各任务下次触发时间，启动工作协程"""
+        if self._running:
+            return
+        self._running = True
+        self._queue = asyncio.PriorityQueue()
+        self._wakeup = asyncio.Event()
+        now = self._now()
+
+        resumed = await self.store.unfinished_units(self._to_db(now - RESUME_WINDOW))
+        for row in resumed:
+            task = self.tasks.get(row["job_name"])
+            if task is None:
+                logger.warning(f"未完成的工作单元对应的调度任务已不存在: {row['job_name']} (ID: {row['id']})")
+                continue
+            self._enqueue(task, WorkUnit(
+                job_id=row["id"], job_name=row["job_name"], watchlist_id=row["watchlist_id"],
+                priority_level=row["priority_level"], scheduled_time=self._from_db(row["scheduled_time"]),
+                retry_count=row["retry_count"], max_retries=row["max_retries"]
+            ))
+            self.stats["resumed"] += 1
+
+        # 从上次触发时间推算下次触发，停机期间错过的触发由调度循环按 misfire 规则处理
+        last_fires = await self.store.last_fire_times()
+        for task in self.tasks.values():
+            last_fire = last_fires.get(task.name)
+            if last_fire is not None:
+                task.next_fire = task.trigger.next_after(self._from_db(last_fire))
+            elif isinstance(task.trigger, IntervalTrigger):
+                task.next_fire = now
+            else:
+                task.next_fire = task.trigger.next_after(now)
+
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent_jobs)]
+        self._timer = asyncio.create_task(self._timer_loop())
+        logger.info(f"批处理调度器启动: 恢复 {len(resumed)} 个未完成单元")
+
+    async def stop(self):
+        """停止调度器；执行中的工作单元保持 running 状态，下次启动时恢复"""
+        if not self._running:
+            return
+        self._running = False
+        for task in [self._timer, *self._workers]:
+            if task:
+                task.cancel()
+        await asyncio.gather(*(t for t in [self._timer, *self._workers] if t), return_exceptions=True)
+        self._workers = []
+        self._timer = None
+        logger.info("批处理调度器停止")
+
+    # ------------------------------------------------------------------
+    # 触发
+    # ------------------------------------------------------------------
+
+    async def _timer_loop(self):
+        while self._running:
+            now = self._now()
+            for task in self.tasks.values():
+                if task.next_fire <= now:
+                    await self._fire_due(task, now)
+
+            next_fire = min((task.next_fire for task in self.tasks.values()), default=None)
+            delay = MAX_SLEEP if next_fire is None else (next_fire - self._now()).total_seconds()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(max(delay, 0), MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire_due(self, task: ScheduledTask, now: datetime):
+        """处理到期（含错过）的触发"""
+        due = []
+        fire_time = task.next_fire
+        while fire_time <= now:
+            due.append(fire_time)
+            fire_time = task.trigger.next_after(fire_time)
+        task.next_fire = fire_time
+
+        on_time = [t for t in due if now - t <= self.misfire_grace_time]
+        missed = len(due) - len(on_time)
+        if self.coalesce and len(on_time) > 1:
+            missed += len(on_time) - 1
+            on_time = on_time[-1:]
+        if missed:
+            self.stats["misfired"] += missed
+            logger.warning(f"调度任务错过触发: {task.name} {missed} 次 (宽限 {self.misfire_grace_time.total_seconds():g}秒)")
+
+        for fire_time in on_time:
+            await self.fire(task, fire_time)
+
+    async def fire(self, task: ScheduledTask, fire_time: Optional[datetime] = None):
+        """触发一次任务：展开工作单元、持久化并入队"""
+        fire_time = fire_time or self._now()
+        if len(task.active_fires) >= self.max_instances:
+            self.stats["skipped_max_instances"] += 1
+            logger.warning(f"调度任务仍有 {len(task.active_fires)} 次执行未完成，跳过本次触发: {task.name}")
+            return
+
+        try:
+            units = await task.plan(fire_time)
+            if not units:
+                # 没有工作单元的触发（如间隔检查时没有到点的自定义时间）不写 batch_jobs
+                self.stats["fired"] += 1
+                logger.debug(f"调度任务触发: {task.name} @ {fire_time:%Y-%m-%d %H:%M}, 没有工作单元")
+                return
+            rows = await self.store.create_units(task.name, task.job_type, self._to_db(fire_time),
+                                                 units, self.max_retries)
+        except Exception as e:
+            logger.error(f"调度任务触发失败: {task.name}, {e}")
+            return
+
+        self.stats["fired"] += 1
+        for row in rows:
+            self._enqueue(task, WorkUnit(
+                job_id=row["id"], job_name=task.name, watchlist_id=row["watchlist_id"],
+                priority_level=row["priority_level"], scheduled_time=fire_time,
+                max_retries=row["max_retries"]
+            ))
+        logger.info(f"调度任务触发: {task.name} @ {fire_time:%Y-%m-%d %H:%M}, {len(rows)} 个工作单元")
+
+    def _enqueue(self, task: ScheduledTask, unit: WorkUnit):
+        task.active_fires[unit.scheduled_time] = task.active_fires.get(unit.scheduled_time, 0) + 1
+        # 优先级高的先出队，同优先级按触发时间先后
+        self._queue.put_nowait((-unit.priority_level, unit.scheduled_time.timestamp(), next(self._sequence), unit))
+
+    def _unit_done(self, unit: WorkUnit):
+        task = self.tasks.get(unit.job_name)
+        if task is None:
+            return
+        remaining = task.active_fires.get(unit.scheduled_time, 1) - 1
+        if remaining > 0:
+            task.active_fires[unit.scheduled_time] = remaining
+        else:
+            task.active_fires.pop(unit.scheduled_time, None)
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    async def _worker(self, index: int):
+        while True:
+            *_, unit = await self._queue.get()
+            try:
+                await self._execute(unit)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"工作单元执行异常: {unit.job_name} (ID: {unit.job_id}), {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, unit: WorkUnit):
+        task = self.tasks[unit.job_name]
+        retrying = False
+        try:
+            await self._record(unit, self.store.mark_running(unit.job_id))
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(task.run(unit), timeout=self.job_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if unit.retry_count < unit.max_retries:
+                    await self._record(unit, self.store.mark_retry(unit.job_id, error))
+                    unit.retry_count += 1
+                    delay = RETRY_BASE_DELAY * self.backoff_factor ** (unit.retry_count - 1)
+                    self.stats["retried"] += 1
+                    logger.warning(f"工作单元失败，{delay:g}秒后重试 ({unit.retry_count}/{unit.max_retries}): "
+                                   f"{unit.job_name} (ID: {unit.job_id}), {error}")
+                    asyncio.get_running_loop().call_later(delay, self._requeue, unit)
+                    retrying = True
+                    return
+                self.stats["failed"] += 1
+                logger.error(f"工作单元失败: {unit.job_name} (ID: {unit.job_id}), {error}")
+                await self._record(unit, self.store.mark_finished(
+                    unit.job_id, JobStatus.FAILED, time.monotonic() - start, error=error))
+                return
+
+            self.stats["succeeded"] += 1
+            await self._record(unit, self.store.mark_finished(
+                unit.job_id, JobStatus.SUCCESS, time.monotonic() - start, result=result))
+        finally:
+            # 等待重试的单元仍占用本次触发；其余情况（含状态写入失败）都释放，避免 max_instances 被占满
+            if not retrying:
+                self._unit_done(unit)
+
+    async def _record(self, unit: WorkUnit, update: Awaitable):
+        """写入 batch_jobs 状态；数据库异常只记录日志，不影响工作单元本身的执行结果"""
+        try:
+            await update
+        except Exception as e:
+            logger.error(f"工作单元状态写入失败: {unit.job_name} (ID: {unit.job_id}), {e}")
+
+    def _requeue(self, unit: WorkUnit):
+        if self._running:
+            self._queue.put_nowait((-unit.priority_level, unit.scheduled_time.timestamp(), next(self._sequence), unit))
+        else:
+            self._unit_done(unit)
 
-    def start(self):
-        logger.info("批处理调度器启动")
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
 
-    def stop(self):
-        logger.info("批处理调度器停止")
\ No newline at end of file
+    def get_status(self) -> Dict[str, Any]:
+        """调度器状态：各任务下次触发时间、队列长度与统计"""
+        return {
+            "running": self._running,
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "queue_size": self._queue.qsize() if self._queue else 0,
+            "tasks": {
+                name: {
+                    "trigger": repr(task.trigger),
+                    "next_fire": task.next_fire.isoformat() if task.next_fire else None,
+                    "active_fires": len(task.active_fires),
+                }
+                for name, task in self.tasks.items()
+            },
+            "stats": dict(self.stats),
+        }
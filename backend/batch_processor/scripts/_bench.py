@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""基准脚本共用的计时和统计工具"""
+import time
+from typing import Callable, List, Sequence
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5,
+            clock: Callable[[], float] = time.perf_counter) -> float:
+    """执行 repeat 次，返回最短耗时(秒)；clock 传 time.process_time 时统计CPU时间"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = clock()
+        fn()
+        best = min(best, clock() - start)
+    return best
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """q 分位数（0-100，最近秩法），values 为空时返回 0"""
+    if not values:
+        return 0.0
+    ordered: List[float] = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AKShare 表格转换基准（行/秒）
+
+在构造的固定数据上对比原来的 df.iterrows() 逐行转换与 app/utils/stock_codes.py 的按列转换：
+- 股票列表 (stock_info_a_code_name，约5000只)
+- 股东/龙虎榜明细 (frame_to_records)
+- 个股信息纵表 (item_value_dict)
+
+不需要网络和数据库
+
+用法:
+    python -m batch_processor.scripts.benchmark_dataframe_conversion --rows 5000
+"""
+import argparse
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.utils.stock_codes import frame_to_records, item_value_dict, stock_list_records
+
+from ._bench import best_of
+
+SHAREHOLDER_COLUMNS = {'股东名称': 'shareholder_name', '持股比例': 'holding_ratio',
+                       '持股数量': 'holding_count', '股东性质': 'shareholder_type'}
+SHAREHOLDER_DTYPES = {'holding_ratio': 'float', 'holding_count': 'int'}
+
+
+def stock_list_fixture(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    prefixes = rng.choice(['600', '688', '000', '300', '830'], size=rows)
+    codes = [f"{prefix}{i % 1000:03d}" for i, prefix in enumerate(prefixes)]
+    # 深市代码在 AKShare 表中可能丢失前导0
+    codes = [code.lstrip('0') if i % 7 == 0 else code for i, code in enumerate(codes)]
+    return pd.DataFrame({'code': codes, 'name': [f"股票{i}" for i in range(rows)]})
+
+
+def shareholders_fixture(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        '股东名称': [f"股东{i}" for i in range(rows)],
+        '持股比例': rng.random(rows) * 10,
+        '持股数量': rng.integers(1_000, 10_000_000, rows),
+        '股东性质': rng.choice(['个人', '基金', '国有法人'], size=rows),
+    })
+
+
+def item_value_fixture(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({'item': [f"item{i}" for i in range(rows)], 'value': list(range(rows))})
+
+
+# 原来的逐行实现，作为对比基线
+def stock_list_iterrows(df: pd.DataFrame) -> List[Dict[str, str]]:
+    stocks = []
+    for _, row in df.iterrows():
+        code = str(row.get('code', '')).zfill(6)
+        name = str(row.get('name', ''))
+        if code.startswith(('60', '68', '90')):
+            market = 'SH'
+        elif code.startswith(('00', '30')):
+            market = 'SZ'
+        else:
+            market = 'OTHER'
+        stocks.append({"code": code, "name": name, "market": market})
+    return stocks
+
+
+def shareholders_iterrows(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [
+        {
+            "shareholder_name": str(row.get('股东名称', '')),
+            "holding_ratio": float(row.get('持股比例', 0)),
+            "holding_count": int(row.get('持股数量', 0)),
+            "shareholder_type": str(row.get('股东性质', ''))
+        }
+        for _, row in df.iterrows()
+    ]
+
+
+def item_value_iterrows(df: pd.DataFrame) -> Dict[str, Any]:
+    info = {}
+    for _, row in df.iterrows():
+        info[row.get('item', '')] = row.get('value', '')
+    return info
+
+
+def report(name: str, rows: int, before, after, repeat: int):
+    assert before() == after(), f"{name}: 按列转换结果与逐行转换不一致"
+    before_time = best_of(before, repeat)
+    after_time = best_of(after, repeat)
+    print(f"  {name:<14} iterrows {rows / before_time:12,.0f} 行/秒   "
+          f"按列 {rows / after_time:12,.0f} 行/秒   x{before_time / after_time:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AKShare 表格转换基准")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows, repeat = args.rows, args.repeat
+    stocks = stock_list_fixture(rows)
+    shareholders = shareholders_fixture(rows)
+    info = item_value_fixture(rows)
+
+    print(f"DataFrame 转换: {rows} 行, 取 {repeat} 次最优")
+    report("stock_list", rows, lambda: stock_list_iterrows(stocks), lambda: stock_list_records(stocks), repeat)
+    report("shareholders", rows, lambda: shareholders_iterrows(shareholders),
+           lambda: frame_to_records(shareholders, SHAREHOLDER_COLUMNS, SHAREHOLDER_DTYPES), repeat)
+    report("item_value", rows, lambda: item_value_iterrows(info), lambda: item_value_dict(info), repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG同步吞吐量基准（文本块/秒）
+
+1. 向量化: 同一组文本块逐块 embed_text 与不同 batch_size 的 embed_batch 对比
+2. 端到端: 不同 embedding_batch_size 下 sync_batch_data_to_rag 的吞吐量和各阶段耗时
+
+需要可用的 PostgreSQL、embedding 模型和 ChromaDB；端到端测试使用 force_refresh，每轮会为每个项目创建并激活新版本
+
+用法:
+    python -m batch_processor.scripts.benchmark_rag_sync 000001 600519 --data-types financial,longhubang
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from ..processors.rag_sync_processor import RAGSyncProcessor
+
+
+async def collect_chunks(processor: RAGSyncProcessor, stock_codes: List[str], data_types: List[str]) -> List[str]:
+    """读取结构化数据并切分为文本块（不创建版本）"""
+    chunks = []
+    for stock_code in stock_codes:
+        for data_type in data_types:
+            source_data = await processor.get_latest_structured_data(stock_code, data_type)
+            if source_data:
+                chunks.extend(processor.data_vectorizer.transform_to_text_chunks(stock_code, data_type, source_data))
+    return chunks
+
+
+def benchmark_embedding(processor: RAGSyncProcessor, chunks: List[str], batch_sizes: List[int]):
+    embedding_service = processor.embedding_service
+    embedding_service.embed_batch(chunks[:8])  # 预热，加载模型
+
+    print(f"\n向量化: {len(chunks)} 个文本块")
+    start = time.time()
+    for chunk in chunks:
+        embedding_service.embed_text(chunk)
+    elapsed = time.time() - start
+    print(f"  逐块 embed_text           {elapsed:8.2f}秒  {len(chunks) / elapsed:8.1f} 块/秒")
+
+    for batch_size in batch_sizes:
+        start = time.time()
+        embedding_service.embed_batch(chunks, batch_size=batch_size)
+        elapsed = time.time() - start
+        print(f"  embed_batch(batch={batch_size:<4})    {elapsed:8.2f}秒  {len(chunks) / elapsed:8.1f} 块/秒")
+
+
+async def benchmark_pipeline(processor: RAGSyncProcessor, stock_codes: List[str], data_types: List[str],
+                             flush_sizes: List[int]):
+    print(f"\n端到端同步: {len(stock_codes)} 只股票 x {len(data_types)} 种数据类型")
+    for flush_size in flush_sizes:
+        processor.embedding_batch_size = flush_size
+        result = await processor.sync_batch_data_to_rag(stock_codes, data_types, force_refresh=True)
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["stage_times"].items())
+        print(f"  embedding_batch_size={flush_size:<5} {result['chunks_processed']:6d} 块  "
+              f"{result['processing_time']:8.2f}秒  {result['chunks_per_second']:8.1f} 块/秒  "
+              f"失败 {result['failed_syncs']}  ({stages})")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="RAG同步吞吐量基准")
+    parser.add_argument("stock_codes", nargs="+", help="股票代码")
+    parser.add_argument("--data-types", default="financial,announcements,shareholders,longhubang")
+    parser.add_argument("--batch-sizes", default="16,32,64,128", help="embed_batch 的 batch_size")
+    parser.add_argument("--flush-sizes", default="32,256,1024", help="流水线的 embedding_batch_size")
+    parser.add_argument("--skip-pipeline", action="store_true", help="只测向量化")
+    args = parser.parse_args()
+
+    data_types = args.data_types.split(",")
+    processor = RAGSyncProcessor()
+
+    if processor.embedding_service:
+        chunks = await collect_chunks(processor, args.stock_codes, data_types)
+        if chunks:
+            benchmark_embedding(processor, chunks, [int(size) for size in args.batch_sizes.split(",")])
+        else:
+            print("没有可用的结构化数据，跳过向量化基准")
+    else:
+        print("Embedding服务不可用，跳过向量化基准")
+
+    if not args.skip_pipeline:
+        await benchmark_pipeline(processor, args.stock_codes, data_types,
+                                 [int(size) for size in args.flush_sizes.split(",")])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
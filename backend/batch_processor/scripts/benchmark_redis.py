@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Redis 访问方式吞吐量基准（次/秒）
+
+在同样的并发下对比：
+- executor: 原来的写法，同步 redis-py 客户端的调用包在 run_in_executor 中
+- pooled:   app/core/redis_pool.py 共享连接池上的原生 redis.asyncio 客户端
+- pipelined: 同一连接池上的 AutoPipeline（同一事件循环轮次的命令合并为一次 pipeline）
+
+以及多键读取: 逐键 GET 与一次 MGET
+
+需要可连接的 Redis；使用 --db 指定的库（默认 15）和 bench: 前缀的键，结束时删除
+
+用法:
+    python -m batch_processor.scripts.benchmark_redis --url redis://localhost:6379 --ops 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import redis
+
+from app.core import redis_pool
+from app.core.config import settings
+
+KEY_PREFIX = "bench:"
+
+
+async def measure(name: str, op: Callable[[int], Awaitable], ops: int, concurrency: int):
+    """concurrency 个协程共同完成 ops 次操作，返回次/秒"""
+    counter = iter(range(ops))
+
+    async def worker():
+        for i in counter:
+            await op(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<28} {ops / elapsed:10,.0f} 次/秒  ({elapsed:.2f}秒)")
+    return ops / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Redis 访问方式吞吐量基准")
+    parser.add_argument("--url", default=settings.redis_url)
+    parser.add_argument("--db", type=int, default=15)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--keys", type=int, default=1000, help="读写的键数量")
+    parser.add_argument("--mget-size", type=int, default=50)
+    args = parser.parse_args()
+
+    settings.redis_url = args.url
+    keys = [f"{KEY_PREFIX}{i}" for i in range(args.keys)]
+    value = "x" * 512
+
+    sync_client = redis.Redis.from_url(args.url, db=args.db, decode_responses=True)
+    sync_client.mset({key: value for key in keys})
+    pooled = redis_pool.get_async_redis(args.db)
+    pipelined = redis_pool.AutoPipeline(redis_pool.get_async_redis(args.db))
+    loop = asyncio.get_running_loop()
+
+    print(f"Redis {args.url} db{args.db}: {args.ops} 次操作, 并发 {args.concurrency}, 值 {len(value)} 字节")
+    try:
+        for command in ("get", "setex"):
+            print(f"\n{command.upper()}")
+            pipelined.stats = {"commands": 0, "round_trips": 0}
+
+            def call_args(i):
+                key = keys[i % len(keys)]
+                return (key,) if command == "get" else (key, 300, value)
+
+            results = {
+                "executor": await measure(
+                    "executor (run_in_executor)",
+                    lambda i: loop.run_in_executor(None, getattr(sync_client, command), *call_args(i)),
+                    args.ops, args.concurrency),
+                "pooled": await measure(
+                    "pooled redis.asyncio",
+                    lambda i: getattr(pooled, command)(*call_args(i)), args.ops, args.concurrency),
+                "pipelined": await measure(
+                    "pooled + AutoPipeline",
+                    lambda i: getattr(pipelined, command)(*call_args(i)), args.ops, args.concurrency),
+            }
+            print(f"  相对 executor: pooled x{results['pooled'] / results['executor']:.1f}, "
+                  f"pipelined x{results['pipelined'] / results['executor']:.1f}  "
+                  f"(AutoPipeline {pipelined.stats['commands']} 条命令 / {pipelined.stats['round_trips']} 次往返)")
+
+        print(f"\n多键读取 ({args.mget_size} 个键, 按键计)")
+        batches = max(1, args.ops // args.mget_size)
+
+        async def per_key(i):
+            start = (i * args.mget_size) % len(keys)
+            for key in keys[start:start + args.mget_size]:
+                await loop.run_in_executor(None, sync_client.get, key)
+
+        async def mget(i):
+            start = (i * args.mget_size) % len(keys)
+            await pooled.mget(keys[start:start + args.mget_size])
+
+        per_key_rate = await measure("executor 逐键 GET", per_key, batches, args.concurrency)
+        mget_rate = await measure("pooled MGET", mget, batches, args.concurrency)
+        print(f"  按键吞吐: 逐键 {per_key_rate * args.mget_size:,.0f} 键/秒, "
+              f"MGET {mget_rate * args.mget_size:,.0f} 键/秒")
+    finally:
+        sync_client.delete(*keys)
+        sync_client.close()
+        await redis_pool.close_redis_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
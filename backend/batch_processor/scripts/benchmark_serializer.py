@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 序列化CPU基准
+
+在大体量K线和财务数据上对比 app/utils/serializer.py（默认 orjson）与原来的标准库写法，
+统计每次编码/解码的CPU时间：
+- 缓存写入: json.dumps(data, default=str) vs serializer.dumps
+- API响应 render: 路由返回普通对象时 FastAPI 总会先执行 jsonable_encoder（或 response_model 序列化），
+  default_response_class 只替换其后的 render，对比 JSONResponse vs FastJSONResponse 的 render
+- API响应 直接返回: 路由自行 serializer.dumps 并返回 Response（如K线接口），跳过 jsonable_encoder
+- 缓存读取: json.loads vs serializer.loads
+
+不需要网络和数据库
+
+用法:
+    python -m batch_processor.scripts.benchmark_serializer --kline-rows 5000
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.utils import serializer
+
+from ._bench import best_of
+
+
+def kline_payload(rows: int) -> Dict[str, Any]:
+    """与 /api/v1/stocks/{code}/kline 相同结构的K线响应"""
+    rng = np.random.default_rng(0)
+    close = 10 + np.cumsum(rng.normal(0, 0.1, rows))
+    start = datetime(2005, 1, 4)
+    return {
+        "stock_code": "000001",
+        "period": "daily",
+        "data": [
+            {
+                "timestamp": (start + timedelta(days=i)).isoformat(),
+                "open": float(close[i] - 0.05),
+                "high": float(close[i] + 0.1),
+                "low": float(close[i] - 0.1),
+                "close": float(close[i]),
+                "volume": int(rng.integers(1_000_000, 50_000_000)),
+            }
+            for i in range(rows)
+        ],
+        "updated_at": datetime.now(),
+    }
+
+
+def financial_payload(periods: int) -> Dict[str, Any]:
+    """多期财务摘要：Decimal 金额、日期、嵌套指标"""
+    return {
+        "stock_code": "000001",
+        "reports": [
+            {
+                "report_date": date(2024, 12, 31) - timedelta(days=91 * i),
+                "revenue": Decimal("123456789.12") + i,
+                "net_profit": Decimal("23456789.01") - i,
+                "indicators": {f"indicator_{k}": Decimal(f"{k}.{i % 100:02d}") for k in range(40)},
+            }
+            for i in range(periods)
+        ],
+        "updated_at": datetime.now(),
+    }
+
+
+def cpu_ms(fn: Callable[[], Any], repeat: int) -> float:
+    return best_of(fn, repeat, clock=time.process_time) * 1000
+
+
+def compare(label: str, before: Callable[[], Any], after: Callable[[], Any], repeat: int):
+    before_ms, after_ms = cpu_ms(before, repeat), cpu_ms(after, repeat)
+    print(f"  {label:<22} 标准库 {before_ms:8.2f}ms   {serializer.BACKEND} {after_ms:8.2f}ms   "
+          f"节省 {before_ms - after_ms:8.2f}ms/次 (x{before_ms / max(after_ms, 1e-9):.1f})")
+
+
+def run(name: str, payload: Dict[str, Any], repeat: int):
+    encoded = json.dumps(payload, default=str).encode()
+    print(f"\n{name}: {len(encoded) / 1024:.0f} KB")
+    compare("缓存写入 dumps", lambda: json.dumps(payload, default=str).encode(),
+            lambda: serializer.dumps(payload), repeat)
+    compare("API响应 render", lambda: JSONResponse(jsonable_encoder(payload)).body,
+            lambda: serializer.FastJSONResponse(jsonable_encoder(payload)).body, repeat)
+    compare("API响应 直接返回", lambda: JSONResponse(jsonable_encoder(payload)).body,
+            lambda: Response(serializer.dumps(payload), media_type="application/json").body, repeat)
+    compare("缓存读取 loads", lambda: json.loads(encoded), lambda: serializer.loads(encoded), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 序列化CPU基准")
+    parser.add_argument("--kline-rows", type=int, default=5000)
+    parser.add_argument("--financial-periods", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"序列化实现: {serializer.BACKEND}, 取 {args.repeat} 次最优CPU时间")
+    run(f"K线 {args.kline_rows} 根", kline_payload(args.kline_rows), args.repeat)
+    run(f"财务 {args.financial_periods} 期", financial_payload(args.financial_periods), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
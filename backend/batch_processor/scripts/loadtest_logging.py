@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PrismLogger 持续负载测试
+
+以固定速率（默认 1000 次/秒）调用 PrismLogger.log_api_call，统计调用方耗时的 p50/p99/最大值，
+以及实际速率、队列深度、丢弃数和写盘条数；--baseline 同时测量原来的同步写法：
+同样调用 log_api_call（相同的日志条目构造），文本日志由 FileHandler 在调用线程写入，
+JSON 日志每次调用打开文件、追加一行、关闭
+
+日志写入 --log-dir（默认临时目录），不会写到生产日志目录；
+同步写法的耗时取决于磁盘，tmpfs/页缓存上同步追加本身很快，两者差别不大。
+--fsync 让两种写法每次写盘后都 fsync（同步写法每条一次，队列写法每批一次，都在写盘的线程上），
+模拟慢盘/持久化写入，或在与生产相同的文件系统上运行
+
+用法:
+    python -m batch_processor.scripts.loadtest_logging --rate 1000 --duration 30 --baseline --fsync
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.utils import logger as prism_logging
+
+from ._bench import percentile
+
+REQUEST = {"stock_code": "000001", "data_types": ["realtime", "kline"], "kline_days": 60}
+RESPONSE = {"success": True, "data": {"realtime": {"current_price": 12.34, "change_percent": 1.2}}}
+
+
+def fsync_after(handler: Any, method: str, stream_attr: str):
+    """handler.method 执行后 fsync 其文件（在调用该方法的线程上）"""
+    original = getattr(handler, method)
+
+    def wrapper(*args, **kwargs):
+        result = original(*args, **kwargs)
+        stream = getattr(handler, stream_attr)
+        if stream is not None:
+            os.fsync(stream.fileno())
+        return result
+
+    setattr(handler, method, wrapper)
+
+
+class SyncPrismLogger(prism_logging.PrismLogger):
+    """原实现：文本日志 FileHandler 同步写入，JSON 日志每次调用打开文件追加一行"""
+
+    def __init__(self, log_dir: Path, fsync: bool = False):
+        self.log_type = "loadtest"
+        self.component = "baseline"
+        self.log_dir = log_dir
+        self.fsync = fsync
+        self.json_file = log_dir / "baseline.json"
+
+        self.logger = logging.getLogger("prism2.loadtest.baseline")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = logging.FileHandler(log_dir / "baseline.log", encoding="utf-8")
+        self.handler.setFormatter(logging.Formatter(prism_logging.LOG_FORMAT))
+        if fsync:
+            fsync_after(self.handler, "flush", "stream")
+        self.logger.addHandler(self.handler)
+
+    def _write_json_log(self, log_data: Dict[str, Any]):
+        log_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "log_type": self.log_type,
+            "component": self.component,
+            **log_data
+        }
+        with open(self.json_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(log_entry, ensure_ascii=False, default=str) + "\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+
+def drive(call: Callable[[], None], rate: int, duration: float) -> List[float]:
+    """按固定速率调用 call，返回每次调用的耗时(秒)；落后时不补发，保持开环速率"""
+    latencies = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < duration:
+        now = time.perf_counter()
+        if now < next_at:
+            time.sleep(next_at - now)
+        began = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - began)
+        next_at += interval
+    return latencies
+
+
+def log_call(prism_logger: prism_logging.PrismLogger) -> Callable[[], None]:
+    return lambda: prism_logger.log_api_call(
+        "/api/v1/dashboard", "POST", REQUEST, RESPONSE, 200, 0.0123, "127.0.0.1"
+    )
+
+
+def report(name: str, latencies: List[float], duration: float):
+    ms = [latency * 1000 for latency in latencies]
+    print(f"  {name:<10} {len(ms) / duration:8.0f} 次/秒  p50 {percentile(ms, 50):7.3f}ms  "
+          f"p99 {percentile(ms, 99):7.3f}ms  max {max(ms):7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PrismLogger 持续负载测试")
+    parser.add_argument("--rate", type=int, default=1000, help="每秒调用次数")
+    parser.add_argument("--duration", type=float, default=10.0, help="持续秒数")
+    parser.add_argument("--log-dir", default=None, help="日志目录（默认临时目录）")
+    parser.add_argument("--baseline", action="store_true", help="同时测量原来的同步写法")
+    parser.add_argument("--fsync", action="store_true", help="每次写盘后 fsync，模拟慢盘/持久化写入")
+    args = parser.parse_args()
+
+    log_dir = Path(args.log_dir or tempfile.mkdtemp(prefix="prism_logging_loadtest_"))
+    prism_logging.LOG_BASE_DIR = str(log_dir)
+    prism_logger = prism_logging.PrismLogger("loadtest", "api")
+    if args.fsync:
+        for handler in prism_logging._pipelines[prism_logger.logger.name][1].handlers:
+            if isinstance(handler, prism_logging.BufferedNDJSONHandler):
+                fsync_after(handler, "_write", "_stream")
+            else:
+                fsync_after(handler, "flush", "stream")
+
+    print(f"PrismLogger 负载测试: {args.rate} 次/秒 x {args.duration:.0f}秒, "
+          f"{'fsync, ' if args.fsync else ''}日志目录 {log_dir}")
+    latencies = drive(log_call(prism_logger), args.rate, args.duration)
+    report("队列写入", latencies, args.duration)
+
+    pipeline = prism_logging.log_pipeline_stats()[prism_logger.logger.name]
+    prism_logging.shutdown_logging()
+    written = sum(1 for _ in open(prism_logger.json_file, encoding="utf-8"))
+    size_mb = prism_logger.json_file.stat().st_size / 1024 / 1024
+    print(f"  结束时队列 {pipeline['queued']} 条, 丢弃 {pipeline['dropped']} 条, "
+          f"NDJSON 写入 {written}/{len(latencies)} 条 ({size_mb:.1f} MB)")
+
+    if args.baseline:
+        baseline = SyncPrismLogger(log_dir, fsync=args.fsync)
+        report("同步写入", drive(log_call(baseline), args.rate, args.duration), args.duration)
+        baseline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票API负载测试：缓存未命中进行中时，缓存命中请求的延迟是否保持平稳
+
+两个阶段，缓存命中请求都以固定速率开环发送（每个请求独立任务，不因前一个慢而推迟）：
+1. 只有命中: 预热后反复请求 --hit-codes 的 /stocks/{code}/info
+2. 命中 + 未命中: 同样的命中流量，同时 --miss-concurrency 个并发请求依次拉取未缓存股票的日K线
+   （每只股票只请求一次，穿透到 PostgreSQL/AKShare）
+
+输出两个阶段命中请求的 p50/p99/最大值。事件循环没有被阻塞时，两阶段的 p99 应基本一致
+
+需要运行中的 API 服务（uvicorn app.main:app）
+
+用法:
+    python -m batch_processor.scripts.loadtest_stocks_api --base-url http://localhost:8000 --rate 200 --duration 20
+"""
+import argparse
+import asyncio
+import time
+from typing import Iterator, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+from ._bench import percentile
+
+DEFAULT_HIT_CODES = "000001,600000,600519,000858,300750"
+
+
+def default_miss_codes() -> List[str]:
+    """沪深主板代码段，通常大部分尚未缓存"""
+    return [f"{code:06d}" for code in range(600100, 601000)] + [f"{code:06d}" for code in range(100, 1000)]
+
+
+class Phase:
+    """一个阶段的命中/未命中统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits: List[float] = []
+        self.hit_errors = 0
+        self.misses: List[float] = []
+        self.miss_errors = 0
+
+    def report(self):
+        hits_ms = [latency * 1000 for latency in self.hits]
+        line = (f"  {self.name:<10} 命中 {len(hits_ms):6d} 次  p50 {percentile(hits_ms, 50):8.2f}ms  "
+                f"p99 {percentile(hits_ms, 99):8.2f}ms  max {max(hits_ms, default=0):8.2f}ms  错误 {self.hit_errors}")
+        if self.misses or self.miss_errors:
+            misses_ms = [latency * 1000 for latency in self.misses]
+            line += (f"\n  {'':<10} 未命中 {len(misses_ms):4d} 次  p50 {percentile(misses_ms, 50):8.2f}ms  "
+                     f"max {max(misses_ms, default=0):8.2f}ms  错误 {self.miss_errors}")
+        print(line)
+
+
+async def timed_get(client: httpx.AsyncClient, url: str) -> Optional[float]:
+    """请求 url，成功返回耗时(秒)，失败返回 None"""
+    start = time.perf_counter()
+    try:
+        response = await client.get(url)
+        if response.status_code >= 400:
+            return None
+    except httpx.HTTPError:
+        return None
+    return time.perf_counter() - start
+
+
+async def hit_traffic(client: httpx.AsyncClient, prefix: str, codes: List[str], rate: int,
+                      duration: float, phase: Phase):
+    """固定速率开环发送缓存命中请求"""
+    async def one(code: str):
+        latency = await timed_get(client, f"{prefix}/stocks/{code}/info")
+        if latency is None:
+            phase.hit_errors += 1
+        else:
+            phase.hits.append(latency)
+
+    tasks = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < duration:
+        tasks.append(asyncio.create_task(one(codes[sent % len(codes)])))
+        sent += 1
+        delay = start + sent * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.gather(*tasks)
+
+
+async def miss_traffic(client: httpx.AsyncClient, prefix: str, codes: Iterator[str], stop: asyncio.Event,
+                       phase: Phase):
+    """持续请求未缓存股票的K线，直到 stop"""
+    for code in codes:
+        if stop.is_set():
+            return
+        latency = await timed_get(client, f"{prefix}/stocks/{code}/kline?period=daily")
+        if latency is None:
+            phase.miss_errors += 1
+        else:
+            phase.misses.append(latency)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="股票API缓存命中延迟负载测试")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=int, default=200, help="命中请求每秒次数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每个阶段的秒数")
+    parser.add_argument("--hit-codes", default=DEFAULT_HIT_CODES)
+    parser.add_argument("--miss-codes", default=None, help="逗号分隔的未缓存股票，默认沪深主板代码段")
+    parser.add_argument("--miss-concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    prefix = args.base_url.rstrip("/") + settings.api_v1_prefix
+    hit_codes = args.hit_codes.split(",")
+    miss_codes = args.miss_codes.split(",") if args.miss_codes else default_miss_codes()
+    limits = httpx.Limits(max_connections=args.rate + args.miss_concurrency, max_keepalive_connections=100)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        # 预热：命中股票写入缓存
+        for code in hit_codes:
+            if await timed_get(client, f"{prefix}/stocks/{code}/info") is None:
+                print(f"预热失败: {code}")
+
+        print(f"{prefix}: 命中 {args.rate} 次/秒 x {args.duration:.0f}秒/阶段, 未命中并发 {args.miss_concurrency}")
+        baseline = Phase("只有命中")
+        await hit_traffic(client, prefix, hit_codes, args.rate, args.duration, baseline)
+
+        loaded = Phase("命中+未命中")
+        stop = asyncio.Event()
+        codes = iter(miss_codes)
+        misses = [asyncio.create_task(miss_traffic(client, prefix, codes, stop, loaded))
+                  for _ in range(args.miss_concurrency)]
+        await hit_traffic(client, prefix, hit_codes, args.rate, args.duration, loaded)
+        stop.set()
+        await asyncio.gather(*misses)
+
+    print()
+    baseline.report()
+    loaded.report()
+    base_p99 = percentile(baseline.hits, 99)
+    if base_p99:
+        print(f"\n命中 p99 变化: x{percentile(loaded.hits, 99) / base_p99:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
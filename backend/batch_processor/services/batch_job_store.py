@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理任务状态存储
+调度器每次触发的工作单元（一个自选股列表或一个维护任务）记录为 batch_jobs 表中的一行，
+重启后据此恢复：已完成的单元不再重复执行，未完成的单元重新入队，各调度的上次触发时间用于补跑判断
+（没有工作单元的触发不记录）；psycopg2 调用在线程中执行，不阻塞调度器的事件循环
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from app.core.db_pool import pg_connection
+
+from ..config.batch_config import config
+from ..models.batch_job import JobCategory, JobStatus, JobType
+
+logger = logging.getLogger(__name__)
+
+class BatchJobStore:
+    """批处理任务状态存储服务"""
+
+    def __init__(self):
+        self.db_config = config.database_config
+
+    def _get_connection(self):
+        """从共享连接池获取数据库连接，close() 时归还"""
+        return pg_connection(self.db_config)
+
+    async def last_fire_times(self) -> Dict[str, datetime]:
+        """各调度任务最近一次触发的计划时间"""
+        return await asyncio.to_thread(self._last_fire_times)
+
+    def _last_fire_times(self) -> Dict[str, datetime]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT job_name, MAX(scheduled_time) FROM batch_jobs
+            WHERE job_category = %s
+            GROUP BY job_name
+        """, (JobCategory.SCHEDULED.value,))
+        result = {name: fire_time for name, fire_time in cursor.fetchall()}
+        cursor.close()
+        conn.close()
+        return result
+
+    async def create_units(self, job_name: str, job_type: JobType, scheduled_time: datetime,
+                           units: List[Tuple[Optional[int], int]], max_retries: int) -> List[Dict[str, Any]]:
+        """记录一次触发的全部工作单元 [(watchlist_id, priority_level)]，返回新建的记录"""
+        if not units:
+            return []
+        return await asyncio.to_thread(self._create_units, job_name, job_type, scheduled_time, units, max_retries)
+
+    def _create_units(self, job_name: str, job_type: JobType, scheduled_time: datetime,
+                      units: List[Tuple[Optional[int], int]], max_retries: int) -> List[Dict[str, Any]]:
+        conn = self._get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            rows = execute_values(cursor, """
+                INSERT INTO batch_jobs
+                (job_name, job_type, job_category, watchlist_id, status, priority_level, scheduled_time, max_retries)
+                VALUES %s
+                RETURNING *
+            """, [
+                (job_name, job_type.value, JobCategory.SCHEDULED.value, watchlist_id,
+                 JobStatus.PENDING.value, priority_level, scheduled_time, max_retries)
+                for watchlist_id, priority_level in units
+            ], fetch=True)
+            conn.commit()
+            return [dict(row) for row in rows]
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def unfinished_units(self, since: datetime) -> List[Dict[str, Any]]:
+        """
+        取出 since 之后触发、尚未完成（pending/running）的工作单元并重置为 pending；
+        更早的未完成单元已无意义，标记为 cancelled
+        """
+        return await asyncio.to_thread(self._unfinished_units, since)
+
+    def _unfinished_units(self, since: datetime) -> List[Dict[str, Any]]:
+        conn = self._get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("""
+                UPDATE batch_jobs SET status = %s, end_time = NOW(), error_message = 'expired before resume'
+                WHERE job_category = %s AND status IN (%s, %s) AND scheduled_time < %s
+            """, (JobStatus.CANCELLED.value, JobCategory.SCHEDULED.value,
+                  JobStatus.PENDING.value, JobStatus.RUNNING.value, since))
+            expired = cursor.rowcount
+
+            cursor.execute("""
+                UPDATE batch_jobs SET status = %s, start_time = NULL
+                WHERE job_category = %s AND status IN (%s, %s) AND scheduled_time >= %s
+                RETURNING *
+            """, (JobStatus.PENDING.value, JobCategory.SCHEDULED.value,
+                  JobStatus.PENDING.value, JobStatus.RUNNING.value, since))
+            rows = [dict(row) for row in cursor.fetchall()]
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        if expired:
+            logger.info(f"过期未完成的批处理单元已取消: {expired} 个")
+        return rows
+
+    async def mark_running(self, job_id: int):
+        """标记工作单元开始执行"""
+        await asyncio.to_thread(self._mark_running, job_id)
+
+    def _mark_running(self, job_id: int):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE batch_jobs SET status = %s, start_time = NOW() WHERE id = %s",
+            (JobStatus.RUNNING.value, job_id)
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    async def mark_finished(self, job_id: int, status: JobStatus, duration: float,
+                            result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """记录工作单元执行结果"""
+        await asyncio.to_thread(self._mark_finished, job_id, status, duration, result, error)
+
+    def _mark_finished(self, job_id: int, status: JobStatus, duration: float,
+                       result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        result = result or {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE batch_jobs SET
+                status = %s, end_time = NOW(), duration_seconds = %s,
+                processed_count = %s, success_count = %s, failed_count = %s,
+                error_message = %s, result_summary = %s
+            WHERE id = %s
+        """, (
+            status.value, int(duration),
+            int(result.get("processed", 0) or 0), int(result.get("success", 0) or 0), int(result.get("failed", 0) or 0),
+            error, json.dumps(result, ensure_ascii=False, default=str), job_id
+        ))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    async def mark_retry(self, job_id: int, error: str):
+        """失败后重新排队，重试次数加一"""
+        await asyncio.to_thread(self._mark_retry, job_id, error)
+
+    def _mark_retry(self, job_id: int, error: str):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE batch_jobs SET status = %s, retry_count = retry_count + 1, error_message = %s
+            WHERE id = %s
+        """, (JobStatus.PENDING.value, error, job_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    async def processed_watchlists(self, job_name: str, since: datetime) -> List[int]:
+        """since 之后该调度已经记录过的自选股列表"""
+        return await asyncio.to_thread(self._processed_watchlists, job_name, since)
+
+    def _processed_watchlists(self, job_name: str, since: datetime) -> List[int]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT watchlist_id FROM batch_jobs
+            WHERE job_name = %s AND scheduled_time >= %s AND watchlist_id IS NOT NULL
+        """, (job_name, since))
+        result = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return result
@@ -10,9 +10,10 @@ import json
 import uuid
 from typing import Optional, Dict, List, Any
 from datetime import datetime
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from app.core.db_pool import pg_connection
+
 from ..config.batch_config import config
 
 logger = logging.getLogger(__name__)
@@ -25,11 +26,8 @@ class VersionManager:
         logger.info("版本管理器初始化完成")
 
     def _get_connection(self):
-        """获取数据库连接"""
-        if 'url' in self.db_config:
-            return psycopg2.connect(self.db_config['url'])
-        else:
-            return psycopg2.connect(**self.db_config)
+        """从共享连接池获取数据库连接，close() 时归还"""
+        return pg_connection(self.db_config)
 
     def calculate_data_hash(self, data: Dict) -> str:
         """计算数据哈希值用于版本控制"""
@@ -3,13 +3,15 @@
 """
 自选股管理服务
 """
+import asyncio
 import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, time
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
 
+from app.core.db_pool import pg_connection
+
 from ..config.batch_config import config
 from ..models.watchlist import (
     WatchlistCreate, WatchlistUpdate, WatchlistResponse,
@@ -26,11 +28,8 @@ class WatchlistService:
         logger.info("自选股服务初始化完成")
 
     def _get_connection(self):
-        """获取数据库连接"""
-        if 'url' in self.db_config:
-            return psycopg2.connect(self.db_config['url'])
-        else:
-            return psycopg2.connect(**self.db_config)
+        """从共享连接池获取数据库连接，close() 时归还"""
+        return pg_connection(self.db_config)
 
     async def create_watchlist(self, watchlist_data: WatchlistCreate) -> WatchlistResponse:
         """创建自选股列表"""
@@ -208,6 +207,9 @@ class WatchlistService:
 
     async def get_priority_watchlists(self, priority_level: int = None) -> List[WatchlistResponse]:
         """获取优先级批处理的自选股列表"""
+        return await asyncio.to_thread(self._get_priority_watchlists, priority_level)
+
+    def _get_priority_watchlists(self, priority_level: int = None) -> List[WatchlistResponse]:
         try:
             conn = self._get_connection()
             cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -242,6 +244,9 @@ class WatchlistService:
 
     async def get_scheduled_watchlists(self, current_time: time) -> List[WatchlistResponse]:
         """获取当前时间应该执行的自选股列表"""
+        return await asyncio.to_thread(self._get_scheduled_watchlists, current_time)
+
+    def _get_scheduled_watchlists(self, current_time: time) -> List[WatchlistResponse]:
         try:
             conn = self._get_connection()
             cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理工作规划
+在执行前把 (股票, 数据类型) 合并为全局去重的任务集，并按数据新鲜度决定每项怎么做：
+
+- Redis 中仍在软TTL内（ETag旁路键记录的软过期时间）: 跳过
+- 同一进程内正在执行或刚完成（dedupe_window 内）: 跳过，避免不同优先级批次、单列表处理重复拉取
+- PostgreSQL 中 updated_at 仍在该数据类型TTL内: 经三层架构从数据库回填 Redis，不消耗 AKShare 配额
+- PostgreSQL 中已过期: 跳过数据库直接从 AKShare 刷新；数据库中没有的由三层架构穿透到 AKShare
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.db_pool import pg_connection
+
+from ..config.batch_config import config
+
+logger = logging.getLogger(__name__)
+
+# 三层架构取数（数据库有新鲜数据时不访问 AKShare）
+ACTION_FETCH = "fetch"
+# 数据库数据已过期，直接从 AKShare 刷新
+ACTION_REFRESH = "refresh"
+
+# 带 updated_at 的数据类型及其表（由 ThreeTierDataService.save_to_postgresql 维护）
+PG_FRESHNESS_TABLES = {
+    "basic_info": "stock_basic_info",
+    "financial": "stock_financial",
+    "announcements": "stock_announcements",
+    "shareholders": "stock_shareholders",
+    "longhubang": "stock_longhubang",
+}
+
+WorkKey = Tuple[str, str]
+
+
+@dataclass
+class WorkPlan:
+    """规划结果"""
+    items: List[Tuple[str, str, str]] = field(default_factory=list)  # (stock_code, data_type, action)
+    skipped: Dict[str, int] = field(default_factory=dict)             # 跳过原因 -> 数量
+    requested: int = 0
+
+    def skip(self, reason: str, count: int = 1):
+        if count:
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    @property
+    def skipped_total(self) -> int:
+        return sum(self.skipped.values())
+
+    def summary(self) -> Dict[str, Any]:
+        actions: Dict[str, int] = {}
+        for _, _, action in self.items:
+            actions[action] = actions.get(action, 0) + 1
+        return {"requested": self.requested, "planned": len(self.items), "actions": actions,
+                "skipped": dict(self.skipped)}
+
+
+class WorkPlanner:
+    """全局去重的批处理工作规划器（进程内共享）"""
+
+    def __init__(self):
+        settings = config.batch_settings.get('work_planner', {}) or {}
+        self.dedupe_window = float(settings.get('dedupe_window', 300))
+        self.freshness_margin = float(settings.get('freshness_margin', 0))
+        self.db_config = config.database_config
+
+        self._lock = threading.Lock()
+        self._in_flight: Set[WorkKey] = set()
+        self._completed: Dict[WorkKey, float] = {}
+
+    def plan(self, pairs: Iterable[WorkKey], data_service=None, force_refresh: bool = False) -> WorkPlan:
+        """
+        生成工作计划，计划中的项目登记为执行中，执行完后须调用 finish()
+        force_refresh 时不做新鲜度检查，全部直接从 AKShare 刷新（仍去重）
+        """
+        work_plan = WorkPlan()
+        pairs = list(pairs)
+        work_plan.requested = len(pairs)
+        unique = list(dict.fromkeys(pairs))
+        work_plan.skip("duplicate", len(pairs) - len(unique))
+
+        # 登记执行中，跳过其他批次正在执行或刚完成的项目
+        now = time.monotonic()
+        candidates = []
+        with self._lock:
+            self._completed = {k: t for k, t in self._completed.items() if now - t < self.dedupe_window}
+            for key in unique:
+                if key in self._in_flight:
+                    work_plan.skip("in_flight")
+                elif not force_refresh and key in self._completed:
+                    work_plan.skip("recent")
+                else:
+                    self._in_flight.add(key)
+                    candidates.append(key)
+
+        if force_refresh or data_service is None:
+            action = ACTION_REFRESH if force_refresh else ACTION_FETCH
+            work_plan.items = [(stock_code, data_type, action) for stock_code, data_type in candidates]
+            return work_plan
+
+        try:
+            redis_fresh = self._redis_fresh(candidates, data_service)
+            pg_age = self._pg_age(candidates)
+        except Exception as e:
+            # 新鲜度未知时按原三层架构执行
+            logger.error(f"新鲜度检查失败，按三层架构处理全部项目: {e}")
+            redis_fresh, pg_age = set(), {}
+
+        fresh = []
+        for key in candidates:
+            stock_code, data_type = key
+            if key in redis_fresh:
+                fresh.append(key)
+                continue
+            age = pg_age.get(key)
+            if age is not None and age >= data_service.cache_ttl.get(data_type, 300):
+                work_plan.items.append((stock_code, data_type, ACTION_REFRESH))
+            else:
+                work_plan.items.append((stock_code, data_type, ACTION_FETCH))
+
+        work_plan.skip("redis_fresh", len(fresh))
+        self.finish(fresh, fresh)
+        logger.info(f"批处理工作规划: {work_plan.summary()}")
+        return work_plan
+
+    def finish(self, keys: Iterable[WorkKey], succeeded: Iterable[WorkKey] = ()):
+        """执行结束：解除执行中登记，成功的项目在 dedupe_window 内不再重复规划"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._in_flight.discard(key)
+            for key in succeeded:
+                self._completed[key] = now
+
+    def _redis_fresh(self, keys: List[WorkKey], data_service) -> Set[WorkKey]:
+        """ETag旁路键记录的软过期时间仍在未来（留 freshness_margin 余量）的项目，一次 MGET"""
+        if not keys or not hasattr(data_service, "get_etags"):
+            return set()
+        cache_keys = [data_service.get_cache_key(data_type, stock_code) for stock_code, data_type in keys]
+        markers = data_service.get_etags(cache_keys)
+        deadline = time.time() + self.freshness_margin
+        return {key for key, marker in zip(keys, markers) if marker and marker[1] > deadline}
+
+    def _pg_age(self, keys: List[WorkKey]) -> Dict[WorkKey, float]:
+        """各数据类型一次查询取数据年龄(秒)"""
+        codes_by_type: Dict[str, List[str]] = {}
+        for stock_code, data_type in keys:
+            if data_type in PG_FRESHNESS_TABLES:
+                codes_by_type.setdefault(data_type, []).append(stock_code)
+        if not codes_by_type:
+            return {}
+
+        result = {}
+        conn = pg_connection(self.db_config)
+        try:
+            cursor = conn.cursor()
+            for data_type, codes in codes_by_type.items():
+                # 年龄在数据库中按同一会话时区计算，不受数据库与批处理进程时区不同的影响
+                cursor.execute(
+                    f"""SELECT stock_code, EXTRACT(EPOCH FROM now() - MAX(updated_at)::timestamptz)
+                        FROM {PG_FRESHNESS_TABLES[data_type]}
+                        WHERE stock_code = ANY(%s) GROUP BY stock_code""",
+                    (codes,)
+                )
+                for stock_code, age in cursor.fetchall():
+                    if age is not None:
+                        result[(stock_code, data_type)] = float(age)
+            cursor.close()
+        finally:
+            conn.close()
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._in_flight), "recent": len(self._completed),
+                    "dedupe_window": self.dedupe_window}
+
+
+# 全局规划器实例（同一进程内的所有批处理共享）
+work_planner = WorkPlanner()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有界并发异步工作池
+每个上游数据源一个队列和一组工作协程（数量即该数据源的并发上限），再由全局信号量限制总并发；
+某个数据源慢或被限流时只占用它自己的工作协程，不会阻塞其他数据源的任务
+
+- 节奏由共享限流器控制（如 AKShare 调用经过 app.core.rate_limiter.akshare_limiter），池内不做固定 sleep
+- 运行期间定期记录吞吐量（条/秒）、队列深度与执行中数量；每次 run() 返回自己的统计，snapshot() 为当前全部运行的合计
+- 同一实例上并发的多次 run() 共享全局和按数据源的并发上限
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RunStats:
+    """一次 run() 的进度统计（每次运行独立，多个运行并发时互不覆盖）"""
+
+    def __init__(self, queues: Dict[str, asyncio.Queue], total: int):
+        self.queues = queues
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """进度：总数、完成数、失败数、吞吐量、队列深度（总计和按数据源）、执行中数量"""
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        depth = {source: queue.qsize() for source, queue in self.queues.items()}
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_source": depth,
+            "elapsed": elapsed,
+            "throughput": self.done / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class WorkerPool(Generic[T, R]):
+    """按数据源限制并发的异步工作池
+
+    全局和按数据源的并发上限由实例上的信号量控制，同一实例上并发的多次 run() 共享这些上限
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 16, default_source_concurrency: int = 4,
+                 source_concurrency: Optional[Dict[str, int]] = None, report_interval: float = 10.0):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.default_source_concurrency = max(1, int(default_source_concurrency))
+        self.source_concurrency = {k: max(1, int(v)) for k, v in (source_concurrency or {}).items()}
+        self.report_interval = report_interval
+
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+        self._source_limits: Dict[str, asyncio.Semaphore] = {}
+        self._active: List[RunStats] = []
+        self._last_run: Optional[RunStats] = None
+
+    def concurrency_for(self, source: str) -> int:
+        return min(self.source_concurrency.get(source, self.default_source_concurrency), self.max_concurrency)
+
+    def _source_limit(self, source: str) -> asyncio.Semaphore:
+        if source not in self._source_limits:
+            self._source_limits[source] = asyncio.Semaphore(self.concurrency_for(source))
+        return self._source_limits[source]
+
+    async def run(self, items: Iterable[T], handler: Callable[[T], Awaitable[R]],
+                  source_of: Callable[[T], str]) -> Tuple[List[Tuple[T, Any]], Dict[str, Any]]:
+        """
+        执行全部任务，返回 ([(item, 结果或异常)], 本次运行的进度统计)，结果顺序与输入一致
+        handler 抛出的异常不会中断其他任务
+        """
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+        queues: Dict[str, asyncio.Queue] = {}
+        for index, item in enumerate(items):
+            queues.setdefault(source_of(item), asyncio.Queue()).put_nowait((index, item))
+
+        stats = RunStats(queues, len(items))
+        if not items:
+            stats.finished_at = stats.started_at
+            return [], stats.snapshot()
+
+        async def worker(source: str, queue: asyncio.Queue):
+            source_limit = self._source_limit(source)
+            while True:
+                try:
+                    index, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                async with source_limit, self._limit:
+                    stats.in_flight += 1
+                    try:
+                        results[index] = await handler(item)
+                    except Exception as e:
+                        results[index] = e
+                        stats.failed += 1
+                    finally:
+                        stats.in_flight -= 1
+                        stats.done += 1
+
+        workers = [
+            asyncio.create_task(worker(source, queue))
+            for source, queue in queues.items()
+            for _ in range(min(self.concurrency_for(source), queue.qsize()))
+        ]
+        self._active.append(stats)
+        reporter = asyncio.create_task(self._report_loop(stats))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            reporter.cancel()
+            stats.finished_at = time.monotonic()
+            self._active.remove(stats)
+            self._last_run = stats
+
+        snapshot = stats.snapshot()
+        logger.info(f"工作池 {self.name} 完成: {snapshot['done']}/{snapshot['total']} 条, "
+                    f"失败 {snapshot['failed']}, {snapshot['throughput']:.1f} 条/秒, 耗时 {snapshot['elapsed']:.1f}秒")
+        return list(zip(items, results)), snapshot
+
+    async def _report_loop(self, stats: RunStats):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            snapshot = stats.snapshot()
+            logger.info(f"工作池 {self.name} 进度: {snapshot['done']}/{snapshot['total']}, "
+                        f"{snapshot['throughput']:.1f} 条/秒, 队列 {snapshot['queue_depth']}, 执行中 {snapshot['in_flight']}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        当前全部运行的合计进度（没有运行中的任务时为最近一次运行）：
+        总数、完成数、失败数、吞吐量、队列深度（总计和按数据源）、执行中数量、运行数
+        """
+        runs = list(self._active) or ([self._last_run] if self._last_run else [])
+        if not runs:
+            return {"total": 0, "done": 0, "failed": 0, "in_flight": 0, "queue_depth": 0,
+                    "queue_depth_by_source": {}, "elapsed": 0.0, "throughput": 0.0, "runs": 0}
+
+        snapshots = [run.snapshot() for run in runs]
+        depth: Dict[str, int] = {}
+        for snapshot in snapshots:
+            for source, size in snapshot["queue_depth_by_source"].items():
+                depth[source] = depth.get(source, 0) + size
+        done = sum(snapshot["done"] for snapshot in snapshots)
+        elapsed = max(snapshot["elapsed"] for snapshot in snapshots)
+        return {
+            "total": sum(snapshot["total"] for snapshot in snapshots),
+            "done": done,
+            "failed": sum(snapshot["failed"] for snapshot in snapshots),
+            "in_flight": sum(snapshot["in_flight"] for snapshot in snapshots),
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_source": depth,
+            "elapsed": elapsed,
+            "throughput": done / elapsed if elapsed > 0 else 0.0,
+            "runs": len(self._active),
+        }
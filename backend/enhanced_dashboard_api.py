@@ -4,21 +4,36 @@
 增强版Dashboard API - 严格遵循三层架构
 Redis → PostgreSQL → AKShare
 """
+import asyncio
+import functools
 import logging
+import threading
 import time
 import json
 import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from fastapi import FastAPI, HTTPException, Query
+from typing import Dict, List, Optional, Any, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import redis
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import akshare as ak
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.db_pool import pg_connection, pg_pool_stats
+from app.core.metrics import (
+    DATA_TYPE_LATENCY, MetricsMiddleware, metrics_response, register_pg_pool_stats, timed_tier
+)
+from app.core.rate_limiter import akshare_limiter
+from app.core.redis_pool import get_sync_redis
+from app.services.indicator_store import update_indicators
+from app.utils import cache_envelope, http_cache, serializer
+from app.utils.indicators import INDICATOR_COLUMNS
+from app.utils.serializer import FastJSONResponse
+from app.utils.single_flight import SingleFlight, RedisSingleFlight
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -38,20 +53,16 @@ class DashboardResponse(BaseModel):
     timestamp: datetime
     data_sources: Dict[str, List[str]]
     cache_info: Dict[str, str]
+    type_status: Dict[str, str] = {}
     data: Dict[str, Any]
 
 # 三层架构数据服务
 class ThreeTierDataService:
     def __init__(self):
         # Redis连接 (第一层缓存)
-        self.redis_client = redis.Redis(
-            host='localhost',
-            port=6379,
-            db=0,
-            decode_responses=True
-        )
+        self.redis_client = get_sync_redis(settings.redis_db_stock)
 
-        # PostgreSQL连接 (第二层存储)
+        # PostgreSQL连接参数 (第二层存储)，连接取自共享连接池
         self.pg_config = {
             'host': 'localhost',
             'port': 5432,
@@ -73,21 +84,84 @@ class ThreeTierDataService:
             'technical': 300         # 技术指标5分钟
         }
 
+        # 软TTL过期后继续返回旧值的宽限期（秒），硬TTL = cache_ttl + stale_grace
+        self.stale_grace = {
+            'realtime': 30,
+            'kline': 1800,
+            'basic_info': 86400,
+            'news': 1800,
+            'financial': 86400,
+            'announcements': 3600,
+            'shareholders': 86400,
+            'longhubang': 3600,
+            'technical': 600
+        }
+
+        # XFetch提前刷新系数，0表示关闭，未配置的类型默认1.0
+        self.xfetch_beta = {
+            'realtime': 1.0,
+            'kline': 1.0,
+            'basic_info': 1.0,
+            'financial': 0.5,
+            'shareholders': 0.5
+        }
+
+        # 后台刷新线程池
+        self.refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        self._refresh_lock = threading.Lock()
+        self._refreshing = set()
+
+        # Dashboard并发获取时各数据类型的超时预算（秒）
+        self.fetch_timeout = {
+            'realtime': 5,
+            'basic_info': 5,
+            'kline': 8,
+            'news': 10,
+            'financial': 10,
+            'announcements': 10,
+            'shareholders': 10,
+            'longhubang': 10,
+            'technical': 8
+        }
+        self.default_fetch_timeout = 8
+
+        # 多个数据类型并发访问AKShare时共享代理清除状态
+        self._proxy_lock = threading.Lock()
+        self._proxy_users = 0
+        self._saved_proxy = {}
+
+        # 缓存未命中时的请求合并；SINGLE_FLIGHT_REDIS_LOCK=1 时启用跨进程Redis锁
+        self.single_flight = SingleFlight("three_tier")
+        self.redis_single_flight = None
+        if os.getenv("SINGLE_FLIGHT_REDIS_LOCK", "0") == "1":
+            self.redis_single_flight = RedisSingleFlight(
+                self.redis_client,
+                lock_ttl=float(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "30")),
+                wait_timeout=float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "10"))
+            )
+
     def clear_proxy(self):
-        """清除代理设置"""
+        """清除代理设置（并发安全：首个进入者清除，最后一个退出者恢复）"""
         proxy_vars = ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY']
-        original_proxy = {}
-        for var in proxy_vars:
-            original_proxy[var] = os.environ.get(var)
-            if var in os.environ:
-                del os.environ[var]
-        return original_proxy
+        with self._proxy_lock:
+            if self._proxy_users == 0:
+                self._saved_proxy = {}
+                for var in proxy_vars:
+                    self._saved_proxy[var] = os.environ.get(var)
+                    if var in os.environ:
+                        del os.environ[var]
+            self._proxy_users += 1
+            return self._saved_proxy
 
     def restore_proxy(self, original_proxy):
         """恢复代理设置"""
-        for var, value in original_proxy.items():
-            if value is not None:
-                os.environ[var] = value
+        with self._proxy_lock:
+            self._proxy_users -= 1
+            if self._proxy_users > 0:
+                return
+            for var, value in original_proxy.items():
+                if value is not None:
+                    os.environ[var] = value
 
     def get_cache_key(self, data_type: str, stock_code: str, **kwargs) -> str:
         """生成缓存键"""
@@ -98,11 +172,17 @@ class ThreeTierDataService:
 
     def get_from_redis(self, cache_key: str) -> Optional[Dict]:
         """第一层：从Redis获取数据"""
+        entry = self.get_entry_from_redis(cache_key)
+        return entry.value if entry else None
+
+    @timed_tier("redis", data_type=lambda self, cache_key: cache_key.split(":", 1)[0])
+    def get_entry_from_redis(self, cache_key: str) -> Optional[cache_envelope.CacheEntry]:
+        """第一层：从Redis获取缓存条目（含软过期时间）"""
         try:
             cached_data = self.redis_client.get(cache_key)
             if cached_data:
                 logger.info(f"✅ Redis缓存命中: {cache_key}")
-                return json.loads(cached_data)
+                return cache_envelope.unwrap(cached_data)
             else:
                 logger.info(f"❌ Redis缓存未命中: {cache_key}")
                 return None
@@ -110,10 +190,11 @@ class ThreeTierDataService:
             logger.error(f"Redis查询错误: {e}")
             return None
 
+    @timed_tier("postgresql")
     def get_from_postgresql(self, data_type: str, stock_code: str, **kwargs) -> Optional[Dict]:
         """第二层：从PostgreSQL获取数据"""
         try:
-            conn = psycopg2.connect(**self.pg_config)
+            conn = pg_connection(self.pg_config)
             cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             # 根据数据类型查询不同表
@@ -160,6 +241,17 @@ class ThreeTierDataService:
                     "SELECT * FROM stock_longhubang WHERE stock_code = %s",
                     (stock_code,)
                 )
+            elif data_type == "technical":
+                # 预计算的技术指标，直接查表
+                days = kwargs.get('days', 60)
+                cursor.execute(
+                    f"""SELECT stock_code, trade_date, {", ".join(INDICATOR_COLUMNS)}, updated_at
+                       FROM stock_technical_indicators
+                       WHERE stock_code = %s
+                       ORDER BY trade_date DESC
+                       LIMIT %s""",
+                    (stock_code, days)
+                )
 
             result = cursor.fetchall()
             cursor.close()
@@ -176,6 +268,7 @@ class ThreeTierDataService:
             logger.error(f"PostgreSQL查询错误: {e}")
             return None
 
+    @timed_tier("akshare")
     def get_from_akshare(self, data_type: str, stock_code: str, **kwargs) -> Optional[Dict]:
         """第三层：从AKShare获取数据"""
         try:
@@ -187,7 +280,8 @@ class ThreeTierDataService:
                     end_date = datetime.now().strftime("%Y%m%d")
                     start_date = (datetime.now() - timedelta(days=5)).strftime("%Y%m%d")
 
-                    hist_data = ak.stock_zh_a_hist(
+                    hist_data = akshare_limiter.call(
+                        ak.stock_zh_a_hist,
                         symbol=stock_code,
                         period="daily",
                         start_date=start_date,
@@ -216,7 +310,8 @@ class ThreeTierDataService:
                     end_date = datetime.now().strftime("%Y%m%d")
                     start_date = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
 
-                    kline_data = ak.stock_zh_a_hist(
+                    kline_data = akshare_limiter.call(
+                        ak.stock_zh_a_hist,
                         symbol=stock_code,
                         period="daily",
                         start_date=start_date,
@@ -247,7 +342,7 @@ class ThreeTierDataService:
 
                 elif data_type == "news":
                     # 获取新闻数据
-                    news_data = ak.stock_news_em(symbol=stock_code)
+                    news_data = akshare_limiter.call(ak.stock_news_em, symbol=stock_code)
 
                     if not news_data.empty:
                         news_list = []
@@ -280,7 +375,7 @@ class ThreeTierDataService:
                     # 获取财务数据 - 使用ocean5tech项目验证的接口
                     try:
                         # 使用 stock_financial_abstract 获取财务摘要数据
-                        financial_df = ak.stock_financial_abstract(symbol=stock_code)
+                        financial_df = akshare_limiter.call(ak.stock_financial_abstract, symbol=stock_code)
 
                         if financial_df is not None and not financial_df.empty:
                             # 清理NaN值
@@ -329,7 +424,7 @@ class ThreeTierDataService:
                     # 获取公告信息 - 使用新闻接口作为替代方案
                     try:
                         # 使用news接口获取相关资讯作为公告替代
-                        news_data = ak.stock_news_em(symbol=stock_code)
+                        news_data = akshare_limiter.call(ak.stock_news_em, symbol=stock_code)
 
                         announcements_list = []
                         if news_data is not None and not news_data.empty:
@@ -376,7 +471,7 @@ class ThreeTierDataService:
                 elif data_type == "shareholders":
                     # 获取股东信息
                     try:
-                        shareholder_data = ak.stock_zh_a_gdhs_detail_em(symbol=stock_code)
+                        shareholder_data = akshare_limiter.call(ak.stock_zh_a_gdhs_detail_em, symbol=stock_code)
 
                         shareholders_list = []
                         if not shareholder_data.empty:
@@ -407,26 +502,15 @@ class ThreeTierDataService:
                         start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
 
                         # 获取整体龙虎榜数据，然后筛选当前股票
-                        longhubang_data = ak.stock_lhb_detail_em(start_date=start_date, end_date=end_date)
+                        longhubang_data = akshare_limiter.call(ak.stock_lhb_detail_em, start_date=start_date, end_date=end_date)
 
                         longhubang_list = []
                         if not longhubang_data.empty:
                             # 筛选当前股票的龙虎榜记录
                             stock_lhb = longhubang_data[longhubang_data['代码'] == stock_code]
-                            for _, row in stock_lhb.iterrows():
-                                longhubang_list.append({
-                                    "date": str(row.get('上榜日', '')),
-                                    "reason": str(row.get('上榜原因', '')),
-                                    "close_price": str(row.get('收盘价', '')),
-                                    "change_percent": str(row.get('涨跌幅', '')),
-                                    "turnover": str(row.get('龙虎榜成交额', ''))
-                                })
+                            longhubang_list = self.format_longhubang(stock_lhb)
 
-                        data = {
-                            "records": longhubang_list,
-                            "days": 30,
-                            "updated_at": datetime.now().isoformat()
-                        }
+                        data = self.longhubang_data(longhubang_list, 30)
 
                         logger.info(f"✅ AKShare获取龙虎榜数据: {stock_code}, {len(longhubang_list)}条记录")
                         return {"data": data, "source": "akshare"}
@@ -434,10 +518,16 @@ class ThreeTierDataService:
                         logger.error(f"获取龙虎榜数据失败: {e}")
                         return None
 
+                elif data_type == "technical":
+                    # 技术指标没有AKShare数据源：先经三层架构加载足够计算MA60的K线，再由已存储的K线计算并查表
+                    self.get_data("kline", stock_code, days=180)
+                    update_indicators([stock_code], self.pg_config)
+                    return self.get_from_postgresql(data_type, stock_code, **kwargs)
+
                 elif data_type == "basic_info":
                     # 获取基本信息
                     try:
-                        info_data = ak.stock_individual_info_em(symbol=stock_code)
+                        info_data = akshare_limiter.call(ak.stock_individual_info_em, symbol=stock_code)
                         if isinstance(info_data, pd.DataFrame) and not info_data.empty:
                             stock_name_row = info_data[info_data['item'] == '股票简称']
                             stock_name = stock_name_row['value'].iloc[0] if not stock_name_row.empty else f'Stock{stock_code}'
@@ -479,10 +569,33 @@ class ThreeTierDataService:
             logger.error(f"AKShare获取数据失败: {data_type}, {stock_code}, {e}")
             return None
 
+    @staticmethod
+    def format_longhubang(stock_lhb: pd.DataFrame) -> List[Dict]:
+        """龙虎榜明细表中一只股票的行转换为记录列表"""
+        return [
+            {
+                "date": str(row.get('上榜日', '')),
+                "reason": str(row.get('上榜原因', '')),
+                "close_price": str(row.get('收盘价', '')),
+                "change_percent": str(row.get('涨跌幅', '')),
+                "turnover": str(row.get('龙虎榜成交额', ''))
+            }
+            for row in stock_lhb.to_dict('records')
+        ]
+
+    @staticmethod
+    def longhubang_data(records: List[Dict], days: int) -> Dict:
+        """龙虎榜数据类型的缓存/存储格式"""
+        return {
+            "records": records,
+            "days": days,
+            "updated_at": datetime.now().isoformat()
+        }
+
     def save_to_postgresql(self, data_type: str, stock_code: str, data: Dict):
         """保存数据到PostgreSQL"""
         try:
-            conn = psycopg2.connect(**self.pg_config)
+            conn = pg_connection(self.pg_config)
             cursor = conn.cursor()
 
             if data_type == "kline" and "data" in data:
@@ -580,40 +693,204 @@ class ThreeTierDataService:
             conn.close()
             logger.info(f"✅ 数据已保存到PostgreSQL: {data_type}, {stock_code}")
 
+            if data_type == "kline":
+                # 新K线入库后在后台增量更新技术指标，不占用请求和单飞加载的时间
+                self.refresh_executor.submit(self._update_indicators, stock_code)
+
         except Exception as e:
             logger.error(f"保存到PostgreSQL失败: {data_type}, {stock_code}, {e}")
 
-    def save_to_redis(self, cache_key: str, data: Dict, ttl: int):
-        """保存数据到Redis缓存"""
+    def _update_indicators(self, stock_code: str):
+        try:
+            update_indicators([stock_code], self.pg_config)
+        except Exception as e:
+            logger.error(f"技术指标更新失败: {stock_code}, {e}")
+
+    def save_many_to_postgresql(self, data_type: str, partitions: Dict[str, Dict]) -> bool:
+        """批量保存多只股票的同一数据类型，返回是否成功；龙虎榜一条语句批量upsert，其他类型逐只保存"""
+        if data_type != "longhubang":
+            for stock_code, data in partitions.items():
+                self.save_to_postgresql(data_type, stock_code, data)
+            return True
+
+        try:
+            conn = pg_connection(self.pg_config)
+            cursor = conn.cursor()
+            execute_values(
+                cursor,
+                """INSERT INTO stock_longhubang (stock_code, longhubang_data, records_count, query_days)
+                   VALUES %s
+                   ON CONFLICT (stock_code) DO UPDATE SET
+                   longhubang_data = EXCLUDED.longhubang_data,
+                   records_count = EXCLUDED.records_count,
+                   query_days = EXCLUDED.query_days,
+                   updated_at = CURRENT_TIMESTAMP""",
+                [
+                    (stock_code, json.dumps(data, ensure_ascii=False), len(data.get("records", [])), data.get("days", 30))
+                    for stock_code, data in partitions.items()
+                ],
+                page_size=1000
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+            logger.info(f"✅ 批量保存到PostgreSQL: {data_type}, {len(partitions)}只股票")
+            return True
+        except Exception as e:
+            logger.error(f"批量保存到PostgreSQL失败: {data_type}, {e}")
+            return False
+
+    def save_many_to_redis(self, entries: Dict[str, Dict], ttl: int, stale_grace: int = 0, delta: float = 0.0) -> int:
+        """一次pipeline保存多个缓存键（含ETag旁路键），返回保存的键数"""
         try:
-            self.redis_client.setex(cache_key, ttl, json.dumps(data, default=str))
-            logger.info(f"✅ 数据已缓存到Redis: {cache_key}, TTL: {ttl}s")
+            hard_ttl = cache_envelope.hard_ttl(ttl, stale_grace)
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for cache_key, data in entries.items():
+                etag = http_cache.value_etag(data)
+                pipe.setex(cache_key, hard_ttl, cache_envelope.wrap(data, ttl, delta, now=now, etag=etag))
+                pipe.setex(http_cache.etag_key(cache_key), hard_ttl, http_cache.etag_marker(etag, now + ttl))
+            pipe.execute()
+            logger.info(f"✅ 批量缓存到Redis: {len(entries)}个键, TTL: {ttl}s (hard {hard_ttl}s)")
+            return len(entries)
+        except Exception as e:
+            logger.error(f"批量保存到Redis失败: {e}")
+            return 0
+
+    def save_to_redis(self, cache_key: str, data: Dict, ttl: int, stale_grace: int = 0, delta: float = 0.0) -> Optional[str]:
+        """保存数据到Redis缓存，返回数据的ETag
+
+        ttl 为软TTL；key 在软TTL + stale_grace 后才真正过期，delta 为本次加载耗时（用于XFetch）
+        ETag 同时写入旁路键，条件请求无需读取数据即可判断是否变化
+        """
+        try:
+            hard_ttl = cache_envelope.hard_ttl(ttl, stale_grace)
+            etag = http_cache.value_etag(data)
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(cache_key, hard_ttl, cache_envelope.wrap(data, ttl, delta, now=now, etag=etag))
+            pipe.setex(http_cache.etag_key(cache_key), hard_ttl, http_cache.etag_marker(etag, now + ttl))
+            pipe.execute()
+            logger.info(f"✅ 数据已缓存到Redis: {cache_key}, TTL: {ttl}s (hard {hard_ttl}s)")
+            return etag
         except Exception as e:
             logger.error(f"保存到Redis失败: {cache_key}, {e}")
+            return None
+
+    def get_etags(self, cache_keys: List[str]) -> List[Optional[Tuple[str, float]]]:
+        """一次MGET读取多个缓存键的 (ETag, 软过期时间戳)，不读取数据本身"""
+        try:
+            markers = self.redis_client.mget([http_cache.etag_key(key) for key in cache_keys])
+        except Exception as e:
+            logger.error(f"读取ETag失败: {e}")
+            return [None] * len(cache_keys)
+        return [http_cache.parse_etag_marker(marker) for marker in markers]
 
     def get_data(self, data_type: str, stock_code: str, **kwargs) -> Dict:
         """三层架构数据获取主函数"""
         cache_key = self.get_cache_key(data_type, stock_code, **kwargs)
 
-        # 1. 首先从Redis获取
-        redis_result = self.get_from_redis(cache_key)
-        if redis_result:
+        # 1. 首先从Redis获取；软过期或XFetch提前刷新时返回旧值并后台刷新
+        entry = self.get_entry_from_redis(cache_key)
+        if entry and entry.value:
+            state = cache_envelope.evaluate(entry, self.xfetch_beta.get(data_type, 1.0))
+            if state != cache_envelope.FRESH:
+                self._schedule_refresh(data_type, stock_code, cache_key, **kwargs)
             return {
-                "data": redis_result,
+                "data": entry.value,
                 "source": "redis",
-                "cache_info": "hit"
+                "etag": entry.etag,
+                "cache_info": {
+                    cache_envelope.FRESH: "hit",
+                    cache_envelope.EARLY_REFRESH: "hit_early_refresh",
+                    cache_envelope.STALE: "stale_revalidating"
+                }[state]
             }
 
+        # 2/3. 缓存未命中：同一键只允许一个加载者穿透到PostgreSQL/AKShare
+        result, shared = self.single_flight.do(
+            cache_key,
+            lambda: self._load_with_lock(data_type, stock_code, cache_key, **kwargs)
+        )
+        result = dict(result)
+        if shared:
+            result["cache_info"] = f"{result['cache_info']}_coalesced"
+        return result
+
+    def _load_with_lock(self, data_type: str, stock_code: str, cache_key: str, **kwargs) -> Dict:
+        """跨进程合并（可选）后执行穿透加载"""
+        if self.redis_single_flight is None:
+            return self._load_through(data_type, stock_code, cache_key, **kwargs)
+
+        result, waited = self.redis_single_flight.do(
+            cache_key,
+            lambda: self._load_through(data_type, stock_code, cache_key, **kwargs),
+            lambda: self.get_from_redis(cache_key)
+        )
+        if waited:
+            return {
+                "data": result,
+                "source": "redis",
+                "cache_info": "hit_after_wait"
+            }
+        return result
+
+    def refresh_from_akshare(self, data_type: str, stock_code: str, **kwargs) -> Dict:
+        """跳过PostgreSQL直接从AKShare刷新并回写数据库和缓存（批处理发现数据库数据已过期时使用）"""
+        cache_key = self.get_cache_key(data_type, stock_code, **kwargs)
+
+        def load():
+            start_time = time.time()
+            akshare_result = self.get_from_akshare(data_type, stock_code, **kwargs)
+            if not akshare_result:
+                return {"data": None, "source": "none", "cache_info": "failed"}
+            self.save_to_postgresql(data_type, stock_code, akshare_result["data"])
+            etag = self.save_to_redis(
+                cache_key, akshare_result["data"], self.cache_ttl.get(data_type, 300),
+                self.stale_grace.get(data_type, 0), time.time() - start_time
+            )
+            return {"data": akshare_result["data"], "source": "akshare", "etag": etag, "cache_info": "refreshed"}
+
+        result, _ = self.single_flight.do(cache_key, load)
+        return dict(result)
+
+    def _schedule_refresh(self, data_type: str, stock_code: str, cache_key: str, **kwargs):
+        """后台刷新缓存，同一键同时只有一个刷新任务"""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                self.single_flight.do(
+                    cache_key,
+                    lambda: self._load_through(data_type, stock_code, cache_key, **kwargs)
+                )
+            except Exception as e:
+                logger.error(f"后台刷新缓存失败: {cache_key}, {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
+        self.refresh_executor.submit(refresh)
+
+    def _load_through(self, data_type: str, stock_code: str, cache_key: str, **kwargs) -> Dict:
+        """PostgreSQL → AKShare 穿透加载并回写缓存"""
+        start_time = time.time()
+        ttl = self.cache_ttl.get(data_type, 300)
+        stale_grace = self.stale_grace.get(data_type, 0)
+
         # 2. 从PostgreSQL获取
         pg_result = self.get_from_postgresql(data_type, stock_code, **kwargs)
         if pg_result:
             # 缓存到Redis
-            ttl = self.cache_ttl.get(data_type, 300)
-            self.save_to_redis(cache_key, pg_result["data"], ttl)
+            etag = self.save_to_redis(cache_key, pg_result["data"], ttl, stale_grace, time.time() - start_time)
 
             return {
                 "data": pg_result["data"],
                 "source": "postgresql",
+                "etag": etag,
                 "cache_info": "miss_cached"
             }
 
@@ -624,12 +901,12 @@ class ThreeTierDataService:
             self.save_to_postgresql(data_type, stock_code, akshare_result["data"])
 
             # 缓存到Redis
-            ttl = self.cache_ttl.get(data_type, 300)
-            self.save_to_redis(cache_key, akshare_result["data"], ttl)
+            etag = self.save_to_redis(cache_key, akshare_result["data"], ttl, stale_grace, time.time() - start_time)
 
             return {
                 "data": akshare_result["data"],
                 "source": "akshare",
+                "etag": etag,
                 "cache_info": "fetched_cached"
             }
 
@@ -640,13 +917,24 @@ class ThreeTierDataService:
             "cache_info": "failed"
         }
 
+    def stampede_stats(self) -> Dict:
+        """缓存击穿合并统计"""
+        return {
+            "in_process": self.single_flight.stats(),
+            "cross_process": self.redis_single_flight.stats() if self.redis_single_flight else None
+        }
+
 # FastAPI应用
 app = FastAPI(
     title="增强版Dashboard API - 三层架构",
     version="2.0.0",
-    description="Redis → PostgreSQL → AKShare 三层查询架构"
+    description="Redis → PostgreSQL → AKShare 三层查询架构",
+    default_response_class=FastJSONResponse
 )
 
+app.add_middleware(MetricsMiddleware)
+# 三层服务的 PostgreSQL 连接池只在本进程中使用，饱和度随 /metrics 导出
+register_pg_pool_stats(pg_pool_stats)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -658,12 +946,87 @@ app.add_middleware(
 # 初始化数据服务
 data_service = ThreeTierDataService()
 
+# Dashboard各数据类型在线程池中并发获取（Redis/psycopg2/AKShare均为阻塞调用）
+dashboard_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="dashboard")
+
+async def fetch_data_type(data_type: str, stock_code: str, **kwargs) -> Dict:
+    """在超时预算内获取单个数据类型，超时或异常时返回对应状态"""
+    timeout = data_service.fetch_timeout.get(data_type, data_service.default_fetch_timeout)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        dashboard_executor,
+        functools.partial(data_service.get_data, data_type, stock_code, **kwargs)
+    )
+    start = time.perf_counter()
+    try:
+        # 超时后后台线程继续执行并写入缓存，下一次请求可直接命中
+        result = await asyncio.wait_for(future, timeout=timeout)
+        result["status"] = "ok" if result["data"] else "empty"
+    except asyncio.TimeoutError:
+        logger.warning(f"数据获取超时: {data_type}, {stock_code}, 预算 {timeout}s")
+        result = {"data": None, "source": "none", "cache_info": "timeout", "status": "timeout"}
+    except Exception as e:
+        logger.error(f"数据获取异常: {data_type}, {stock_code}, {e}")
+        result = {"data": None, "source": "none", "cache_info": "failed", "status": "error"}
+
+    DATA_TYPE_LATENCY.labels(data_type=data_type, status=result["status"]).observe(time.perf_counter() - start)
+    return result
+
+def dashboard_requests(request: DashboardRequest) -> List[Tuple[str, Dict]]:
+    """请求中的各数据类型（去重）及其查询参数"""
+    requests = []
+    for data_type in dict.fromkeys(request.data_types):
+        kwargs = {}
+        if data_type == "kline":
+            kwargs["days"] = request.kline_days
+        elif data_type == "news":
+            kwargs["days"] = request.news_days
+        elif data_type == "technical":
+            kwargs["days"] = request.kline_days
+        requests.append((data_type, kwargs))
+    return requests
+
+async def dashboard_etag(stock_code: str, type_requests: List[Tuple[str, Dict]]) -> Optional[str]:
+    """
+    只读ETag旁路键计算Dashboard的组合ETag，任一数据类型未缓存时返回None
+    响应体还含时间戳、数据来源等请求级字段，组合ETag只代表数据，因此为弱ETag
+    软过期的数据类型在后台刷新，与读取数据时的行为一致
+    """
+    cache_keys = [data_service.get_cache_key(data_type, stock_code, **kwargs) for data_type, kwargs in type_requests]
+    loop = asyncio.get_running_loop()
+    markers = await loop.run_in_executor(dashboard_executor, data_service.get_etags, cache_keys)
+    if not all(markers):
+        return None
+
+    now = time.time()
+    for (data_type, kwargs), cache_key, (_, soft_expires_at) in zip(type_requests, cache_keys, markers):
+        if now >= soft_expires_at:
+            data_service._schedule_refresh(data_type, stock_code, cache_key, **kwargs)
+    return http_cache.weak_etag(
+        http_cache.combine_etags(f"{key}={etag}" for key, (etag, _) in zip(cache_keys, markers))
+    )
+
 @app.post("/api/v1/stocks/dashboard", response_model=DashboardResponse)
-async def get_enhanced_dashboard_data(request: DashboardRequest):
-    """增强版Dashboard API - 严格遵循三层架构"""
+async def get_enhanced_dashboard_data(request: DashboardRequest, http_request: Request):
+    """增强版Dashboard API - 严格遵循三层架构
+
+    响应带组合弱ETag；数据未变化时只读取ETag旁路键直接返回304，
+    其余情况按本次请求生成响应体（时间戳、数据来源随请求变化，不复用缓存的响应体）
+    """
     logger.info(f"增强Dashboard请求: {request.stock_code}, 数据类型: {request.data_types}")
 
     start_time = time.time()
+    type_requests = dashboard_requests(request)
+    if_none_match = http_request.headers.get("if-none-match")
+
+    if settings.http_etag_enabled:
+        etag = await dashboard_etag(request.stock_code, type_requests)
+        if etag is not None:
+            response = http_cache.not_modified(if_none_match, etag)
+            if response is not None:
+                logger.info(f"Dashboard未变化: {request.stock_code}")
+                return response
+
     results = {}
     data_sources = {
         "redis": [],
@@ -671,38 +1034,58 @@ async def get_enhanced_dashboard_data(request: DashboardRequest):
         "akshare": []
     }
     cache_info = {}
+    type_status = {}
+    etag_parts = []
 
-    # 并行获取不同类型数据
-    for data_type in request.data_types:
-        kwargs = {}
-        if data_type == "kline":
-            kwargs["days"] = request.kline_days
-        elif data_type == "news":
-            kwargs["days"] = request.news_days
-
-        result = data_service.get_data(data_type, request.stock_code, **kwargs)
+    # 并行获取不同类型数据，总耗时取决于最慢的数据源
+    tasks = [
+        fetch_data_type(data_type, request.stock_code, **kwargs)
+        for data_type, kwargs in type_requests
+    ]
 
+    for (data_type, kwargs), result in zip(type_requests, await asyncio.gather(*tasks)):
+        type_status[data_type] = result["status"]
         if result["data"]:
             results[data_type] = result["data"]
             data_sources[result["source"]].append(data_type)
             cache_info[data_type] = result["cache_info"]
         else:
             results[data_type] = None
-            cache_info[data_type] = "failed"
+            cache_info[data_type] = result["cache_info"]
+        if result.get("etag"):
+            cache_key = data_service.get_cache_key(data_type, request.stock_code, **kwargs)
+            etag_parts.append(f"{cache_key}={result['etag']}")
 
     end_time = time.time()
     response_time = end_time - start_time
 
     logger.info(f"Dashboard响应完成: {request.stock_code}, 耗时: {response_time:.2f}s")
 
-    return DashboardResponse(
+    response = DashboardResponse(
         success=True,
         stock_code=request.stock_code,
         timestamp=datetime.now(),
         data_sources=data_sources,
         cache_info=cache_info,
+        type_status=type_status,
         data=results
     )
+    # 所有数据类型都来自缓存值时才有确定的ETag
+    if not settings.http_etag_enabled or len(etag_parts) != len(type_requests):
+        return response
+    return http_cache.etag_response(
+        if_none_match, serializer.dumps(response.dict()), http_cache.weak_etag(http_cache.combine_etags(etag_parts))
+    )
+
+@app.get("/api/v1/stocks/cache/stampede")
+async def get_stampede_stats():
+    """缓存击穿合并统计：节省的PostgreSQL/AKShare加载次数"""
+    return data_service.stampede_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus指标"""
+    return metrics_response()
 
 @app.get("/")
 async def root():
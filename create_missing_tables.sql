@@ -67,11 +67,39 @@ CREATE TABLE IF NOT EXISTS stock_ai_analysis (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 6. 技术指标表 (与 stock_kline_daily 按 stock_code + trade_date 对应，由 app/services/indicator_store.py 维护)
+-- state 只保存在每只股票最新一行，是增量计算所需的 EMA/SMA 递推状态
+CREATE TABLE IF NOT EXISTS stock_technical_indicators (
+    stock_code VARCHAR(10) NOT NULL,
+    trade_date DATE NOT NULL,
+    ma5 DOUBLE PRECISION,
+    ma10 DOUBLE PRECISION,
+    ma20 DOUBLE PRECISION,
+    ma60 DOUBLE PRECISION,
+    macd_dif DOUBLE PRECISION,
+    macd_dea DOUBLE PRECISION,
+    macd_hist DOUBLE PRECISION,
+    rsi6 DOUBLE PRECISION,
+    rsi12 DOUBLE PRECISION,
+    rsi24 DOUBLE PRECISION,
+    kdj_k DOUBLE PRECISION,
+    kdj_d DOUBLE PRECISION,
+    kdj_j DOUBLE PRECISION,
+    boll_upper DOUBLE PRECISION,
+    boll_mid DOUBLE PRECISION,
+    boll_lower DOUBLE PRECISION,
+    state JSONB,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (stock_code, trade_date)
+);
+
 -- 创建索引以提高查询性能
 CREATE INDEX IF NOT EXISTS idx_stock_kline_daily_code_date ON stock_kline_daily(stock_code, trade_date DESC);
 CREATE INDEX IF NOT EXISTS idx_stock_news_code_time ON stock_news(stock_code, publish_time DESC);
 CREATE INDEX IF NOT EXISTS idx_stock_realtime_code_date ON stock_realtime(stock_code, trade_date DESC);
 CREATE INDEX IF NOT EXISTS idx_stock_ai_analysis_code ON stock_ai_analysis(stock_code, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_stock_technical_code_date ON stock_technical_indicators(stock_code, trade_date DESC);
+CREATE INDEX IF NOT EXISTS idx_stock_technical_state ON stock_technical_indicators(stock_code) WHERE state IS NOT NULL;
 
 -- 添加TimescaleDB超表优化（如果已安装TimescaleDB扩展）
 -- 这些语句在TimescaleDB不可用时会失败，但不影响基本功能
@@ -101,4 +129,4 @@ END $$;
 SELECT 'Tables created successfully. Current table count: ' || count(*) as status
 FROM information_schema.tables
 WHERE table_schema = 'public'
-AND table_name IN ('stock_basic_info', 'stock_kline_daily', 'stock_news', 'stock_realtime', 'stock_ai_analysis');
\ No newline at end of file
+AND table_name IN ('stock_basic_info', 'stock_kline_daily', 'stock_news', 'stock_realtime', 'stock_ai_analysis', 'stock_technical_indicators');
\ No newline at end of file
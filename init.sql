@@ -4,6 +4,9 @@
 -- 启用 TimescaleDB 扩展
 CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE;
 
+-- 启用 pg_trgm 扩展（股票代码/名称模糊搜索）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- 股票基础信息表
 CREATE TABLE IF NOT EXISTS stocks (
     code VARCHAR(10) PRIMARY KEY,
@@ -118,6 +121,9 @@ CREATE TABLE IF NOT EXISTS ai_analysis_results (
 -- 创建索引以提高查询性能
 CREATE INDEX IF NOT EXISTS idx_stocks_market ON stocks(market);
 CREATE INDEX IF NOT EXISTS idx_stocks_industry ON stocks(industry);
+CREATE INDEX IF NOT EXISTS idx_stocks_code_trgm ON stocks USING gin (code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_stocks_name_trgm ON stocks USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_stocks_updated_at ON stocks(updated_at);
 CREATE INDEX IF NOT EXISTS idx_ohlcv_stock_period ON ohlcv_data(stock_code, period);
 CREATE INDEX IF NOT EXISTS idx_announcements_stock ON company_announcements(stock_code);
 CREATE INDEX IF NOT EXISTS idx_announcements_date ON company_announcements(publish_date);
@@ -37,11 +37,82 @@ from mcp.types import (
 from config import config
 from logger import get_realtime_data_logger, log_mcp_call
 from api_client import akshare_client
+from database import data_manager
 
 # Initialize server and logger
 server = Server("realtime-data-mcp")
 logger = get_realtime_data_logger()
 
+
+def _fmt(value: Optional[float], unit: str = "") -> str:
+    """Format an indicator value, N/A when it is not available yet (e.g. MA60 on a new listing)"""
+    return "N/A" if value is None else f"{float(value):.2f}{unit}"
+
+
+def _cross(latest: Dict[str, Any], previous: Optional[Dict[str, Any]], fast: str, slow: str) -> str:
+    """Golden/death cross of two indicator lines between the previous and the latest bar"""
+    if not previous or None in (latest.get(fast), latest.get(slow), previous.get(fast), previous.get(slow)):
+        return ""
+    before = float(previous[fast]) - float(previous[slow])
+    after = float(latest[fast]) - float(latest[slow])
+    if before <= 0 < after:
+        return " (金叉)"
+    if before >= 0 > after:
+        return " (死叉)"
+    return ""
+
+
+def format_technical_indicators(rows: List[Dict[str, Any]], indicators: List[str]) -> List[str]:
+    """Format precomputed indicator rows (latest first) from stock_technical_indicators"""
+    latest = rows[0]
+    previous = rows[1] if len(rows) > 1 else None
+    lines = []
+    if "ma" in indicators:
+        lines.append(
+            f"MA5: {_fmt(latest.get('ma5'), '元')}, MA10: {_fmt(latest.get('ma10'), '元')}, "
+            f"MA20: {_fmt(latest.get('ma20'), '元')}, MA60: {_fmt(latest.get('ma60'), '元')}"
+        )
+    if "rsi" in indicators:
+        rsi6 = latest.get("rsi6")
+        zone = ""
+        if rsi6 is not None:
+            zone = " (超买区间)" if rsi6 >= 80 else " (超卖区间)" if rsi6 <= 20 else ""
+        lines.append(
+            f"RSI6: {_fmt(rsi6)}, RSI12: {_fmt(latest.get('rsi12'))}, RSI24: {_fmt(latest.get('rsi24'))}{zone}"
+        )
+    if "macd" in indicators:
+        lines.append(
+            f"MACD: DIF: {_fmt(latest.get('macd_dif'))}, DEA: {_fmt(latest.get('macd_dea'))}, "
+            f"MACD柱: {_fmt(latest.get('macd_hist'))}{_cross(latest, previous, 'macd_dif', 'macd_dea')}"
+        )
+    if "kdj" in indicators:
+        kdj_j = latest.get("kdj_j")
+        zone = ""
+        if kdj_j is not None:
+            zone = " (超买区间)" if kdj_j > 100 else " (超卖区间)" if kdj_j < 0 else ""
+        lines.append(
+            f"KDJ: K: {_fmt(latest.get('kdj_k'))}, D: {_fmt(latest.get('kdj_d'))}, J: {_fmt(kdj_j)}"
+            f"{_cross(latest, previous, 'kdj_k', 'kdj_d') or zone}"
+        )
+    if "boll" in indicators:
+        lines.append(
+            f"BOLL: 上轨: {_fmt(latest.get('boll_upper'), '元')}, 中轨: {_fmt(latest.get('boll_mid'), '元')}, "
+            f"下轨: {_fmt(latest.get('boll_lower'), '元')}"
+        )
+    return lines
+
+
+def technical_trend(latest: Dict[str, Any]) -> str:
+    """Trend from the moving average alignment"""
+    ma5, ma10, ma20 = (latest.get(key) for key in ("ma5", "ma10", "ma20"))
+    if None in (ma5, ma10, ma20):
+        return "数据不足"
+    if ma5 > ma10 > ma20:
+        return "均线多头排列"
+    if ma5 < ma10 < ma20:
+        return "均线空头排列"
+    return "均线交织震荡"
+
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available real-time data tools"""
@@ -229,31 +300,32 @@ async def handle_call_tool(name: str, arguments: dict) -> List[TextContent]:
             stock_code = arguments.get("stock_code", "")
             indicators = arguments.get("indicators", ["ma", "rsi"])
 
-            # Mock technical indicators
-            indicator_text = []
-            if "ma" in indicators:
-                indicator_text.append("MA5: 45.2元, MA10: 44.8元, MA20: 43.9元")
-            if "rsi" in indicators:
-                indicator_text.append("RSI(14): 65.8 (偏强势区间)")
-            if "macd" in indicators:
-                indicator_text.append("MACD: DIF: 0.52, DEA: 0.31, MACD柱: 0.42 (金叉)")
-            if "kdj" in indicators:
-                indicator_text.append("KDJ: K: 78.2, D: 72.1, J: 90.4 (超买区间)")
-            if "boll" in indicators:
-                indicator_text.append("BOLL: 上轨: 47.8元, 中轨: 45.1元, 下轨: 42.4元")
+            # Indicators are precomputed from stored daily K-lines by the backend engine, this is a lookup
+            technical_data = await data_manager.get_stock_data(stock_code, "technical")
+
+            if not technical_data or not technical_data["data"]:
+                response = f"""📊 {stock_code} 技术指标分析
+
+⚠️ 暂无该股票的预计算技术指标
+💡 技术指标由已入库的日K线计算，请先通过Dashboard或批处理同步该股票的K线数据"""
+                log_mcp_call(logger, name, arguments, {"indicators": indicators, "found": False})
+                return [TextContent(type="text", text=response)]
+
+            rows = technical_data["data"]
+            latest = rows[0]
+            indicator_text = format_technical_indicators(rows, indicators)
 
             response = f"""📊 {stock_code} 技术指标分析
 
 {chr(10).join(f'• {text}' for text in indicator_text)}
 
 📈 技术面总结:
-• 趋势状态: 上升趋势中
-• 支撑位: 42.4元 (布林下轨)
-• 阻力位: 47.8元 (布林上轨)
-• 操作建议: 技术面偏多，但注意RSI超买信号
+• 趋势状态: {technical_trend(latest)}
+• 支撑位: {_fmt(latest.get('boll_lower'), '元')} (布林下轨)
+• 阻力位: {_fmt(latest.get('boll_upper'), '元')} (布林上轨)
 
 ⚠️ 技术分析仅供参考，投资需谨慎
-📍 指标计算基于最新市场数据"""
+📍 指标日期: {latest.get('trade_date', '最新')} | 数据源: {technical_data.get('source', 'Cache/Database')}"""
 
             log_mcp_call(logger, name, arguments, {"indicators": indicators})
             return [TextContent(type="text", text=response)]
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+AKShare rate limit definitions shared with the backend
+
+The token bucket script, Redis keys and default quotas are defined once in
+backend/app/core/akshare_quota.py (standard library only); this module loads that
+file by path so the MCP servers and the backend cannot drift apart.
+"""
+
+import importlib.util
+import os
+
+_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       "..", "..", "backend", "app", "core", "akshare_quota.py")
+
+_spec = importlib.util.spec_from_file_location("prism2_akshare_quota", _SOURCE)
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+KEY_PREFIX = _module.KEY_PREFIX
+GLOBAL_BUCKET = _module.GLOBAL_BUCKET
+TOKEN_BUCKET_SCRIPT = _module.TOKEN_BUCKET_SCRIPT
+DEFAULT_QUOTA = _module.DEFAULT_QUOTA
+GLOBAL_QUOTA = _module.GLOBAL_QUOTA
+ENDPOINT_QUOTAS = _module.ENDPOINT_QUOTAS
+quotas_from_env = _module.quotas_from_env
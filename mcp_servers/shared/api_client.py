@@ -10,6 +10,8 @@ import akshare as ak
 from typing import Dict, Any, Optional, List
 from config import config
 from logger import get_logger
+from market_snapshot import market_snapshot
+from rate_limiter import akshare_limiter
 import time
 
 logger = get_logger("APIClient")
@@ -133,38 +135,12 @@ class AKShareClient:
     def get_realtime_price(self, stock_code: str) -> Dict[str, Any]:
         """Get real-time stock price from AKShare"""
         try:
-            # Convert stock code format for AKShare
-            if stock_code.startswith('6'):
-                symbol = f"{stock_code}.SH"
-            elif stock_code.startswith('0') or stock_code.startswith('3'):
-                symbol = f"{stock_code}.SZ"
-            elif stock_code.startswith('688') or stock_code.startswith('689'):
-                symbol = f"{stock_code}.SH"
-            else:
-                symbol = stock_code
-
-            # Get real-time data
-            df = ak.stock_zh_a_spot_em()
-            stock_data = df[df['代码'] == stock_code]
+            row = market_snapshot.get(stock_code)
 
-            if not stock_data.empty:
-                row = stock_data.iloc[0]
+            if row is not None:
                 result = {
                     "success": True,
-                    "data": {
-                        "code": stock_code,
-                        "name": row['名称'],
-                        "current_price": row['最新价'],
-                        "change_percent": row['涨跌幅'],
-                        "change_amount": row['涨跌额'],
-                        "volume": row['成交量'],
-                        "turnover": row['成交额'],
-                        "high": row['最高'],
-                        "low": row['最低'],
-                        "open": row['今开'],
-                        "yesterday_close": row['昨收'],
-                        "timestamp": time.time()
-                    },
+                    "data": row,
                     "source": "akshare_realtime"
                 }
                 logger.info(f"AKShare real-time data success for {stock_code}")
@@ -189,7 +165,8 @@ class AKShareClient:
         """Get historical stock data from AKShare"""
         try:
             # Get historical data
-            df = ak.stock_zh_a_hist(
+            df = akshare_limiter.call(
+                ak.stock_zh_a_hist,
                 symbol=stock_code,
                 period=period,
                 adjust=adjust,
@@ -244,7 +221,7 @@ class AKShareClient:
         """Get financial data from AKShare"""
         try:
             # Get financial data
-            df = ak.stock_financial_hk_report_em(symbol=stock_code)
+            df = akshare_limiter.call(ak.stock_financial_hk_report_em, symbol=stock_code)
 
             if not df.empty:
                 # Convert to list of dictionaries
@@ -4,10 +4,12 @@ Shared configuration management for 4MCP architecture
 """
 
 import os
-from dataclasses import dataclass
-from typing import Dict, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from akshare_quota import DEFAULT_QUOTA, ENDPOINT_QUOTAS, GLOBAL_QUOTA, quotas_from_env
+
 # Load environment variables
 load_dotenv()
 
@@ -24,6 +26,7 @@ class DatabaseConfig:
     redis_port: int = 6379
     redis_db: int = 0
     redis_password: Optional[str] = None
+    redis_max_connections: int = 32
 
     chromadb_host: str = "localhost"
     chromadb_port: int = 8003
@@ -48,6 +51,14 @@ class ExternalAPIConfig:
     enhanced_dashboard_url: str = "http://localhost:8081"
     rag_service_url: str = "http://localhost:8003"
     akshare_timeout: int = 10
+    realtime_snapshot_interval: int = 10
+
+    # AKShare rate limits shared with the backend: [calls per minute, burst];
+    # defaults and env keys come from backend/app/core/akshare_quota.py
+    rate_limit_redis_db: int = 2
+    akshare_rate_limit_default: List[float] = field(default_factory=lambda: list(DEFAULT_QUOTA))
+    akshare_rate_limit_global: List[float] = field(default_factory=lambda: list(GLOBAL_QUOTA))
+    akshare_rate_limits: Dict[str, List[float]] = field(default_factory=lambda: dict(ENDPOINT_QUOTAS))
 
     # Claude API configuration
     anthropic_api_key: str = ""
@@ -79,6 +90,7 @@ def load_config() -> Prism2Config:
         redis_port=int(os.getenv("REDIS_PORT", "6379")),
         redis_db=int(os.getenv("REDIS_DB", "0")),
         redis_password=os.getenv("REDIS_PASSWORD"),
+        redis_max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "32")),
 
         chromadb_host=os.getenv("CHROMADB_HOST", "localhost"),
         chromadb_port=int(os.getenv("CHROMADB_PORT", "8003"))
@@ -96,10 +108,17 @@ def load_config() -> Prism2Config:
         retry_delay=float(os.getenv("RETRY_DELAY", "1.0"))
     )
 
+    # Same JSON env keys as the backend settings (AKSHARE_RATE_LIMITS, ...)
+    akshare_rate_limits, akshare_rate_limit_default, akshare_rate_limit_global = quotas_from_env()
     external_api_config = ExternalAPIConfig(
         enhanced_dashboard_url=os.getenv("ENHANCED_DASHBOARD_URL", "http://localhost:8081"),
         rag_service_url=os.getenv("RAG_SERVICE_URL", "http://localhost:8003"),
         akshare_timeout=int(os.getenv("AKSHARE_TIMEOUT", "10")),
+        realtime_snapshot_interval=int(os.getenv("REALTIME_SNAPSHOT_INTERVAL", "10")),
+        rate_limit_redis_db=int(os.getenv("RATE_LIMIT_REDIS_DB", "2")),
+        akshare_rate_limits=akshare_rate_limits,
+        akshare_rate_limit_default=akshare_rate_limit_default,
+        akshare_rate_limit_global=akshare_rate_limit_global,
 
         anthropic_api_key=os.getenv("ANTHROPIC_API_KEY", ""),
         claude_model=os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20241022")
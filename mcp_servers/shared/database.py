@@ -5,12 +5,13 @@ Shared database connection utilities for 4MCP architecture
 
 import asyncio
 import redis
+import redis.asyncio as aioredis
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import json
 from config import config
 from logger import get_logger
@@ -18,36 +19,55 @@ from logger import get_logger
 logger = get_logger("Database")
 
 class RedisConnection:
-    """Redis connection manager"""
+    """Redis connection manager with explicit shared connection pools
 
-    def __init__(self):
-        self.redis_client: Optional[redis.Redis] = None
-
-    def get_sync_client(self) -> redis.Redis:
-        """Get synchronous Redis client"""
-        if self.redis_client is None:
-            self.redis_client = redis.Redis(
-                host=config.database.redis_host,
-                port=config.database.redis_port,
-                db=config.database.redis_db,
-                password=config.database.redis_password,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                retry_on_timeout=True
-            )
-        return self.redis_client
+    One pool per (db, decode_responses) for sync clients and one for native
+    asyncio clients, so every MCP service reuses the same connections instead
+    of wrapping sync calls in run_in_executor.
+    """
 
-    async def get_async_client(self) -> redis.Redis:
-        """Get Redis client for async operations (using sync client in executor)"""
-        return self.get_sync_client()
+    def __init__(self):
+        self._sync_pools: Dict[Tuple[int, bool], redis.BlockingConnectionPool] = {}
+        self._async_pools: Dict[Tuple[int, bool], aioredis.BlockingConnectionPool] = {}
+
+    def _pool_options(self, db: Optional[int], decode_responses: bool) -> Dict[str, Any]:
+        return {
+            "host": config.database.redis_host,
+            "port": config.database.redis_port,
+            "db": config.database.redis_db if db is None else db,
+            "password": config.database.redis_password,
+            "decode_responses": decode_responses,
+            "max_connections": config.database.redis_max_connections,
+            "timeout": 5,
+            "socket_timeout": 5,
+            "socket_connect_timeout": 5,
+            "retry_on_timeout": True,
+            "health_check_interval": 30
+        }
+
+    def get_sync_client(self, db: Optional[int] = None, decode_responses: bool = True) -> redis.Redis:
+        """Get synchronous Redis client on the shared pool"""
+        key = (config.database.redis_db if db is None else db, decode_responses)
+        pool = self._sync_pools.get(key)
+        if pool is None:
+            pool = redis.BlockingConnectionPool(**self._pool_options(db, decode_responses))
+            self._sync_pools[key] = pool
+        return redis.Redis(connection_pool=pool)
+
+    async def get_async_client(self, db: Optional[int] = None, decode_responses: bool = True) -> aioredis.Redis:
+        """Get native asyncio Redis client on the shared pool"""
+        key = (config.database.redis_db if db is None else db, decode_responses)
+        pool = self._async_pools.get(key)
+        if pool is None:
+            pool = aioredis.BlockingConnectionPool(**self._pool_options(db, decode_responses))
+            self._async_pools[key] = pool
+        return aioredis.Redis(connection_pool=pool)
 
     async def get_cached_data(self, key: str) -> Optional[Dict[str, Any]]:
         """Get cached data from Redis"""
         try:
             client = await self.get_async_client()
-            loop = asyncio.get_event_loop()
-            cached_data = await loop.run_in_executor(None, client.get, key)
+            cached_data = await client.get(key)
             if cached_data:
                 return json.loads(cached_data)
             return None
@@ -55,30 +75,65 @@ class RedisConnection:
             logger.error(f"Redis get error for key {key}: {e}")
             return None
 
+    async def get_many_cached_data(self, keys: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get several cached entries with a single MGET"""
+        if not keys:
+            return {}
+        try:
+            client = await self.get_async_client()
+            values = await client.mget(keys)
+            return {key: json.loads(value) if value else None for key, value in zip(keys, values)}
+        except Exception as e:
+            logger.error(f"Redis mget error for {len(keys)} keys: {e}")
+            return {key: None for key in keys}
+
     async def set_cached_data(self, key: str, data: Dict[str, Any], ttl: int = 300) -> bool:
         """Set cached data in Redis with TTL"""
         try:
             client = await self.get_async_client()
-            json_data = json.dumps(data, ensure_ascii=False)
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, client.set, key, json_data, ttl)
+            json_data = json.dumps(data, ensure_ascii=False, default=str)
+            await client.set(key, json_data, ex=ttl)
             logger.info(f"Cached data for key {key} with TTL {ttl}s")
             return True
         except Exception as e:
             logger.error(f"Redis set error for key {key}: {e}")
             return False
 
+    async def set_many_cached_data(self, items: Dict[str, Dict[str, Any]], ttl: int = 300) -> bool:
+        """Set several cached entries in one pipeline round trip"""
+        if not items:
+            return True
+        try:
+            client = await self.get_async_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for key, data in items.items():
+                    pipe.set(key, json.dumps(data, ensure_ascii=False, default=str), ex=ttl)
+                await pipe.execute()
+            logger.info(f"Cached {len(items)} keys with TTL {ttl}s")
+            return True
+        except Exception as e:
+            logger.error(f"Redis pipeline set error for {len(items)} keys: {e}")
+            return False
+
     async def delete_cached_data(self, key: str) -> bool:
         """Delete cached data from Redis"""
         try:
             client = await self.get_async_client()
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, client.delete, key)
+            result = await client.delete(key)
             return result > 0
         except Exception as e:
             logger.error(f"Redis delete error for key {key}: {e}")
             return False
 
+    async def close(self):
+        """Disconnect all pools"""
+        for pool in self._async_pools.values():
+            await pool.disconnect()
+        for pool in self._sync_pools.values():
+            pool.disconnect()
+        self._async_pools.clear()
+        self._sync_pools.clear()
+
 class PostgreSQLConnection:
     """PostgreSQL connection manager"""
 
@@ -161,7 +216,8 @@ class DataManager:
     """Combined data manager for Redis and PostgreSQL"""
 
     def __init__(self):
-        self.redis = RedisConnection()
+        # Share the module-level pools with every other user of redis_conn
+        self.redis = redis_conn
         self.postgres = PostgreSQLConnection()
 
     async def get_stock_data(self, stock_code: str, data_type: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
@@ -204,6 +260,18 @@ class DataManager:
                     ORDER BY report_date DESC
                     LIMIT 10
                 """
+            elif data_type == "technical":
+                # Precomputed by the backend indicator engine; latest two bars for crossover checks
+                query = """
+                    SELECT stock_code, trade_date::text AS trade_date,
+                           ma5, ma10, ma20, ma60, macd_dif, macd_dea, macd_hist,
+                           rsi6, rsi12, rsi24, kdj_k, kdj_d, kdj_j,
+                           boll_upper, boll_mid, boll_lower
+                    FROM stock_technical_indicators
+                    WHERE stock_code = :stock_code
+                    ORDER BY trade_date DESC
+                    LIMIT 2
+                """
             else:
                 logger.warning(f"Unknown data type: {data_type}")
                 return None
@@ -222,7 +290,7 @@ class DataManager:
                 }
 
                 # Cache the result
-                ttl = 300 if data_type == "kline" else 3600  # 5min for kline, 1hr for others
+                ttl = 300 if data_type in ("kline", "technical") else 3600  # 5min for kline/technical, 1hr for others
                 await self.redis.set_cached_data(cache_key, data, ttl)
 
                 logger.info(f"Retrieved {len(results)} records for {stock_code}:{data_type} from PostgreSQL")
@@ -242,8 +310,7 @@ class DataManager:
         # Check Redis
         try:
             redis_client = await self.redis.get_async_client()
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, redis_client.ping)
+            await redis_client.ping()
             health["redis"] = True
         except Exception as e:
             logger.error(f"Redis health check failed: {e}")
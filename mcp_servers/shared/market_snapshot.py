@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Shared in-process snapshot of the A-share spot table (stock_zh_a_spot_em)
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+from config import config
+from logger import get_logger
+from rate_limiter import akshare_limiter
+
+logger = get_logger("MarketSnapshot")
+
+
+def fetch_spot_table() -> pd.DataFrame:
+    """Download the full-market spot table under the shared rate limit"""
+    return akshare_limiter.call(ak.stock_zh_a_spot_em)
+
+# Spot table column -> snapshot field
+SPOT_COLUMNS = {
+    '名称': 'name',
+    '最新价': 'current_price',
+    '涨跌额': 'change_amount',
+    '涨跌幅': 'change_percent',
+    '成交量': 'volume',
+    '成交额': 'turnover',
+    '最高': 'high',
+    '最低': 'low',
+    '今开': 'open',
+    '昨收': 'yesterday_close',
+}
+
+class MarketSnapshot:
+    """Columnar, code-indexed snapshot refreshed at most once per interval"""
+
+    def __init__(self, loader: Callable[[], pd.DataFrame] = fetch_spot_table,
+                 refresh_interval: Optional[int] = None):
+        self.loader = loader
+        self.refresh_interval = refresh_interval or config.external_apis.realtime_snapshot_interval
+
+        self._index: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._fetched_at: float = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        """Whether the snapshot is older than the refresh interval"""
+        return not self._fetched_at or time.time() - self._fetched_at >= self.refresh_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """Refresh the snapshot; concurrent callers share one download"""
+        if not force and not self.is_stale():
+            return True
+
+        with self._refresh_lock:
+            if not force and not self.is_stale():
+                return True
+
+            try:
+                df = self.loader()
+            except Exception as e:
+                logger.error(f"Market snapshot refresh failed: {e}")
+                return False
+
+            if df is None or df.empty:
+                logger.warning("Market snapshot refresh returned empty table")
+                return False
+
+            codes = df['代码'].astype(str).str.zfill(6).to_numpy()
+            columns = {}
+            for source, field in SPOT_COLUMNS.items():
+                if source not in df.columns:
+                    continue
+                if field == 'name':
+                    columns[field] = df[source].astype(str).to_numpy()
+                else:
+                    columns[field] = pd.to_numeric(df[source], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+            self._columns, self._index = columns, {code: pos for pos, code in enumerate(codes)}
+            self._fetched_at = time.time()
+            logger.info(f"Market snapshot refreshed: {len(self._index)} stocks")
+            return True
+
+    def get(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """Look up one stock; includes the snapshot timestamp"""
+        self.refresh()
+
+        columns, index = self._columns, self._index
+        pos = index.get(stock_code)
+        if pos is None:
+            return None
+
+        row: Dict[str, Any] = {"code": stock_code}
+        for field, values in columns.items():
+            value = values[pos]
+            row[field] = value.item() if hasattr(value, 'item') else value
+        if 'volume' in row:
+            row['volume'] = int(row['volume'])
+        row["timestamp"] = self._fetched_at
+        return row
+
+# Global instance
+market_snapshot = MarketSnapshot()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+AKShare rate limiting shared with the backend services
+
+Uses the Redis keys and token bucket script defined once in backend/app/core/akshare_quota.py
+(loaded through akshare_quota.py), so MCP servers, uvicorn workers and batch jobs draw from
+one quota per AKShare endpoint plus one global bucket. Falls back to an in-process bucket if Redis is unavailable.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import redis
+from akshare_quota import GLOBAL_BUCKET, KEY_PREFIX, TOKEN_BUCKET_SCRIPT
+from config import config
+from database import redis_conn
+from logger import get_logger
+
+logger = get_logger("rate_limiter")
+
+
+class AKShareRateLimiter:
+    """Redis token bucket limiter keyed by AKShare function name"""
+
+    def __init__(self):
+        apis = config.external_apis
+        self.quotas: Dict[str, List[float]] = apis.akshare_rate_limits
+        self.default_quota = apis.akshare_rate_limit_default
+        self.global_quota = apis.akshare_rate_limit_global
+
+        self._redis = redis_conn.get_sync_client(apis.rate_limit_redis_db, decode_responses=False)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+        # Local fallback state: key -> (tokens, timestamp)
+        self._local_lock = threading.Lock()
+        self._local: Dict[str, Tuple[float, float]] = {}
+        self._last_fallback_log = 0.0
+
+    def _buckets(self, endpoint: str) -> List[Tuple[str, float, float]]:
+        per_minute, burst = self.quotas.get(endpoint, self.default_quota)
+        buckets = [(f"{KEY_PREFIX}:{endpoint}", per_minute / 60.0, float(burst))]
+        if self.global_quota:
+            per_minute, burst = self.global_quota
+            buckets.append((f"{KEY_PREFIX}:{GLOBAL_BUCKET}", per_minute / 60.0, float(burst)))
+        return buckets
+
+    def _try_local(self, buckets: List[Tuple[str, float, float]], tokens: float) -> float:
+        now = time.monotonic()
+        with self._local_lock:
+            levels = []
+            wait = 0.0
+            for key, rate, capacity in buckets:
+                level, ts = self._local.get(key, (capacity, now))
+                level = min(capacity, level + max(0.0, now - ts) * rate)
+                levels.append(level)
+                if level < tokens:
+                    wait = max(wait, (tokens - level) / rate)
+            for (key, _, _), level in zip(buckets, levels):
+                self._local[key] = (level - tokens if wait == 0 else level, now)
+            return wait
+
+    def _try_acquire(self, buckets: List[Tuple[str, float, float]], tokens: float) -> float:
+        args: List[Any] = [tokens]
+        for _, rate, capacity in buckets:
+            args.extend([rate, capacity])
+        try:
+            return int(self._script(keys=[key for key, _, _ in buckets], args=args)) / 1000.0
+        except redis.RedisError as e:
+            now = time.monotonic()
+            if now - self._last_fallback_log >= 60:
+                self._last_fallback_log = now
+                logger.warning(f"Rate limiter Redis unavailable, using local bucket: {e}")
+            return self._try_local(buckets, tokens)
+
+    def acquire(self, endpoint: str, tokens: float = 1) -> float:
+        """Block until tokens are available; returns seconds waited"""
+        buckets = self._buckets(endpoint)
+        start = time.monotonic()
+        while True:
+            wait = self._try_acquire(buckets, tokens)
+            if wait <= 0:
+                return time.monotonic() - start
+            time.sleep(wait)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Acquire a token for func's endpoint, then call it"""
+        waited = self.acquire(func.__name__)
+        if waited > 0.5:
+            logger.info(f"AKShare {func.__name__} throttled for {waited:.2f}s")
+        return func(*args, **kwargs)
+
+
+# Global limiter instance
+akshare_limiter = AKShareRateLimiter()